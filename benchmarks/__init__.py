@@ -0,0 +1,8 @@
+# Benchmarks for the stocks package, run with `python -m benchmarks.run --help`.
+#
+# They import the package from src/ like the tests do.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
@@ -0,0 +1,267 @@
+# Benchmark suite for the ingest, query and news paths, reporting JSON.
+#
+#     python -m benchmarks.run --tickers 50 --years 5 --output results.json
+#
+# Every run uses synthetic data served by SyntheticYahoo, so results only depend on the code,
+# the parameters and the machine. Compare the JSON of two releases run with the same parameters.
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from . import synthetic
+from stocks.database import Database
+from stocks.ingest import INSERT_TICKER_BARS_SQL, history_to_bars
+from stocks.schema import from_epoch_day, ticker_id
+from stocks.stocks import Stocks
+
+# Result format version; bump it when fields change meaning
+FORMAT_VERSION = 2
+
+PERCENTILES = (50, 90, 99)
+
+def latency_summary(samples):
+    """Summarize per-operation durations in seconds as milliseconds"""
+    if not samples:
+        return {}
+    values = np.asarray(samples) * 1000.0
+    summary = {f'p{p}_ms': float(np.percentile(values, p)) for p in PERCENTILES}
+    summary['mean_ms'] = float(values.mean())
+    summary['max_ms'] = float(values.max())
+    return summary
+
+@contextlib.contextmanager
+def measure(result, units, trace=False):
+    """
+    Time a block, or track its peak traced memory, filling result in place.
+
+    tracemalloc hooks every allocation and slows code down by varying amounts, so a block is
+    either timed or traced, never both; Suite runs each benchmark once each way.
+
+    Parameters:
+        result (dict): Receives seconds, units and throughput_per_s, or peak_memory_bytes if trace
+        units (int or callable): Work done by the block, or a function returning it afterwards
+        trace (bool): Track peak memory instead of timing
+    """
+    if trace:
+        tracemalloc.start()
+        try:
+            yield result
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            result['peak_memory_bytes'] = peak
+        return
+
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        elapsed = time.perf_counter() - started
+        count = units() if callable(units) else units
+        result.update({
+            'seconds': elapsed,
+            'units': count,
+            'throughput_per_s': count / elapsed if elapsed else None,
+        })
+
+class Suite:
+    """
+    Runs each benchmark on a fresh database in a temporary directory.
+
+    Every benchmark runs twice: timed first, then again on another fresh database with
+    tracemalloc on for its peak memory, which is added to the timed results.
+
+    Parameters:
+        tickers (int): Number of synthetic tickers
+        years (int): Years of daily history per ticker
+        queries (int): Number of get_ticker_data calls per output format
+        news_per_ticker (int): News items served per ticker
+        max_workers (int): Download workers for refresh_data
+        batch_size (int, optional): Grouped download size for refresh_data
+        profile (str, optional): Database tuning profile
+        seed (int): Seed for the synthetic data and the query ranges
+    """
+
+    def __init__(self, tickers=20, years=2, queries=200, news_per_ticker=20, max_workers=4,
+                 batch_size=None, profile=None, seed=0):
+        self.params = {
+            'tickers': tickers, 'years': years, 'queries': queries, 'news_per_ticker': news_per_ticker,
+            'max_workers': max_workers, 'batch_size': batch_size, 'profile': profile, 'seed': seed,
+        }
+        self.symbols = synthetic.ticker_symbols(tickers)
+        self.end_date = date(2024, 1, 1)
+        self.start_date = self.end_date - timedelta(days=365 * years)
+        self.api = synthetic.SyntheticYahoo(seed=seed, news_per_ticker=news_per_ticker)
+        self._tmpdir = None
+        self._trace = False
+
+    def run(self, names=None):
+        """Run the named benchmarks, all of them by default, and return the report"""
+        benchmarks = {
+            'insert_row': self.bench_insert_row,
+            'insert_bulk': self.bench_insert_bulk,
+            'refresh_data': self.bench_refresh_data,
+            'get_ticker_data': self.bench_get_ticker_data,
+            'refresh_news': self.bench_refresh_news,
+        }
+        results = []
+        with tempfile.TemporaryDirectory() as self._tmpdir:
+            for name in names or benchmarks:
+                self._trace = False
+                timed = benchmarks[name]()
+                self._trace = True
+                for result, traced in zip(timed, benchmarks[name]()):
+                    result['peak_memory_bytes'] = traced['peak_memory_bytes']
+                results.extend(timed)
+            self._trace = False
+        return {
+            'format_version': FORMAT_VERSION,
+            'meta': {
+                'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+            },
+            'params': self.params,
+            'results': results,
+        }
+
+    def bench_insert_row(self):
+        """Database.insert_ticker_data, one committed row per call"""
+        db = self._database('insert_row')
+        frame = synthetic.make_history(self.symbols[0], str(self.start_date), str(self.end_date), self.params['seed'])
+        rows = [(from_epoch_day(bar[1]),) + bar[2:] for bar in history_to_bars(None, frame)][:2000]
+        samples = []
+        result = {'name': 'insert_row', 'unit': 'rows'}
+        with measure(result, len(rows), self._trace):
+            for row in rows:
+                started = time.perf_counter()
+                db.insert_ticker_data(self.symbols[0], *row)
+                samples.append(time.perf_counter() - started)
+        result['latency'] = latency_summary(samples)
+        db.close()
+        return [result]
+
+    def bench_insert_bulk(self):
+        """executemany of history_to_bars rows, one transaction per ticker as in refresh_data"""
+        db = self._database('insert_bulk')
+        frames = {ticker: self.api.get_stock_data(ticker, self.start_date, self.end_date) for ticker in self.symbols}
+        result = {'name': 'insert_bulk', 'unit': 'rows'}
+        with measure(result, sum(len(frame) for frame in frames.values()), self._trace):
+            for ticker, frame in frames.items():
+                with db.connection:
+                    db.connection.executemany(INSERT_TICKER_BARS_SQL,
+                                              history_to_bars(ticker_id(db.connection, ticker), frame))
+        db.close()
+        return [result]
+
+    def bench_refresh_data(self):
+        """Stocks.refresh_data over every ticker, fetching from the stand-in"""
+        db = self._database('refresh_data')
+        stocks = Stocks(db.connection)
+        self._register_tickers(db)
+        result = {'name': 'refresh_data', 'unit': 'rows'}
+        self.api.requests = 0
+        with self.api.patch(), measure(result, lambda: _row_count(db.connection), self._trace):
+            stocks.refresh_data(str(self.start_date), str(self.end_date), max_workers=self.params['max_workers'],
+                                batch_size=self.params['batch_size'])
+        result['requests'] = self.api.requests
+        db.close()
+        return [result]
+
+    def bench_get_ticker_data(self):
+        """Random one-ticker range reads in every output format"""
+        db = self._database('get_ticker_data')
+        stocks = Stocks(db.connection)
+        self._register_tickers(db)
+        with self.api.patch():
+            stocks.refresh_data(str(self.start_date), str(self.end_date), max_workers=self.params['max_workers'])
+        span = (self.end_date - self.start_date).days
+        # Seeded here so the timed and traced runs issue the same queries
+        rng = np.random.default_rng(self.params['seed'])
+        ranges = []
+        for _ in range(self.params['queries']):
+            first, last = sorted(rng.integers(0, span, 2).tolist())
+            ranges.append((self.symbols[int(rng.integers(len(self.symbols)))],
+                           str(self.start_date + timedelta(days=first)),
+                           str(self.start_date + timedelta(days=last))))
+
+        results = []
+        for output in ('rows', 'bars', 'arrays', 'frame'):
+            samples = []
+            returned = 0
+            result = {'name': f'get_ticker_data[{output}]', 'unit': 'rows'}
+            with measure(result, lambda: returned, self._trace):
+                for ticker, start, end in ranges:
+                    started = time.perf_counter()
+                    data = stocks.get_ticker_data(ticker, start, end, output=output)
+                    samples.append(time.perf_counter() - started)
+                    returned += len(data['date']) if output == 'arrays' else len(data)
+            result['latency'] = latency_summary(samples)
+            result['queries'] = len(ranges)
+            results.append(result)
+        db.close()
+        return results
+
+    def bench_refresh_news(self):
+        """Stocks.refresh_news with in-process lexicon scoring, so results do not depend on textblob"""
+        db = self._database('refresh_news')
+        stocks = Stocks(db.connection)
+        self._register_tickers(db)
+        result = {'name': 'refresh_news', 'unit': 'items'}
+        with self.api.patch(), measure(result, lambda: report['items'], self._trace):
+            report = stocks.refresh_news(max_workers=self.params['max_workers'], sentiment_workers=0,
+                                         sentiment_backend='lexicon')
+        result['stages'] = report['timings']
+        db.close()
+        return [result]
+
+    def _register_tickers(self, db):
+        with db.connection:
+            db.connection.executemany('INSERT INTO tickers (ticker) VALUES (?)', [(t,) for t in self.symbols])
+
+    def _database(self, name):
+        if self._trace:
+            name += '-traced'
+        return Database(os.path.join(self._tmpdir, f'{name}.db'), profile=self.params['profile'])
+
+def _row_count(connection):
+    return connection.execute('SELECT COUNT(*) FROM ticker_bars').fetchone()[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the stocks package on synthetic data')
+    parser.add_argument('--tickers', type=int, default=20)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--news-per-ticker', type=int, default=20)
+    parser.add_argument('--max-workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=None)
+    parser.add_argument('--profile', default=None, help="Database profile, e.g. 'performance'")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', action='append', help='Run only this benchmark; may be repeated')
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    args = parser.parse_args(argv)
+
+    suite = Suite(args.tickers, args.years, args.queries, args.news_per_ticker, args.max_workers,
+                  args.batch_size, args.profile, args.seed)
+    report = json.dumps(suite.run(args.only), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+# Deterministic synthetic market data and a stand-in for the Yahoo Finance fetch layer
+
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from stocks.calendars import get_calendar
+
+POSITIVE_WORDS = ('beats', 'surges', 'upgrade', 'record', 'growth', 'rally')
+NEGATIVE_WORDS = ('misses', 'plunges', 'downgrade', 'lawsuit', 'weak', 'layoffs')
+NEUTRAL_WORDS = ('announces', 'schedules', 'reports', 'updates', 'files', 'hosts')
+
+def ticker_symbols(count):
+    """Return count distinct synthetic ticker symbols"""
+    return [f'SYN{i:04d}' for i in range(count)]
+
+def _rng(ticker, seed):
+    # Seeded per ticker so a history does not depend on which other tickers are generated
+    return np.random.default_rng([seed, zlib.crc32(ticker.encode())])
+
+def make_history(ticker, start_date, end_date, seed=0, calendar='nyse'):
+    """
+    Generate a yfinance-style daily history for [start_date, end_date) on exchange sessions.
+
+    Prices follow a geometric random walk; the same ticker, window and seed always give the
+    same frame.
+    """
+    sessions = get_calendar(calendar).sessions(start_date, np.datetime64(end_date, 'D') - 1)
+    count = len(sessions)
+    rng = _rng(ticker, seed)
+    close = 50.0 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, count)))
+    spread = np.abs(rng.normal(0, 0.01, (3, count))) * close
+    dividends = np.where(rng.random(count) < 0.015, np.round(close * 0.005, 2), 0.0)
+    return pd.DataFrame({
+        'Open': close + spread[0] - spread[1],
+        'High': close + spread[0] + spread[2],
+        'Low': close - spread[1] - spread[2],
+        'Close': close,
+        'Volume': rng.integers(10_000, 5_000_000, count),
+        'Dividends': dividends,
+        'Stock Splits': 0.0,
+    }, index=pd.DatetimeIndex(sessions, name='Date'))
+
+def make_news(ticker, count, seed=0, now=None):
+    """Generate count Yahoo-style news items for a ticker, about a third of each sentiment"""
+    rng = _rng(ticker, seed + 1)
+    now = now or datetime(2024, 1, 1)
+    items = []
+    for i in range(count):
+        words = (POSITIVE_WORDS, NEGATIVE_WORDS, NEUTRAL_WORDS)[i % 3]
+        picked = rng.choice(words, size=2)
+        published = now - timedelta(hours=int(rng.integers(0, 24 * 30)))
+        items.append({
+            'id': f'{ticker}-{seed}-{i}',
+            'content': {
+                'title': f'{ticker} {picked[0]} after quarter',
+                'summary': f'{ticker} {picked[0]} as analysts see {picked[1]} results in update {i}.',
+                'pubDate': published.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            },
+        })
+    return items
+
+class SyntheticYahoo:
+    """
+    Local stand-in for stocks.api: serves synthetic histories and news without the network.
+
+    Parameters:
+        seed (int): Seed for all generated data
+        news_per_ticker (int): Number of news items returned per ticker
+        latency (float): Seconds each request sleeps, to model network time
+    """
+
+    def __init__(self, seed=0, news_per_ticker=20, latency=0.0):
+        self.seed = seed
+        self.news_per_ticker = news_per_ticker
+        self.latency = latency
+        self.requests = 0
+
+    def get_stock_data(self, ticker, start_date, end_date):
+        self._request()
+        return make_history(ticker, str(start_date), str(end_date), self.seed)
+
+    def get_stock_data_group(self, windows):
+        self._request()
+        return {ticker: make_history(ticker, str(start), str(end), self.seed) for ticker, start, end in windows}
+
+    def get_stock_news(self, ticker, count=None):
+        self._request()
+        return make_news(ticker, self.news_per_ticker if count is None else min(count, self.news_per_ticker),
+                         self.seed)
+
+    @contextmanager
+    def patch(self):
+        """Route stocks.api fetches to this stand-in for the duration of the block"""
+        with mock.patch('stocks.api.get_stock_data', self.get_stock_data), \
+                mock.patch('stocks.api.get_stock_data_group', self.get_stock_data_group), \
+                mock.patch('stocks.api.get_stock_news', self.get_stock_news):
+            yield self
+
+    def _request(self):
+        self.requests += 1
+        if self.latency:
+            import time
+            time.sleep(self.latency)
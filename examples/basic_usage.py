@@ -1,7 +1,12 @@
+import logging
+
 from src.stocks.database import Database
 from src.stocks.stocks import Stocks
 
 def main():
+    # Show the progress events logged while refreshing
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     # Initialize the database and stocks manager
     db = Database('example_stocks.db')
     stocks_manager = Stocks(db.connection)
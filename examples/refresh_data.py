@@ -1,18 +1,22 @@
 # Example of how to use the enhanced refresh_data methods with date parameters
 
+import logging
+
 from src.stocks.database import Database
 from src.stocks.stocks import Stocks
 from datetime import datetime, timedelta
 
 def main():
+    # Show the progress events logged while refreshing
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     # Initialize the database and stocks manager
     db = Database('example_stocks.db')
     stocks_manager = Stocks(db.connection)
     
     # Add some tickers if they don't exist
     tickers_to_add = ['AAPL', 'MSFT', 'GOOGL']
-    for ticker in tickers_to_add:
-        stocks_manager.add_ticker(ticker)
+    stocks_manager.add_tickers(tickers_to_add)
     
     print("\nExample 1: Refresh for a specific date range (last month)")
     end_date = datetime.now().date()
@@ -1,6 +1,10 @@
+import logging
+
 from src.stocks.stocks import Stocks
 from src.stocks.database import Database
 
+# Progress is reported as events on the 'stocks.events' logger
+logging.basicConfig(level=logging.INFO, format='%(message)s')
 
 stocks_database = Database('stocks.db')
 stocks = Stocks(stocks_database.connection)
@@ -91,15 +95,14 @@ stocks = Stocks(stocks_database.connection)
 # ]
 
 
-# for ticker in tickers:
-#     stocks.add_ticker(ticker, '2024-01-01', '2025-03-11')
+# stocks.add_tickers(tickers, '2024-01-01', '2025-03-11')
 
 # symbols = ["^PSEI", "^OSEAX.OL", "^MSCI", "^XU100", "^SA40", "^LTT", "^T10Y2Y", "^JPYCNY", "^CXY"]
 
 # for ticker in symbols:
 #     stocks.remove_ticker(ticker)
 # stocks.remove_ticker('^JTOPI')
-# stocks.refresh_data(start_date='1996-01-01', end_date='1999-12-31')
+# stocks.backfill('1996-01-01', '1999-12-31', max_workers=4, requests_per_second=2)
 # stocks.add_ticker('META', '2015-01-01', '2025-03-12')
 # stocks.refresh_data_for_ticker('AAPL', '2015-01-01', '2019-12-31')
 # stocks.refresh_news()
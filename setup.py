@@ -13,10 +13,13 @@ setup(
         'pandas',    # For data manipulation
         'textblob',  # For sentiment analysis
     ],
+    extras_require={
+        'parquet': ['pyarrow'],  # For Parquet export and import
+    },
     classifiers=[
         'Programming Language :: Python :: 3',
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.7',
 )
\ No newline at end of file
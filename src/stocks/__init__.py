@@ -1,6 +1,28 @@
 # This file initializes the stocks module and can be used to define what is exported from the module.
+#
+# Exports are resolved lazily so that `import stocks` stays cheap: a read-only tool that only
+# needs Database never loads the refresh machinery, and yfinance, pandas and textblob are only
+# imported by the fetch and scoring paths that use them.
 
-from .stocks import Stocks
-from .database import Database
+import importlib
 
-__all__ = ['Stocks', 'Database']
\ No newline at end of file
+_EXPORTS = {
+    'Stocks': '.stocks',
+    'Database': '.database',
+    'AsyncStocks': '.aio',
+    'Bar': '.records',
+    'BarSeries': '.records',
+}
+
+__all__ = ['Stocks', 'Database', 'AsyncStocks', 'Bar', 'BarSeries']
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,206 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from . import metrics
+from .news import dedup_news, drop_stored_news, score_sentiments, stage_timer
+from .stocks import Stocks
+
+class AsyncStocks:
+    """
+    Awaitable facade over Stocks for asyncio services.
+
+    Yahoo Finance downloads run on a fetch thread pool, at most max_concurrency at a time, and
+    every database call runs on a single dedicated thread, so the event loop is never blocked
+    and the SQLite connection is only ever touched by that one thread.
+
+    Wrapping an existing Stocks requires its connection to be usable from another thread
+    (for example one created by Database(..., pool_size=...)). Use AsyncStocks.open to have
+    the connection created on the database thread instead.
+
+    Parameters:
+        stocks (Stocks): Synchronous Stocks instance to delegate to
+        max_concurrency (int): Maximum number of downloads in flight at once
+        db_executor (ThreadPoolExecutor, optional): Executor for database work. If None, a
+                                                    single-thread executor is created
+    """
+
+    def __init__(self, stocks: Stocks, max_concurrency: int = 8,
+                 db_executor: Optional[ThreadPoolExecutor] = None):
+        self.stocks = stocks
+        self.max_concurrency = max_concurrency
+        self._owns_db_executor = db_executor is None
+        self._db_executor = db_executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='stocks-db')
+        self._fetch_executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='stocks-fetch')
+        self._semaphore = None
+
+    @classmethod
+    async def open(cls, db_name: str = 'stocks.db', max_concurrency: int = 8, **database_options):
+        """
+        Create a Database and Stocks on the dedicated database thread and wrap them.
+
+        Parameters:
+            db_name (str): Path of the SQLite database file
+            max_concurrency (int): Maximum number of downloads in flight at once
+            **database_options: Extra arguments for Database, e.g. profile='performance'
+
+        Returns:
+            AsyncStocks: Facade owning the new database; close it with aclose()
+        """
+        from .database import Database
+
+        db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stocks-db')
+        loop = asyncio.get_running_loop()
+        database = await loop.run_in_executor(
+            db_executor, functools.partial(Database, db_name, **database_options))
+        stocks = await loop.run_in_executor(
+            db_executor, functools.partial(Stocks, database.connection, pool=database.pool))
+        facade = cls(stocks, max_concurrency=max_concurrency, db_executor=db_executor)
+        facade._owns_db_executor = True
+        facade._database = database
+        return facade
+
+    async def aclose(self):
+        """Close the database opened by open(), if any, and shut down the executors"""
+        database = getattr(self, '_database', None)
+        if database is not None:
+            await self._run_db(database.close)
+        self._fetch_executor.shutdown(wait=False)
+        if self._owns_db_executor:
+            self._db_executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def get_all_tickers(self) -> List[str]:
+        """Awaitable Stocks.get_all_tickers"""
+        return await self._run_db(self.stocks.get_all_tickers)
+
+    async def get_ticker_data(self, ticker, start_date=None, end_date=None, **options):
+        """Awaitable Stocks.get_ticker_data; options are passed through (output, ascending)"""
+        return await self._run_db(self.stocks.get_ticker_data, ticker, start_date, end_date, **options)
+
+    async def get_panel(self, tickers, start_date=None, end_date=None, fields='close'):
+        """Awaitable Stocks.get_panel"""
+        return await self._run_db(self.stocks.get_panel, tickers, start_date, end_date, fields)
+
+    async def get_ticker_news(self, ticker, sentiment=None):
+        """Awaitable Stocks.get_ticker_news"""
+        return await self._run_db(self.stocks.get_ticker_news, ticker, sentiment)
+
+    async def refresh_data_for_ticker(self, ticker, start_date=None, end_date=None):
+        """Awaitable Stocks.refresh_data_for_ticker"""
+        windows = await self._run_db(self.stocks._plan_refresh, [ticker], start_date, end_date)
+        await asyncio.gather(*(self._refresh_window(*window) for window in windows))
+
+    async def refresh_data(self, start_date=None, end_date=None) -> Dict[str, int]:
+        """
+        Refresh every ticker, downloading up to max_concurrency tickers at once.
+
+        Parameters:
+            start_date (str or datetime, optional): Start date in format 'YYYY-MM-DD'. If None,
+                                                   uses most recent data in DB or 10 years ago
+            end_date (str or datetime, optional): End date in format 'YYYY-MM-DD'. If None, uses today's date
+
+        Returns:
+            dict: Ticker symbol to number of rows written, for every ticker that was downloaded
+        """
+        tickers = await self.get_all_tickers()
+        if not tickers:
+            metrics.emit('refresh.no_tickers', "No tickers found in database")
+            return {}
+        windows = await self._run_db(self.stocks._plan_refresh, tickers, start_date, end_date)
+        metrics.emit('refresh.start', "Refreshing data for {windows} of {tickers} tickers ({up_to_date} already up to date)...",
+                     windows=len(windows), tickers=len(tickers), up_to_date=len(tickers) - len(windows))
+        counts = await asyncio.gather(*(self._refresh_window(*window) for window in windows))
+        return {window[0]: count for window, count in zip(windows, counts)}
+
+    async def refresh_news(self, sentiment_workers=None, batch_size=500, rescore=False,
+                           sentiment_backend='auto', sentiment_cache=False) -> Dict:
+        """
+        Awaitable Stocks.refresh_news with each stage on the executor it belongs to.
+
+        News is fetched up to max_concurrency tickers at once on the fetch pool, stored ids are
+        read and rows written on the database thread, and sentiment is scored on the loop's
+        default executor, so database calls never wait behind downloads or scoring.
+
+        Parameters:
+            sentiment_workers (int, optional): Processes used for sentiment scoring, see Stocks.refresh_news
+            batch_size (int): Number of news items per scoring batch and per insert
+            rescore (bool): Score and rewrite articles that are already stored as well
+            sentiment_backend (str): Sentiment backend, see stocks.sentiment.BACKENDS
+            sentiment_cache (bool): Reuse and persist labels in the sentiment_cache table
+
+        Returns:
+            dict: Stage statistics, see Stocks.refresh_news
+        """
+        stocks = self.stocks
+        timings = {}
+        tickers = await self._run_db(stocks._news_tickers)
+        if not tickers:
+            return stocks._news_report(0, 0, 0, timings)
+
+        with stage_timer(timings, 'fetch'):
+            results = await asyncio.gather(*(self._fetch(stocks._fetch_news, ticker) for ticker in tickers),
+                                           return_exceptions=True)
+            news_by_ticker = {}
+            for ticker, result in zip(tickers, results):
+                if isinstance(result, Exception):
+                    stocks._news_fetch_failed(ticker, result)
+                elif isinstance(result, BaseException):
+                    raise result
+                else:
+                    stocks._collect_news(news_by_ticker, ticker, result)
+
+        with stage_timer(timings, 'parse'):
+            rows = stocks._parse_news(news_by_ticker)
+
+        with stage_timer(timings, 'dedup'):
+            rows = dedup_news(rows)
+            fetched = len(rows)
+            if not rescore:
+                rows = drop_stored_news(rows, await self._run_db(stocks._stored_news_ids, list(news_by_ticker)))
+
+        with stage_timer(timings, 'score'):
+            loop = asyncio.get_running_loop()
+            sentiments = await loop.run_in_executor(None, functools.partial(
+                score_sentiments, [row[3] for row in rows], sentiment_workers, batch_size, sentiment_backend,
+                with_connection=self._with_writer if sentiment_cache else None))
+
+        with stage_timer(timings, 'store'):
+            news_count = await self._run_db(stocks._store_scored_news, rows, sentiments, batch_size)
+
+        return stocks._news_report(len(tickers), news_count, fetched - len(rows), timings)
+
+    async def _refresh_window(self, ticker, start_date, end_date):
+        """Stocks._refresh_window with the download on the fetch pool and the write on the database thread"""
+        started = time.perf_counter()
+        try:
+            df = await self._fetch(self.stocks._fetch_history, ticker, start_date, end_date)
+        except Exception as e:
+            self.stocks._fetch_failed(ticker, e)
+            return 0
+        count = await self._run_db(self.stocks._store_history, ticker, df, start_date, end_date)
+        if metrics.enabled():
+            metrics.observe('refresh.seconds', time.perf_counter() - started, ticker=ticker)
+        return count
+
+    async def _fetch(self, func, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._fetch_executor, functools.partial(func, *args))
+
+    def _with_writer(self, func):
+        """Stocks._with_writer for worker threads: runs func on the database thread and waits for it"""
+        return self._db_executor.submit(self.stocks._with_writer, func).result()
+
+    async def _run_db(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._db_executor, functools.partial(func, *args, **kwargs))
@@ -1,11 +1,199 @@
-import yfinance as yf
+from .utils import parse_date, format_date
+
+# Host that serves the history and news endpoints used below; rate limiters key on it.
+YAHOO_HOST = 'query2.finance.yahoo.com'
+
+# Response cache used by the functions below; see set_fetch_cache
+_fetch_cache = None
+_fetch_cache_loaded = False
+
+def set_fetch_cache(cache):
+    """
+    Route every fetch in this module through a FetchCache, or send them live again with None.
+
+    Parameters:
+        cache (FetchCache or None): Cache to use, e.g. FetchCache('fetch.db', mode='replay')
+    """
+    global _fetch_cache, _fetch_cache_loaded
+    _fetch_cache = cache
+    _fetch_cache_loaded = True
+
+def get_fetch_cache():
+    """Return the active FetchCache, creating it from STOCKS_FETCH_CACHE on first use"""
+    global _fetch_cache, _fetch_cache_loaded
+    if not _fetch_cache_loaded:
+        from .fetch_cache import from_environment
+
+        _fetch_cache = from_environment()
+        _fetch_cache_loaded = True
+    return _fetch_cache
 
 def get_stock_data(ticker, start_date, end_date):
     """Get stock data from Yahoo Finance API."""
-    ticker_obj = yf.Ticker(ticker)
-    return ticker_obj.history(start=start_date, end=end_date)
+    def fetch():
+        import yfinance as yf
+
+        ticker_obj = yf.Ticker(ticker)
+        return ticker_obj.history(start=start_date, end=end_date)
+
+    return _cached('history', ticker, start_date, end_date, fetch)
+
+def get_stock_news(ticker, count=None):
+    """Get news for a ticker from Yahoo Finance API, optionally asking for up to count items."""
+    def fetch():
+        import yfinance as yf
+
+        ticker_obj = yf.Ticker(ticker)
+        if count is None:
+            return ticker_obj.get_news()
+        return ticker_obj.get_news(count=count)
+
+    endpoint = 'news' if count is None else f'news?count={count}'
+    return _cached(endpoint, ticker, None, None, fetch)
+
+def _cached(endpoint, ticker, start_date, end_date, fetch):
+    cache = get_fetch_cache()
+    if cache is None:
+        return fetch()
+    if start_date is not None:
+        start_date = format_date(start_date)
+    if end_date is not None:
+        end_date = format_date(end_date)
+    return cache.fetch(endpoint, ticker, start_date, end_date, fetch)
+
+def group_date_windows(windows, max_group_size=50, slack_days=31):
+    """
+    Group per-ticker download windows so each group can be fetched with one request.
+
+    Windows are grouped when they overlap and the shared span would add at most
+    slack_days of unwanted history to either end of any member's window. A group never
+    holds two windows of the same ticker.
+
+    Parameters:
+        windows (iterable): (ticker, start_date, end_date) tuples with 'YYYY-MM-DD' dates
+        max_group_size (int): Maximum number of tickers per group
+        slack_days (int): Extra days a member may be asked to download beyond its window
+
+    Returns:
+        list: Groups, each a list of (ticker, start_date, end_date) tuples
+    """
+    parsed = sorted(
+        (parse_date(start), parse_date(end), ticker, start, end)
+        for ticker, start, end in windows
+    )
+    groups = []
+    current = []
+    for start, end, ticker, start_str, end_str in parsed:
+        if current:
+            fits = (
+                len(current) < max_group_size
+                and ticker not in members
+                and start <= min_end
+                and (start - group_start).days <= slack_days
+                and (max(max_end, end) - min(min_end, end)).days <= slack_days
+            )
+            if fits:
+                current.append((ticker, start_str, end_str))
+                members.add(ticker)
+                min_end = min(min_end, end)
+                max_end = max(max_end, end)
+                continue
+            groups.append(current)
+        current = [(ticker, start_str, end_str)]
+        members = {ticker}
+        group_start, min_end, max_end = start, end, end
+    if current:
+        groups.append(current)
+    return groups
+
+def get_stock_data_group(windows):
+    """
+    Download a group of tickers with a single multi-symbol request.
+
+    Parameters:
+        windows (list): (ticker, start_date, end_date) tuples, as produced by group_date_windows
+
+    Returns:
+        dict: Ticker symbol to a history DataFrame trimmed to that ticker's own window
+    """
+    cache = get_fetch_cache()
+    if cache is None:
+        return _download_group(windows)
+
+    # Each ticker's frame is cached under its own history key; only the misses are downloaded
+    frames = {}
+    missing = []
+    for ticker, start, end in windows:
+        frame = cache.lookup('history', ticker, format_date(start), format_date(end))
+        if frame is None:
+            missing.append((ticker, start, end))
+        else:
+            frames[ticker] = frame
+    if missing:
+        downloaded = _download_group(missing)
+        for ticker, start, end in missing:
+            cache.store('history', ticker, format_date(start), format_date(end), downloaded[ticker])
+        frames.update(downloaded)
+    return frames
+
+def _download_group(windows):
+    import yfinance as yf
+
+    start_date = min(format_date(parse_date(start)) for _, start, _ in windows)
+    end_date = max(format_date(parse_date(end)) for _, _, end in windows)
+    tickers = [ticker for ticker, _, _ in windows]
+    data = yf.download(
+        tickers,
+        start=start_date,
+        end=end_date,
+        actions=True,
+        auto_adjust=True,
+        group_by='ticker',
+        threads=False,
+        progress=False,
+    )
+    return {
+        ticker: _slice_ticker_frame(data, ticker, start, end)
+        for ticker, start, end in windows
+    }
+
+def get_stock_data_batch(windows, max_group_size=50, slack_days=31):
+    """
+    Download histories for many tickers using as few requests as possible.
+
+    Parameters:
+        windows (iterable): (ticker, start_date, end_date) tuples with 'YYYY-MM-DD' dates
+        max_group_size (int): Maximum number of tickers per request
+        slack_days (int): See group_date_windows
+
+    Returns:
+        dict: Ticker symbol to history DataFrame, one entry per requested ticker
+    """
+    frames = {}
+    for group in group_date_windows(windows, max_group_size, slack_days):
+        frames.update(get_stock_data_group(group))
+    return frames
+
+def _slice_ticker_frame(data, ticker, start_date, end_date):
+    """Pull one ticker's columns out of a yf.download result and trim it to [start_date, end_date)"""
+    import pandas as pd
 
-def get_stock_news(ticker):
-    """Get news for a ticker from Yahoo Finance API."""
-    ticker_obj = yf.Ticker(ticker)
-    return ticker_obj.get_news()
\ No newline at end of file
+    if data is None or data.empty:
+        return pd.DataFrame()
+    columns = data.columns
+    if isinstance(columns, pd.MultiIndex):
+        if ticker in columns.get_level_values(0):
+            frame = data[ticker]
+        elif ticker in columns.get_level_values(1):
+            frame = data.xs(ticker, axis=1, level=1)
+        else:
+            return pd.DataFrame()
+    else:
+        frame = data
+    # Tickers on other trading calendars show up as all-NaN rows in the shared index
+    frame = frame.dropna(how='all')
+    index = frame.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    mask = (index >= pd.Timestamp(start_date)) & (index < pd.Timestamp(end_date))
+    return frame[mask]
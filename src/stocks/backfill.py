@@ -0,0 +1,268 @@
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import metrics
+from .concurrency import HostRateLimiter
+from .ingest import INSERT_TICKER_BARS_SQL, history_to_bars
+from .schema import ticker_id, to_epoch_day
+from .utils import format_date, parse_date
+
+# Chunk states: pending chunks are downloaded (again) by the next run, done chunks never are,
+# and failed chunks ran out of attempts and wait for a run with retry_failed
+CHUNK_STATUSES = ('pending', 'done', 'failed')
+
+def plan_chunks(start_date, end_date, chunk_days: int = 365) -> List[Tuple[str, str]]:
+    """
+    Split [start_date, end_date) into consecutive windows of at most chunk_days days.
+
+    Parameters:
+        start_date (str or date): First day, 'YYYY-MM-DD'
+        end_date (str or date): Day after the last one, 'YYYY-MM-DD'
+        chunk_days (int): Longest window
+
+    Returns:
+        list: (start_date, end_date) 'YYYY-MM-DD' windows, end excluded
+    """
+    if chunk_days < 1:
+        raise ValueError("chunk_days must be at least 1")
+    start, end = parse_date(format_date(start_date)), parse_date(format_date(end_date))
+    windows = []
+    while start < end:
+        stop = min(end, start + timedelta(days=chunk_days))
+        windows.append((start.isoformat(), stop.isoformat()))
+        start = stop
+    return windows
+
+def create_job(connection, name: str, tickers: List[str], start_date, end_date, chunk_days: int = 365) -> int:
+    """
+    Register a backfill job and its chunks, or extend an existing job of the same name.
+
+    Chunks that already exist keep their state, so calling this again with more tickers only adds
+    chunks for the new ones.
+
+    Returns:
+        int: The job id
+    """
+    start_date, end_date = format_date(start_date), format_date(end_date)
+    now = time.time()
+    with connection:
+        row = connection.execute('SELECT id, start_date, end_date, chunk_days FROM backfill_jobs WHERE name = ?',
+                                 (name,)).fetchone()
+        if row is None:
+            job_id = connection.execute(
+                'INSERT INTO backfill_jobs (name, start_date, end_date, chunk_days, created, updated) '
+                'VALUES (?, ?, ?, ?, ?, ?)', (name, start_date, end_date, chunk_days, now, now)
+            ).lastrowid
+        else:
+            job_id = row[0]
+            if row[1:] != (start_date, end_date, chunk_days):
+                raise ValueError(f"Backfill job '{name}' already covers {row[1]}..{row[2]} in {row[3]}-day chunks")
+        windows = plan_chunks(start_date, end_date, chunk_days)
+        connection.executemany(
+            'INSERT OR IGNORE INTO backfill_chunks (job_id, ticker, start_date, end_date) VALUES (?, ?, ?, ?)',
+            ((job_id, ticker, start, end) for ticker in tickers for start, end in windows)
+        )
+    return job_id
+
+def job_end_date(connection, name: str) -> Optional[str]:
+    """Return the end date of a backfill job, or None if there is no such job"""
+    row = connection.execute('SELECT end_date FROM backfill_jobs WHERE name = ?', (name,)).fetchone()
+    return None if row is None else row[0]
+
+def job_status(connection, name: str) -> Optional[Dict]:
+    """
+    Report the progress of a backfill job.
+
+    Returns:
+        dict: 'job', 'status', 'chunks', a count per chunk state, 'rows' stored so far and
+              'errors', the last error of each failed chunk; None if there is no such job
+    """
+    row = connection.execute('SELECT id, status FROM backfill_jobs WHERE name = ?', (name,)).fetchone()
+    if row is None:
+        return None
+    job_id, status = row
+    counts = dict.fromkeys(CHUNK_STATUSES, 0)
+    counts.update(connection.execute(
+        'SELECT status, COUNT(*) FROM backfill_chunks WHERE job_id = ? GROUP BY status', (job_id,)
+    ).fetchall())
+    rows = connection.execute('SELECT TOTAL(rows) FROM backfill_chunks WHERE job_id = ?', (job_id,)).fetchone()[0]
+    errors = connection.execute(
+        "SELECT ticker, start_date, end_date, error FROM backfill_chunks WHERE job_id = ? AND status = 'failed' "
+        "ORDER BY ticker, start_date", (job_id,)
+    ).fetchall()
+    return dict(job=name, status=status, chunks=sum(counts.values()), rows=int(rows), errors=errors, **counts)
+
+class BackfillRunner:
+    """
+    Downloads the pending chunks of a backfill job, checkpointing each one as it is stored.
+
+    Chunks are downloaded on a thread pool and written from the calling thread, like
+    Stocks.refresh_data. A chunk's rows and its 'done' mark are committed together, so after a
+    crash the next run downloads exactly the chunks that were not stored. A failed download is
+    retried after base_delay * 2 ** (attempts - 1) seconds, capped at max_delay, until
+    max_attempts is reached.
+
+    yfinance reports network errors and rate limits as an empty frame, so an empty download
+    for a window with trading sessions counts as a failure when the ticker already has bars
+    stored before the window's end. Without earlier bars the ticker was not listed yet, and
+    the chunk is done with no rows, so chunks from before a listing are downloaded once.
+
+    Parameters:
+        stocks (Stocks): Provides the connections and the download functions
+        job_id (int): Job created by create_job
+        max_workers (int): Number of downloads in flight at once
+        requests_per_second (float, optional): Upper bound on requests sent to the Yahoo host
+        max_attempts (int): Downloads tried per chunk before it is marked failed
+        base_delay (float): Seconds before the first retry
+        max_delay (float): Longest wait between two attempts
+        jitter (float): Each delay is stretched by a random fraction up to jitter, so workers
+                        that failed together do not retry together
+        clock (callable): Returns the current time in seconds
+        sleep (callable): Waits a number of seconds
+        calendar (str, TradingCalendar or dict): Sessions a chunk must have data for, see
+                                                 Stocks.find_gaps; tickers it does not cover
+                                                 are expected to trade every weekday
+    """
+
+    def __init__(self, stocks, job_id: int, max_workers: int = 1, requests_per_second: Optional[float] = None,
+                 max_attempts: int = 5, base_delay: float = 2.0, max_delay: float = 300.0, jitter: float = 0.1,
+                 clock: Callable[[], float] = time.time, sleep: Callable[[float], None] = time.sleep,
+                 calendar='nyse'):
+        self.stocks = stocks
+        self.job_id = job_id
+        self.max_workers = max(1, max_workers)
+        self.rate_limiter = None
+        if requests_per_second is not None:
+            self.rate_limiter = HostRateLimiter(requests_per_second, burst=self.max_workers)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.clock = clock
+        self.sleep = sleep
+        self.calendar = calendar
+
+    def run(self, retry_failed: bool = False) -> None:
+        """
+        Process chunks until every one is done or failed.
+
+        Parameters:
+            retry_failed (bool): Give chunks that already ran out of attempts a fresh set first
+        """
+        with self.stocks._writer() as connection, connection:
+            if retry_failed:
+                connection.execute(
+                    "UPDATE backfill_chunks SET status = 'pending', attempts = 0, next_attempt = 0 "
+                    "WHERE job_id = ? AND status = 'failed'", (self.job_id,))
+            self._set_job_status(connection, 'running')
+
+        while True:
+            due, wait = self._due_chunks()
+            if due:
+                self._download(due)
+            elif wait is None:
+                break
+            else:
+                self.sleep(wait)
+
+        with self.stocks._writer() as connection, connection:
+            failed = connection.execute(
+                "SELECT COUNT(*) FROM backfill_chunks WHERE job_id = ? AND status = 'failed'", (self.job_id,)
+            ).fetchone()[0]
+            self._set_job_status(connection, 'failed' if failed else 'done')
+
+    def _due_chunks(self):
+        """Return the pending chunks due now and, if there are none, the seconds until the next one"""
+        now = self.clock()
+        with self.stocks._reader() as connection:
+            due = connection.execute(
+                "SELECT ticker, start_date, end_date, attempts FROM backfill_chunks "
+                "WHERE job_id = ? AND status = 'pending' AND next_attempt <= ? ORDER BY start_date, ticker",
+                (self.job_id, now)
+            ).fetchall()
+            if due:
+                return due, None
+            upcoming = connection.execute(
+                "SELECT MIN(next_attempt) FROM backfill_chunks WHERE job_id = ? AND status = 'pending'",
+                (self.job_id,)
+            ).fetchone()[0]
+        return [], None if upcoming is None else max(0.0, upcoming - now)
+
+    def _download(self, chunks):
+        from .api import YAHOO_HOST
+
+        def fetch(ticker, start, end):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(YAHOO_HOST)
+            return self.stocks._fetch_history(ticker, start, end)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(fetch, *chunk[:3]): chunk for chunk in chunks}
+            for future in as_completed(futures):
+                ticker, start, end, attempts = futures[future]
+                try:
+                    frame = future.result()
+                    if frame.empty and self._has_sessions(ticker, start, end) and self._listed_before(ticker, end):
+                        raise LookupError(f"No data returned for {ticker} from {start} to {end}")
+                    self._store_chunk(ticker, start, end, frame)
+                except Exception as e:
+                    self._fail_chunk(ticker, start, end, attempts + 1, e)
+
+    def _has_sessions(self, ticker, start, end):
+        """Return whether the exchange of a ticker trades in [start, end)"""
+        from .calendars import calendar_for, get_calendar
+
+        calendar = calendar_for(self.calendar, ticker) or get_calendar('weekday')
+        return len(calendar.sessions(start, parse_date(end) - timedelta(days=1))) > 0
+
+    def _listed_before(self, ticker, end):
+        """Return whether the ticker has bars stored before end, i.e. it was already trading"""
+        with self.stocks._reader() as connection:
+            return connection.execute(
+                'SELECT 1 FROM ticker_bars b JOIN tickers t ON t.id = b.ticker_id '
+                'WHERE t.ticker = ? AND b.day < ? LIMIT 1', (ticker, to_epoch_day(end))
+            ).fetchone() is not None
+
+    def _store_chunk(self, ticker, start, end, frame):
+        """Write a chunk's rows and mark it done in one transaction"""
+        with self.stocks._writer() as connection, connection:
+            if not frame.empty:
+                connection.executemany(INSERT_TICKER_BARS_SQL, history_to_bars(ticker_id(connection, ticker), frame))
+            connection.execute(
+                "UPDATE backfill_chunks SET status = 'done', attempts = attempts + 1, rows = ?, error = NULL, "
+                "updated = ? WHERE job_id = ? AND ticker = ? AND start_date = ?",
+                (len(frame), self.clock(), self.job_id, ticker, start)
+            )
+        metrics.increment('backfill.chunks', status='done')
+        metrics.increment('rows.inserted', len(frame), table='ticker_data')
+        metrics.emit('backfill.chunk_done', "Backfilled {rows} data points for {ticker} from {start} to {end}",
+                     ticker=ticker, start=start, end=end, rows=len(frame))
+
+    def _fail_chunk(self, ticker, start, end, attempts, error):
+        """Schedule a retry with exponential backoff, or mark the chunk failed after max_attempts"""
+        now = self.clock()
+        if attempts >= self.max_attempts:
+            status, next_attempt = 'failed', now
+        else:
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            status, next_attempt = 'pending', now + delay * (1 + self.jitter * random.random())
+        with self.stocks._writer() as connection, connection:
+            connection.execute(
+                "UPDATE backfill_chunks SET status = ?, attempts = ?, next_attempt = ?, error = ?, updated = ? "
+                "WHERE job_id = ? AND ticker = ? AND start_date = ?",
+                (status, attempts, next_attempt, str(error), now, self.job_id, ticker, start)
+            )
+        metrics.increment('backfill.chunks', status='retry' if status == 'pending' else 'failed')
+        metrics.emit('backfill.chunk_error',
+                     "Error backfilling {ticker} from {start} to {end} (attempt {attempts}): {error}",
+                     logging.WARNING if status == 'pending' else logging.ERROR,
+                     ticker=ticker, start=start, end=end, attempts=attempts, error=str(error),
+                     retry_in=round(next_attempt - now, 3) if status == 'pending' else None)
+
+    def _set_job_status(self, connection, status):
+        connection.execute('UPDATE backfill_jobs SET status = ?, updated = ? WHERE id = ?',
+                           (status, self.clock(), self.job_id))
@@ -0,0 +1,222 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Returned by RangeCache.get when a key is not cached, since None/[] are valid cached results
+MISSING = object()
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate the memory held by a cached query result in bytes.
+
+    Parameters:
+        value: A list of row tuples, a DataFrame, a dict of NumPy arrays or a BarSeries
+
+    Returns:
+        int: Estimated size in bytes
+    """
+    if hasattr(value, 'memory_usage'):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(getattr(v, 'nbytes', sys.getsizeof(v)) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        size = sys.getsizeof(value)
+        for row in value:
+            size += sys.getsizeof(row)
+            if isinstance(row, tuple):
+                size += sum(sys.getsizeof(item) for item in row)
+        return size
+    return sys.getsizeof(value)
+
+def copy_result(value: Any) -> Any:
+    """Copy a cached result so callers cannot mutate what is stored in the cache"""
+    if isinstance(value, list):
+        return list(value)
+    if isinstance(value, dict):
+        return {key: item.copy() for key, item in value.items()}
+    if hasattr(value, 'copy'):
+        return value.copy()
+    return value
+
+class RangeCache:
+    """
+    Memory-bounded LRU cache of ticker range query results.
+
+    Entries are grouped by ticker so that every cached range of a ticker can be dropped as soon
+    as that ticker's rows change. Attach the cache to a connection to have SQLite itself report
+    inserts, updates and deletes on ticker_data.
+
+    Each ticker also has a generation, bumped by every invalidation. Readers take it before
+    running their query and pass it to put(), which drops the result if a write to the ticker
+    happened in between, so a result read just before a concurrent write is never cached.
+
+    Parameters:
+        max_bytes (int): Upper bound on the estimated size of all cached results
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._keys_by_ticker: Dict[str, set] = {}
+        self._bytes = 0
+        # Invalidations per ticker, and clear() calls, which invalidate every ticker
+        self._generations: Dict[str, int] = {}
+        self._clears = 0
+        # Tickers written by a transaction of an attached connection that may not be committed yet
+        self._pending = set()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Look up a cached result and mark it as most recently used.
+
+        Returns:
+            The cached value, or MISSING if the key is not cached
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self, ticker: str) -> Optional[tuple]:
+        """
+        Return the current generation of a ticker, to be read before querying its rows.
+
+        Returns:
+            tuple: Opaque token for put(), or None while an attached connection holds an open
+                   transaction that wrote the ticker, as readers cannot see those rows yet
+        """
+        with self._lock:
+            if self._pending:
+                if any(connection.in_transaction for connection in self._connections):
+                    if ticker in self._pending or None in self._pending:
+                        return None
+                else:
+                    self._pending.clear()
+            return self._clears, self._generations.get(ticker, 0)
+
+    def put(self, key: Hashable, ticker: str, value: Any, generation: Optional[tuple] = MISSING) -> None:
+        """
+        Cache a result for ticker, evicting least recently used entries to stay within max_bytes.
+
+        Parameters:
+            key (Hashable): Cache key of the query
+            ticker (str): Ticker the result belongs to
+            value: The query result
+            generation (tuple, optional): Value of generation(ticker) taken before the query.
+                                          The result is dropped if it is None or out of date
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes or generation is None:
+            return
+        with self._lock:
+            if generation is not MISSING and generation != (self._clears, self._generations.get(ticker, 0)):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (ticker, value, size)
+            self._keys_by_ticker.setdefault(ticker, set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, ticker: str) -> None:
+        """Drop every cached result of a ticker"""
+        with self._lock:
+            self._generations[ticker] = self._generations.get(ticker, 0) + 1
+            keys = self._keys_by_ticker.pop(ticker, None)
+            if not keys:
+                return
+            for key in keys:
+                _, _, size = self._entries.pop(key)
+                self._bytes -= size
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop all cached results; counters are kept"""
+        with self._lock:
+            self._clears += 1
+            self._entries.clear()
+            self._keys_by_ticker.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return cache counters for sizing the cache.
+
+        Returns:
+            dict: hits, misses, evictions, invalidations, entries, bytes and max_bytes
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
+
+    def attach(self, connection) -> None:
+        """
+        Invalidate entries whenever ticker_data changes through this connection.
+
+        Installs TEMP triggers on ticker_bars, the table behind the ticker_data view, that call
+        back into the cache with the affected ticker. Writes made through other connections or
+        processes are not seen.
+        """
+        with self._lock:
+            if connection not in self._connections:
+                self._connections.append(connection)
+        connection.create_function('stocks_cache_invalidate', 1, self._invalidate_from_sql)
+        for event, row in (('INSERT', 'NEW'), ('UPDATE', 'OLD'), ('DELETE', 'OLD')):
+            connection.execute(f'''
+                CREATE TEMP TRIGGER IF NOT EXISTS stocks_cache_{event.lower()}
+                AFTER {event} ON main.ticker_bars
+                BEGIN
+                    SELECT stocks_cache_invalidate((SELECT ticker FROM tickers WHERE id = {row}.ticker_id));
+                END
+            ''')
+        # An UPDATE can also move a row to another ticker
+        connection.execute('''
+            CREATE TEMP TRIGGER IF NOT EXISTS stocks_cache_update_new
+            AFTER UPDATE OF ticker_id ON main.ticker_bars
+            BEGIN
+                SELECT stocks_cache_invalidate((SELECT ticker FROM tickers WHERE id = NEW.ticker_id));
+            END
+        ''')
+
+    def _invalidate_from_sql(self, ticker):
+        # Runs before the write is committed. The ticker row may already be gone, so its name
+        # is unknown: drop everything, and mark every ticker pending with None
+        with self._lock:
+            self._pending.add(ticker)
+        if ticker is None:
+            self.clear()
+        else:
+            self.invalidate(ticker)
+        return None
+
+    def _remove(self, key):
+        ticker, _, size = self._entries.pop(key)
+        self._bytes -= size
+        keys = self._keys_by_ticker.get(ticker)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_ticker[ticker]
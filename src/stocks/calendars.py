@@ -0,0 +1,172 @@
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Union
+
+def easter_sunday(year: int) -> date:
+    """Date of Western Easter Sunday (anonymous Gregorian algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """The nth (1-based) weekday (Monday is 0) of a month; n = -1 is the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def observed(holiday: date) -> date:
+    """Move a Saturday holiday to Friday and a Sunday holiday to Monday"""
+    if holiday.weekday() == 5:
+        return holiday - timedelta(days=1)
+    if holiday.weekday() == 6:
+        return holiday + timedelta(days=1)
+    return holiday
+
+class TradingCalendar:
+    """
+    Exchange calendar of trading sessions: every weekday that is not a holiday.
+
+    The base class has no holidays. Subclass it and override holidays() to describe an
+    exchange, then pass an instance wherever a calendar is accepted or add it to CALENDARS.
+    """
+
+    name = 'weekday'
+
+    # Monday to Sunday, as understood by numpy.is_busday
+    weekmask = '1111100'
+
+    def holidays(self, year: int) -> List[date]:
+        """Weekday closures in a year"""
+        return []
+
+    def sessions(self, start: Union[str, date], end: Union[str, date]):
+        """
+        Return the trading sessions between two dates, both included.
+
+        Parameters:
+            start (str or date): First date, 'YYYY-MM-DD'
+            end (str or date): Last date, 'YYYY-MM-DD'
+
+        Returns:
+            numpy.ndarray: Session dates as datetime64[D], ascending
+        """
+        import numpy as np
+
+        start, end = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+        if end < start:
+            return np.array([], dtype='datetime64[D]')
+        days = np.arange(start, end + 1, dtype='datetime64[D]')
+        first_year = start.astype(object).year
+        last_year = end.astype(object).year
+        holidays = [day for year in range(first_year, last_year + 1) for day in self._holidays(year)]
+        return days[np.is_busday(days, weekmask=self.weekmask, holidays=holidays)]
+
+    def is_session(self, day: Union[str, date]) -> bool:
+        """Return whether the exchange trades on a date"""
+        return len(self.sessions(day, day)) == 1
+
+    def covers(self, ticker: str) -> bool:
+        """Return whether a Yahoo Finance symbol trades on this calendar"""
+        return True
+
+    def _holidays(self, year):
+        # Cached per instance and year; the holiday rules never change for a given year
+        cache = self.__dict__.setdefault('_holiday_cache', {})
+        if year not in cache:
+            cache[year] = [holiday.isoformat() for holiday in self.holidays(year)]
+        return cache[year]
+
+class NYSECalendar(TradingCalendar):
+    """
+    New York Stock Exchange full-day closures, computed from the holiday rules in force since
+    1998, plus unscheduled closures listed in SPECIAL_CLOSURES.
+    """
+
+    name = 'nyse'
+
+    SPECIAL_CLOSURES = (
+        date(2001, 9, 11), date(2001, 9, 12), date(2001, 9, 13), date(2001, 9, 14),
+        date(2004, 6, 11),
+        date(2007, 1, 2),
+        date(2012, 10, 29), date(2012, 10, 30),
+        date(2018, 12, 5),
+        date(2025, 1, 9),
+    )
+
+    # Index symbols computed from prices of US exchanges that follow their sessions
+    US_INDICES = frozenset({
+        '^GSPC', '^SPX', '^DJI', '^DJT', '^DJU', '^IXIC', '^NDX', '^NYA', '^XAX', '^RUT', '^VIX', '^VXN', '^VVIX',
+    })
+
+    def covers(self, ticker: str) -> bool:
+        # Listings of other exchanges carry a suffix (7203.T, FTSEMIB.MI), futures and currencies
+        # an '=' (CL=F, EURUSD=X) and indices a '^'; only the US indices above follow NYSE sessions
+        if ticker.startswith('^'):
+            return ticker in self.US_INDICES
+        return '.' not in ticker and '=' not in ticker
+
+    def holidays(self, year: int) -> List[date]:
+        days = []
+        new_year = date(year, 1, 1)
+        # A New Year's Day falling on Saturday is not observed on the Friday before
+        if new_year.weekday() != 5:
+            days.append(observed(new_year))
+        days.extend([
+            nth_weekday(year, 1, 0, 3),                 # Martin Luther King Jr. Day
+            nth_weekday(year, 2, 0, 3),                 # Washington's Birthday
+            easter_sunday(year) - timedelta(days=2),    # Good Friday
+            nth_weekday(year, 5, 0, -1),                # Memorial Day
+            observed(date(year, 7, 4)),                 # Independence Day
+            nth_weekday(year, 9, 0, 1),                 # Labor Day
+            nth_weekday(year, 11, 3, 4),                # Thanksgiving Day
+            observed(date(year, 12, 25)),               # Christmas Day
+        ])
+        if year >= 2022:
+            days.append(observed(date(year, 6, 19)))    # Juneteenth
+        days.extend(day for day in self.SPECIAL_CLOSURES if day.year == year)
+        return sorted(days)
+
+CALENDARS = {
+    'weekday': TradingCalendar,
+    'nyse': NYSECalendar,
+}
+
+@lru_cache(maxsize=None)
+def _named_calendar(name):
+    if name not in CALENDARS:
+        raise ValueError(f"Unknown trading calendar '{name}'; choose from {', '.join(CALENDARS)}")
+    return CALENDARS[name]()
+
+def get_calendar(calendar: Union[str, TradingCalendar] = 'nyse') -> TradingCalendar:
+    """Return a calendar instance from its name in CALENDARS, or the instance itself"""
+    if isinstance(calendar, TradingCalendar):
+        return calendar
+    return _named_calendar(calendar)
+
+def calendar_for(calendar: Union[str, TradingCalendar, Dict[str, Union[None, str, TradingCalendar]]],
+                 ticker: str) -> Optional[TradingCalendar]:
+    """
+    Return the calendar a ticker's sessions are checked against, or None if there is none.
+
+    Parameters:
+        calendar (str, TradingCalendar or dict): One calendar for every ticker, used only for the
+                                                 tickers it covers, or a dict of ticker symbol to
+                                                 calendar; tickers missing from the dict or mapped
+                                                 to None have no calendar
+        ticker (str): Ticker symbol
+    """
+    if isinstance(calendar, dict):
+        calendar = calendar.get(ticker)
+        return None if calendar is None else get_calendar(calendar)
+    calendar = get_calendar(calendar)
+    return calendar if calendar.covers(ticker) else None
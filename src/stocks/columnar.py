@@ -0,0 +1,65 @@
+TICKER_DATA_COLUMNS = ['ticker', 'date', 'open', 'high', 'low', 'close', 'volume', 'dividends', 'stocksplits']
+
+# NumPy dtype used for each known column; anything not listed is read as float64
+COLUMN_DTYPES = {
+    'ticker': object,
+    'date': 'datetime64[D]',
+    'news_id': object,
+    'news_summary': object,
+    'sentiment': object,
+}
+
+def cursor_to_arrays(cursor, arraysize=10000):
+    """
+    Read an executed cursor into one NumPy array per column.
+
+    Rows are pulled with fetchmany and each batch is transposed straight into typed arrays, so
+    the full result never exists as a list of tuples. NULL numeric values become NaN.
+
+    Parameters:
+        cursor (sqlite3.Cursor): Cursor on which a SELECT has been executed
+        arraysize (int): Number of rows converted per batch
+
+    Returns:
+        dict: Column name to NumPy array, in the column order of the query
+    """
+    import numpy as np
+
+    names = [column[0] for column in cursor.description]
+    dtypes = [COLUMN_DTYPES.get(name, 'float64') for name in names]
+    chunks = [[] for _ in names]
+
+    while True:
+        batch = cursor.fetchmany(arraysize)
+        if not batch:
+            break
+        for chunk, dtype, values in zip(chunks, dtypes, zip(*batch)):
+            chunk.append(np.array(values, dtype=dtype))
+
+    if not chunks[0]:
+        return empty_arrays(names)
+    return {name: np.concatenate(chunk) for name, chunk in zip(names, chunks)}
+
+def empty_arrays(names):
+    """Return a dict of zero-length arrays with the same dtypes cursor_to_arrays would use"""
+    import numpy as np
+
+    return {name: np.array([], dtype=COLUMN_DTYPES.get(name, 'float64')) for name in names}
+
+def arrays_to_frame(arrays, index='date'):
+    """
+    Build a DataFrame from cursor_to_arrays output without copying the columns again.
+
+    Parameters:
+        arrays (dict): Column name to NumPy array
+        index (str, optional): Column used as the index. If None, a default RangeIndex is used
+
+    Returns:
+        DataFrame: Frame indexed by the index column, which is dropped from the columns
+    """
+    import pandas as pd
+
+    if index is None:
+        return pd.DataFrame(arrays, copy=False)
+    columns = {name: values for name, values in arrays.items() if name != index}
+    return pd.DataFrame(columns, index=pd.Index(arrays[index], name=index), copy=False)
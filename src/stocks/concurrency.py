@@ -0,0 +1,74 @@
+import threading
+import time
+from typing import Dict, Optional
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket limiting how often a resource may be hit.
+
+    Parameters:
+        rate (float): Sustained number of acquisitions allowed per second
+        burst (int): Number of acquisitions allowed back to back before throttling
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be greater than zero")
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """
+        Block until a token is available.
+
+        Returns:
+            float: Number of seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class HostRateLimiter:
+    """
+    Keeps one RateLimiter per remote host so that each host is throttled independently.
+
+    Parameters:
+        rate (float): Default requests per second for any host
+        burst (int): Default burst size for any host
+        per_host (dict, optional): Mapping of host name to (rate, burst) overrides
+    """
+
+    def __init__(self, rate: float, burst: int = 1, per_host: Optional[Dict[str, tuple]] = None):
+        self.rate = rate
+        self.burst = burst
+        self.per_host = dict(per_host or {})
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter_for(self, host: str) -> RateLimiter:
+        """Return the limiter for a host, creating it on first use"""
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                rate, burst = self.per_host.get(host, (self.rate, self.burst))
+                limiter = RateLimiter(rate, burst)
+                self._limiters[host] = limiter
+            return limiter
+
+    def acquire(self, host: str) -> float:
+        """Block until a request to host is allowed; returns seconds waited"""
+        return self.limiter_for(host).acquire()
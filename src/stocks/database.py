@@ -1,88 +1,257 @@
 import sqlite3
+from contextlib import contextmanager
+
+from . import metrics
+from .pool import ConnectionPool
+from .records import BarSeries
+from .schema import DELETE_TICKER_BARS_SQL, TICKER_BARS_SELECT, TICKER_DATA_SELECT, ensure_schema
+from .utils import iter_cursor
+
+# Named connection tuning profiles. Values are applied in order with PRAGMA statements;
+# page_size comes first because it only takes effect before the database file is written.
+PROFILES = {
+    'default': {},
+    'performance': {
+        'page_size': 8192,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -64000,        # negative values are KiB, so ~64 MB
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    # Applied temporarily by bulk_load(). Trades durability on power loss for far fewer
+    # fsyncs; the journal mode is left alone so readers are not disturbed.
+    'bulk_load': {
+        'synchronous': 'OFF',
+        'cache_size': -256000,
+        'temp_store': 'MEMORY',
+    },
+}
+
+PRAGMA_NAMES = ('page_size', 'journal_mode', 'synchronous', 'cache_size', 'mmap_size',
+                'temp_store', 'busy_timeout')
+
+def resolve_profile(profile):
+    """Return the pragma mapping for a profile name or an explicit dict of pragmas"""
+    if profile is None:
+        return {}
+    if isinstance(profile, str):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown profile '{profile}'; choose from {', '.join(PROFILES)}")
+        return dict(PROFILES[profile])
+    unknown = [name for name in profile if name not in PRAGMA_NAMES]
+    if unknown:
+        raise ValueError(f"Unsupported pragmas {unknown}; choose from {', '.join(PRAGMA_NAMES)}")
+    return dict(profile)
+
+def apply_pragmas(connection, profile):
+    """
+    Apply a tuning profile to a connection.
+    
+    Parameters:
+        connection (sqlite3.Connection): Connection to tune
+        profile (str or dict): Name from PROFILES or a mapping of pragma name to value
+    """
+    pragmas = resolve_profile(profile)
+    for name in PRAGMA_NAMES:
+        if name in pragmas:
+            value = pragmas[name]
+            if not isinstance(value, int) and not str(value).isalnum():
+                raise ValueError(f"Invalid value {value!r} for pragma {name}")
+            connection.execute(f'PRAGMA {name} = {value}')
+
+def read_pragmas(connection, names):
+    """Return the current value of each named pragma"""
+    values = {}
+    for name in names:
+        if name not in PRAGMA_NAMES:
+            raise ValueError(f"Unsupported pragma {name}")
+        values[name] = connection.execute(f'PRAGMA {name}').fetchone()[0]
+    return values
+
+@contextmanager
+def bulk_load(connection):
+    """
+    Switch a connection into the bulk_load profile and restore its previous settings on exit.
+    
+    Parameters:
+        connection (sqlite3.Connection): Connection used for the large write
+    """
+    previous = read_pragmas(connection, PROFILES['bulk_load'])
+    apply_pragmas(connection, 'bulk_load')
+    try:
+        yield connection
+    finally:
+        apply_pragmas(connection, previous)
+
+def optimize(connection, analyze=False):
+    """
+    Refresh the query planner statistics.
+
+    Parameters:
+        connection (sqlite3.Connection): Writable connection to the database
+        analyze (bool): Run a full ANALYZE of every table and index first. Otherwise PRAGMA
+                        optimize only re-analyzes tables whose statistics look out of date,
+                        which is cheap enough to run after every large refresh
+    """
+    if analyze:
+        connection.execute('ANALYZE')
+    # Bound the work ANALYZE may do per index when run from PRAGMA optimize
+    limit = connection.execute('PRAGMA analysis_limit').fetchone()[0]
+    connection.execute('PRAGMA analysis_limit = 1000')
+    try:
+        connection.execute('PRAGMA optimize')
+    finally:
+        connection.execute(f'PRAGMA analysis_limit = {limit}')
+    connection.commit()
 
 class Database:
-    def __init__(self, db_name='stocks.db'):
-        self.connection = sqlite3.connect(db_name)
+    def __init__(self, db_name='stocks.db', profile=None, pool_size=None):
+        """
+        Parameters:
+            db_name (str): Path of the SQLite database file
+            profile (str or dict, optional): Tuning profile from PROFILES, e.g. 'performance',
+                                             or a mapping of pragma name to value
+            pool_size (int, optional): If set, self.pool is a ConnectionPool with up to pool_size
+                                       read-only connections and self.connection as its writer
+        """
+        self.connection = sqlite3.connect(db_name, check_same_thread=pool_size is None)
+        apply_pragmas(self.connection, profile)
         self.create_tables()
+        self.pool = None
+        if pool_size is not None:
+            self.pool = ConnectionPool(db_name, max_readers=pool_size, profile=profile,
+                                       writer=self.connection)
 
     def create_tables(self):
-        with self.connection:
-            self.connection.execute('''
-                CREATE TABLE IF NOT EXISTS tickers (
-                    ticker TEXT PRIMARY KEY
-                )
-            ''')
-            self.connection.execute('''
-                CREATE TABLE IF NOT EXISTS ticker_data (
-                    ticker TEXT,
-                    date DATE,
-                    open NUMERIC,
-                    high NUMERIC,
-                    low NUMERIC,
-                    close NUMERIC,
-                    volume NUMERIC,
-                    dividends NUMERIC,
-                    stocksplits NUMERIC,
-                    PRIMARY KEY (ticker, date)
-                )
-            ''')
-            self.connection.execute('''
-                CREATE TABLE IF NOT EXISTS ticker_news (
-                    ticker TEXT,
-                    date DATE,
-                    news_id TEXT,
-                    news_summary TEXT,
-                    sentiment TEXT,
-                    PRIMARY KEY (ticker, date, news_id)
-                )
-            ''')
+        """Create the tables or migrate them to the current schema version, and sync the indexes"""
+        ensure_schema(self.connection)
+
+    @contextmanager
+    def reader(self):
+        """Borrow a connection for reading: a pooled read-only connection if pooling is enabled"""
+        if self.pool is None:
+            yield self.connection
+        else:
+            with self.pool.reader() as connection:
+                yield connection
+
+    @contextmanager
+    def writer(self):
+        """Borrow the writer connection, serialized between threads if pooling is enabled"""
+        if self.pool is None:
+            yield self.connection
+        else:
+            with self.pool.writer() as connection:
+                yield connection
 
     def add_ticker(self, ticker):
-        with self.connection:
-            self.connection.execute('INSERT INTO tickers (ticker) VALUES (?)', (ticker,))
+        with self.writer() as connection, connection:
+            connection.execute('INSERT INTO tickers (ticker) VALUES (?)', (ticker,))
 
     def remove_ticker(self, ticker):
-        with self.connection:
-            self.connection.execute('DELETE FROM tickers WHERE ticker = ?', (ticker,))
-            self.connection.execute('DELETE FROM ticker_data WHERE ticker = ?', (ticker,))
+        with self.writer() as connection, connection:
+            connection.execute(DELETE_TICKER_BARS_SQL, (ticker,))
+            connection.execute('DELETE FROM tickers WHERE ticker = ?', (ticker,))
 
     def fetch_tickers(self):
         """Returns a list of all tickers in the database"""
-        cursor = self.connection.cursor()
-        cursor.execute('SELECT ticker FROM tickers')
-        return [row[0] for row in cursor.fetchall()]
+        with self.reader() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT ticker FROM tickers')
+            return [row[0] for row in cursor.fetchall()]
 
     def insert_ticker_data(self, ticker, date, open_price, high, low, close, volume, dividends, stocksplits):
         """Inserts stock data for a ticker on a specific date"""
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            INSERT INTO ticker_data 
-            (ticker, date, open, high, low, close, volume, dividends, stocksplits) 
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (ticker, date, open_price, high, low, close, volume, dividends, stocksplits))
-        self.connection.commit()
-
-    def fetch_ticker_data(self, ticker):
-        """Returns all data for a specific ticker"""
-        cursor = self.connection.cursor()
-        cursor.execute('SELECT * FROM ticker_data WHERE ticker = ? ORDER BY date DESC', (ticker,))
-        return cursor.fetchall()
+        with self.writer() as connection, metrics.timer('sql.seconds', op='insert_ticker_data'):
+            cursor = connection.cursor()
+            cursor.execute('''
+                INSERT INTO ticker_data 
+                (ticker, date, open, high, low, close, volume, dividends, stocksplits) 
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (ticker, date, open_price, high, low, close, volume, dividends, stocksplits))
+            connection.commit()
+        metrics.increment('rows.inserted', table='ticker_data')
+
+    def fetch_ticker_data(self, ticker, bars=False):
+        """Returns all data for a specific ticker, as a BarSeries instead of tuples if bars is set"""
+        with self.reader() as connection, metrics.timer('sql.seconds', op='fetch_ticker_data'):
+            cursor = connection.cursor()
+            select = TICKER_BARS_SELECT if bars else TICKER_DATA_SELECT
+            cursor.execute(select + ' WHERE t.ticker = ? ORDER BY b.day DESC', (ticker,))
+            if bars:
+                return BarSeries.from_cursor(cursor)
+            return cursor.fetchall()
+
+    def iter_ticker_data(self, ticker, arraysize=1000, batches=False):
+        """Streams all data for a specific ticker, arraysize rows at a time"""
+        return self._iter_query(TICKER_DATA_SELECT + ' WHERE t.ticker = ? ORDER BY b.day DESC', (ticker,),
+                                arraysize, batches)
 
     def insert_ticker_news(self, ticker, date, news_id, news_summary, sentiment):
         """Inserts news for a ticker on a specific date"""
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            INSERT INTO ticker_news 
-            (ticker, date, news_id, news_summary, sentiment) 
-            VALUES (?, ?, ?, ?, ?)
-        ''', (ticker, date, news_id, news_summary, sentiment))
-        self.connection.commit()
+        with self.writer() as connection, metrics.timer('sql.seconds', op='insert_ticker_news'):
+            cursor = connection.cursor()
+            cursor.execute('''
+                INSERT INTO ticker_news 
+                (ticker, date, news_id, news_summary, sentiment) 
+                VALUES (?, ?, ?, ?, ?)
+            ''', (ticker, date, news_id, news_summary, sentiment))
+            connection.commit()
+        metrics.increment('rows.inserted', table='ticker_news')
 
     def fetch_ticker_news(self, ticker):
         """Returns all news for a specific ticker"""
-        cursor = self.connection.cursor()
-        cursor.execute('SELECT * FROM ticker_news WHERE ticker = ? ORDER BY date DESC', (ticker,))
-        return cursor.fetchall()
+        with self.reader() as connection, metrics.timer('sql.seconds', op='fetch_ticker_news'):
+            cursor = connection.cursor()
+            cursor.execute('SELECT * FROM ticker_news WHERE ticker = ? ORDER BY date DESC', (ticker,))
+            return cursor.fetchall()
+
+    def iter_ticker_news(self, ticker=None, arraysize=1000, batches=False):
+        """Streams news for a specific ticker, or for all tickers if ticker is None"""
+        if ticker is None:
+            return self._iter_query('SELECT * FROM ticker_news ORDER BY ticker, date DESC', (),
+                                    arraysize, batches)
+        return self._iter_query('SELECT * FROM ticker_news WHERE ticker = ? ORDER BY date DESC', (ticker,),
+                                arraysize, batches)
+
+    def _iter_query(self, query, params, arraysize, batches):
+        with self.reader() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, params)
+            yield from iter_cursor(cursor, arraysize, batches)
+
+    @contextmanager
+    def bulk_load(self):
+        """
+        Context manager that switches the connection to the bulk_load profile.
+
+        The writer is held throughout, so on a pooled Database other threads' writes wait
+        instead of running with the bulk settings.
+        """
+        with self.writer() as connection, bulk_load(connection):
+            yield connection
+
+    def optimize(self, analyze=False):
+        """Refresh the query planner statistics, see stocks.database.optimize"""
+        with self.writer() as connection, metrics.timer('sql.seconds', op='optimize'):
+            optimize(connection, analyze)
+
+    def export_parquet(self, path, tables=('ticker_data', 'ticker_news'), partition_by='ticker', incremental=False,
+                       batch_size=65536, compression='snappy'):
+        """Stream tables to partitioned Parquet files under path, see stocks.parquet.export_parquet"""
+        from .parquet import export_parquet
+        return export_parquet(self.reader, self.writer, path, tables, partition_by, incremental, batch_size,
+                              compression)
+
+    def import_parquet(self, path, tables=('ticker_data', 'ticker_news'), batch_size=65536):
+        """Load an export_parquet directory back into the database, see stocks.parquet.import_parquet"""
+        from .parquet import import_parquet
+        return import_parquet(self.writer, path, tables, batch_size)
 
     def close(self):
-        self.connection.close()
\ No newline at end of file
+        if self.pool is not None:
+            self.pool.close()
+        else:
+            self.connection.close()
\ No newline at end of file
@@ -0,0 +1,303 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# How the cache treats a request:
+#   cache   serve fresh entries, fetch and store the rest
+#   record  always fetch live and store the response, replacing any cached one
+#   replay  serve stored entries whatever their age and never touch the network
+#   off     always fetch live and store nothing
+MODES = ('cache', 'record', 'replay', 'off')
+
+# Default time to live per endpoint, in seconds. None never expires.
+DEFAULT_TTL = {
+    'history': 24 * 3600,
+    'news': 15 * 60,
+}
+
+class FetchCacheMiss(LookupError):
+    """Raised in replay mode when a request has no stored response"""
+
+class FetchCache:
+    """
+    On-disk cache of Yahoo Finance responses keyed by (endpoint, ticker, start, end).
+
+    Responses are encoded as JSON (see encode_response) and zlib-compressed into a single
+    SQLite file, so a recording can be shared without trusting it to run code. Entries expire
+    after their endpoint's time to live, and the least recently used ones are evicted once the
+    file holds more than max_bytes of payload. The cache may be shared by the fetch worker threads.
+
+    In 'replay' mode a dated request that was not recorded exactly is served from the recording
+    of the same endpoint and ticker that starts no later than it and ends last, trimmed to the
+    requested window. Windows ending today therefore replay on later days as well, with the data
+    that existed when they were recorded.
+
+    yfinance reports failed requests as empty frames, so empty responses are never cached in
+    'cache' mode. 'record' mode stores them, so a replay sees the responses the recording did.
+
+    Parameters:
+        path (str): Path of the cache file
+        mode (str): One of MODES
+        ttl (float or dict, optional): Time to live in seconds for every endpoint, or a mapping
+                                       of endpoint to seconds merged over DEFAULT_TTL
+        max_bytes (int): Upper bound on the total compressed payload size
+    """
+
+    def __init__(self, path: str, mode: str = 'cache', ttl: Union[None, float, Dict[str, Optional[float]]] = None,
+                 max_bytes: int = 512 * 1024 * 1024):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}, got '{mode}'")
+        self.path = path
+        self.mode = mode
+        if isinstance(ttl, dict) or ttl is None:
+            self.ttl = dict(DEFAULT_TTL, **(ttl or {}))
+            self.default_ttl = None
+        else:
+            self.ttl = {}
+            self.default_ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS responses (
+                    endpoint TEXT,
+                    ticker TEXT,
+                    start TEXT,
+                    end TEXT,
+                    created REAL,
+                    accessed REAL,
+                    size INTEGER,
+                    payload BLOB,
+                    PRIMARY KEY (endpoint, ticker, start, end)
+                )
+            ''')
+
+    def fetch(self, endpoint: str, ticker: str, start: Optional[str], end: Optional[str],
+              fetch: Callable[[], Any]) -> Any:
+        """
+        Return the response for a request, calling fetch() only when the mode requires it.
+
+        Parameters:
+            endpoint (str): Name of the API call, e.g. 'history' or 'news'
+            ticker (str): Ticker symbol
+            start (str, optional): Start of the requested window, 'YYYY-MM-DD'
+            end (str, optional): End of the requested window, 'YYYY-MM-DD'
+            fetch (callable): Performs the live request
+
+        Returns:
+            Whatever fetch returns, or its stored copy
+
+        Raises:
+            FetchCacheMiss: In replay mode, if nothing is stored for the request
+        """
+        value = self.lookup(endpoint, ticker, start, end)
+        if value is None:
+            value = fetch()
+            self.store(endpoint, ticker, start, end, value)
+        return value
+
+    def lookup(self, endpoint: str, ticker: str, start: Optional[str] = None, end: Optional[str] = None) -> Any:
+        """
+        Return the stored response the mode allows serving, or None if it must be fetched live.
+
+        Raises:
+            FetchCacheMiss: In replay mode, if nothing is stored for the request
+        """
+        if self.mode not in ('cache', 'replay'):
+            return None
+        value = self.get(endpoint, ticker, start, end, ignore_ttl=self.mode == 'replay')
+        if value is None and self.mode == 'replay' and start and end:
+            value = self.get_covering(endpoint, ticker, start, end)
+        if value is None and self.mode == 'replay':
+            raise FetchCacheMiss(f"No recorded {endpoint} response for {ticker} {start or ''}..{end or ''}")
+        return value
+
+    def store(self, endpoint: str, ticker: str, start: Optional[str], end: Optional[str], value: Any) -> None:
+        """Store a live response unless the mode is 'off', or it is empty and the mode is 'cache'"""
+        if self.mode == 'off' or (self.mode == 'cache' and is_empty(value)):
+            return
+        self.put(endpoint, ticker, start, end, value)
+
+    def get(self, endpoint, ticker, start, end, ignore_ttl=False):
+        """Return a stored response, or None if it is missing or expired"""
+        import zlib
+
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT created, payload FROM responses WHERE endpoint = ? AND ticker = ? AND start = ? AND end = ?',
+                (endpoint, ticker, start or '', end or '')
+            ).fetchone()
+            now = time.time()
+            ttl = self.ttl.get(endpoint, self.default_ttl)
+            if row is None or (not ignore_ttl and ttl is not None and now - row[0] > ttl):
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._connection:
+                self._connection.execute(
+                    'UPDATE responses SET accessed = ? WHERE endpoint = ? AND ticker = ? AND start = ? AND end = ?',
+                    (now, endpoint, ticker, start or '', end or '')
+                )
+        return decode_response(zlib.decompress(row[1]))
+
+    def get_covering(self, endpoint, ticker, start, end):
+        """
+        Return the stored response of a dated request that starts no later than start and ends
+        last, trimmed to [start, end), whatever its age; None if there is none.
+        """
+        import zlib
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT payload FROM responses WHERE endpoint = ? AND ticker = ? AND start <> '' AND start <= ? "
+                "ORDER BY end DESC LIMIT 1", (endpoint, ticker, start)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return trim_response(decode_response(zlib.decompress(row[0])), start, end)
+
+    def put(self, endpoint, ticker, start, end, value) -> None:
+        """Store a response, then evict least recently used entries beyond max_bytes"""
+        import zlib
+
+        payload = zlib.compress(encode_response(value), 6)
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (endpoint, ticker, start or '', end or '', now, now, len(payload), payload)
+            )
+            self._evict()
+
+    def clear(self) -> None:
+        """Delete every stored response"""
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM responses')
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report cache activity.
+
+        Returns:
+            dict: hits, misses, evictions, entries, bytes and max_bytes
+        """
+        with self._lock:
+            entries, size = self._connection.execute('SELECT COUNT(*), TOTAL(size) FROM responses').fetchone()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': entries,
+                'bytes': int(size),
+                'max_bytes': self.max_bytes,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def _evict(self):
+        total = self._connection.execute('SELECT TOTAL(size) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        cursor = self._connection.execute(
+            'SELECT endpoint, ticker, start, end, size FROM responses ORDER BY accessed')
+        doomed = []
+        for endpoint, ticker, start, end, size in cursor.fetchall():
+            if total <= self.max_bytes:
+                break
+            doomed.append((endpoint, ticker, start, end))
+            total -= size
+        self._connection.executemany(
+            'DELETE FROM responses WHERE endpoint = ? AND ticker = ? AND start = ? AND end = ?', doomed)
+        self.evictions += len(doomed)
+        logger.debug(f"Evicted {len(doomed)} cached responses")
+
+def is_empty(value: Any) -> bool:
+    """Return whether a response holds nothing: None, an empty DataFrame or an empty list"""
+    if value is None:
+        return True
+    empty = getattr(value, 'empty', None)
+    if isinstance(empty, bool):
+        return empty
+    return hasattr(value, '__len__') and len(value) == 0
+
+def encode_response(value: Any) -> bytes:
+    """
+    Encode a response as JSON. DataFrames keep their column dtypes and their index, with
+    datetimes stored as integer UTC ticks in the index's unit plus the time zone; other values
+    must be JSON types.
+    """
+    import json
+
+    if type(value).__name__ == 'DataFrame':
+        index = value.index
+        frame = {
+            'columns': [str(column) for column in value.columns],
+            'dtypes': [str(dtype) for dtype in value.dtypes],
+            'data': [value[column].tolist() for column in value.columns],
+            'index_name': index.name,
+        }
+        if hasattr(index, 'asi8') and hasattr(index, 'tz'):
+            frame.update(index=index.asi8.tolist(), unit=getattr(index, 'unit', 'ns'),
+                         tz=str(index.tz) if index.tz else None)
+        else:
+            frame['index'] = index.tolist()
+        value = {'frame': frame}
+    else:
+        value = {'value': value}
+    return json.dumps(value, separators=(',', ':')).encode()
+
+def decode_response(payload: bytes) -> Any:
+    """Decode a response encoded by encode_response"""
+    import json
+
+    value = json.loads(payload)
+    if 'value' in value:
+        return value['value']
+
+    import pandas as pd
+
+    frame = value['frame']
+    if 'tz' in frame:
+        index = pd.DatetimeIndex(pd.to_datetime(frame['index'], unit=frame['unit'], utc=True), name=frame['index_name'])
+        if hasattr(index, 'as_unit'):
+            index = index.as_unit(frame['unit'])
+        index = index.tz_convert(frame['tz']) if frame['tz'] else index.tz_localize(None)
+    else:
+        index = pd.Index(frame['index'], name=frame['index_name'])
+    columns = {column: pd.Series(data, index=index, dtype=dtype)
+               for column, dtype, data in zip(frame['columns'], frame['dtypes'], frame['data'])}
+    return pd.DataFrame(columns, index=index)
+
+def trim_response(value: Any, start: str, end: str) -> Any:
+    """Trim a DataFrame with a datetime index to [start, end); other values are returned as they are"""
+    if type(value).__name__ != 'DataFrame':
+        return value
+    import pandas as pd
+
+    if not isinstance(value.index, pd.DatetimeIndex):
+        return value
+    index = value.index.tz_localize(None) if value.index.tz is not None else value.index
+    return value[(index >= pd.Timestamp(start)) & (index < pd.Timestamp(end))]
+
+def from_environment() -> Optional[FetchCache]:
+    """
+    Build a cache from STOCKS_FETCH_CACHE (path of the cache file) and STOCKS_FETCH_MODE
+    (one of MODES, 'cache' by default). Returns None if STOCKS_FETCH_CACHE is not set.
+    """
+    path = os.environ.get('STOCKS_FETCH_CACHE')
+    if not path:
+        return None
+    return FetchCache(path, mode=os.environ.get('STOCKS_FETCH_MODE', 'cache'))
@@ -0,0 +1,59 @@
+from typing import List, Tuple
+
+def find_gaps(sessions, stored_days) -> List[Tuple[int, int]]:
+    """
+    Find runs of consecutive trading sessions that have no stored row.
+
+    Parameters:
+        sessions (numpy.ndarray): Expected sessions as datetime64[D], ascending
+        stored_days (numpy.ndarray): Stored dates as datetime64[D]
+
+    Returns:
+        list: (first, last) index pairs into sessions, both included, in order
+    """
+    import numpy as np
+
+    missing = ~np.isin(sessions, stored_days)
+    if not missing.any():
+        return []
+    # Positions where the missing flag flips mark the edges of each run
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], missing, [False])).astype(np.int8)))
+    return list(zip(edges[::2].tolist(), (edges[1::2] - 1).tolist()))
+
+def merge_gaps(gaps: List[Tuple[int, int]], merge_within: int = 5) -> List[Tuple[int, int]]:
+    """
+    Merge gaps separated by at most merge_within stored sessions, as re-downloading a few
+    stored days is cheaper than another request.
+
+    Parameters:
+        gaps (list): (first, last) session index pairs, in order
+        merge_within (int): Largest number of stored sessions between two gaps that are merged
+
+    Returns:
+        list: Merged (first, last) index pairs
+    """
+    merged = []
+    for first, last in gaps:
+        if merged and first - merged[-1][1] - 1 <= merge_within:
+            merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+def gap_windows(sessions, stored_days, merge_within: int = 5) -> List[Tuple[str, str]]:
+    """
+    Plan the fewest download windows that cover every missing session.
+
+    Parameters:
+        sessions (numpy.ndarray): Expected sessions as datetime64[D], ascending
+        stored_days (numpy.ndarray): Stored dates as datetime64[D]
+        merge_within (int): See merge_gaps
+
+    Returns:
+        list: (start_date, end_date) 'YYYY-MM-DD' windows; end_date is the day after the last
+              missing session, as download end dates are exclusive
+    """
+    windows = []
+    for first, last in merge_gaps(find_gaps(sessions, stored_days), merge_within):
+        windows.append((str(sessions[first]), str(sessions[last] + 1)))
+    return windows
@@ -0,0 +1,61 @@
+from itertools import repeat
+
+# Columns of a yfinance history frame in ticker_bars order, with the value used when missing
+HISTORY_COLUMNS = [
+    ('Open', None),
+    ('High', None),
+    ('Low', None),
+    ('Close', None),
+    ('Volume', None),
+    ('Dividends', 0),
+    ('Stock Splits', 0),
+]
+
+# Writes rows from history_to_bars straight to the compact table behind the ticker_data view
+INSERT_TICKER_BARS_SQL = '''
+    INSERT OR REPLACE INTO ticker_bars
+    (ticker_id, day, open, high, low, close, volume, dividends, stocksplits)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def history_to_bars(ticker_id, df):
+    """
+    Turn a yfinance history DataFrame into ticker_bars rows without iterating over it.
+
+    Dates become days since 1970-01-01 in one vectorized step, so no date strings are built,
+    and every column is converted to a list of Python scalars at once, so no per-row Series
+    objects are created. The rows are produced lazily and can be passed straight to executemany.
+
+    Parameters:
+        ticker_id (int): Id of the ticker in the tickers table
+        df (DataFrame): History indexed by date with Open/High/Low/Close/Volume columns
+
+    Returns:
+        iterator: Tuples of (ticker_id, day, open, high, low, close, volume, dividends, stocksplits)
+    """
+    index = _date_index(df)
+    if index.tz is not None:
+        # Keep the exchange-local calendar date
+        index = index.tz_localize(None)
+    days = index.values.astype('datetime64[D]').astype('int64').tolist()
+    return zip(repeat(ticker_id, len(df)), days, *_history_columns(ticker_id, df))
+
+def _date_index(df):
+    import pandas as pd
+
+    index = df.index
+    if not isinstance(index, pd.DatetimeIndex):
+        index = pd.DatetimeIndex(index)
+    return index
+
+def _history_columns(ticker, df):
+    count = len(df)
+    columns = []
+    for name, default in HISTORY_COLUMNS:
+        if name in df.columns:
+            columns.append(df[name].tolist())
+        elif default is not None:
+            columns.append(repeat(default, count))
+        else:
+            raise KeyError(f"History for {ticker} has no '{name}' column")
+    return columns
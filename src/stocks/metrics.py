@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger('stocks.events')
+
+# Metric names emitted by the package. Counters are summed, histograms record one value per
+# observation; durations are in seconds.
+#
+#   fetch.seconds         histogram  tags: endpoint ('history', 'history_group', 'news')
+#   fetch.errors          counter    tags: endpoint
+#   rows.fetched          counter    rows in downloaded history frames
+#   rows.inserted         counter    tags: table ('ticker_data', 'ticker_news')
+#   sql.seconds           histogram  tags: op
+#   refresh.seconds       histogram  tags: ticker; fetch plus store time of one ticker
+#   refresh.errors        counter    tags: stage ('fetch', 'store')
+#   query.rows            histogram  tags: output; rows returned by get_ticker_data
+#   query.errors          counter    failed get_ticker_data queries
+#   news.malformed        counter    news items that could not be parsed
+#   news.stage_seconds    histogram  tags: stage; see Stocks.refresh_news
+#   backfill.chunks       counter    tags: status ('done', 'retry', 'failed')
+
+class MetricsSink:
+    """
+    Receives counters, histogram observations and events.
+
+    Subclass it and override the three methods to forward metrics to statsd, Prometheus or a
+    log pipeline, then install the instance with set_sink(). Methods may be called from worker
+    threads. The base class drops everything.
+    """
+
+    # Instrumented code skips timing and bookkeeping entirely while this is False
+    enabled = True
+
+    def increment(self, name: str, value: float = 1, tags: Optional[Dict[str, Any]] = None) -> None:
+        """Add value to a counter"""
+
+    def observe(self, name: str, value: float, tags: Optional[Dict[str, Any]] = None) -> None:
+        """Record one histogram observation"""
+
+    def event(self, name: str, fields: Dict[str, Any]) -> None:
+        """Receive a structured event, see emit()"""
+
+class NullSink(MetricsSink):
+    """The default sink: disabled, so instrumentation costs one attribute check"""
+
+    enabled = False
+
+class InMemorySink(MetricsSink):
+    """
+    Keeps every metric in memory, for tests, benchmarks and ad hoc inspection.
+
+    Parameters:
+        keep_events (bool): Also keep the events in self.events
+    """
+
+    def __init__(self, keep_events: bool = True):
+        self.keep_events = keep_events
+        self.counters: Dict[tuple, float] = {}
+        self.histograms: Dict[tuple, List[float]] = {}
+        self.events: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1, tags=None):
+        key = _key(name, tags)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, tags=None):
+        key = _key(name, tags)
+        with self._lock:
+            self.histograms.setdefault(key, []).append(value)
+
+    def event(self, name, fields):
+        if self.keep_events:
+            with self._lock:
+                self.events.append((name, fields))
+
+    def counter(self, name: str, **tags) -> float:
+        """Total of a counter, summed over every tag set matching the given tags"""
+        with self._lock:
+            return sum(value for key, value in self.counters.items() if _matches(key, name, tags))
+
+    def values(self, name: str, **tags) -> List[float]:
+        """Observations of a histogram, across every tag set matching the given tags"""
+        with self._lock:
+            return [value for key, values in self.histograms.items() if _matches(key, name, tags)
+                    for value in values]
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Summarize every metric, ignoring tags.
+
+        Returns:
+            dict: Counter name to {'total'}, histogram name to count, total, p50, p99 and max
+        """
+        with self._lock:
+            counters = list(self.counters.items())
+            histograms = [(key, list(values)) for key, values in self.histograms.items()]
+        summary = {}
+        for (name, _), value in counters:
+            entry = summary.setdefault(name, {'total': 0})
+            entry['total'] += value
+        merged = {}
+        for (name, _), values in histograms:
+            merged.setdefault(name, []).extend(values)
+        for name, values in merged.items():
+            values.sort()
+            summary[name] = {
+                'count': len(values),
+                'total': sum(values),
+                'p50': _percentile(values, 50),
+                'p99': _percentile(values, 99),
+                'max': values[-1],
+            }
+        return summary
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.events.clear()
+
+def _key(name, tags):
+    return name, tuple(sorted(tags.items())) if tags else ()
+
+def _matches(key, name, tags):
+    if key[0] != name:
+        return False
+    key_tags = dict(key[1])
+    return all(key_tags.get(tag) == value for tag, value in tags.items())
+
+def _percentile(ordered, percent):
+    # Nearest-rank percentile of an ascending list
+    index = max(0, -(-len(ordered) * percent // 100) - 1)
+    return ordered[int(index)]
+
+NULL_SINK = NullSink()
+
+_sink: MetricsSink = NULL_SINK
+
+def set_sink(sink: Optional[MetricsSink]) -> None:
+    """
+    Send the package's metrics and events to a sink, or stop collecting them with None.
+
+    Parameters:
+        sink (MetricsSink or None): Sink to use, e.g. InMemorySink()
+    """
+    global _sink
+    _sink = NULL_SINK if sink is None else sink
+
+def get_sink() -> MetricsSink:
+    """Return the active sink"""
+    return _sink
+
+def enabled() -> bool:
+    """Return whether a sink is collecting metrics"""
+    return _sink.enabled
+
+def increment(name: str, value: float = 1, **tags) -> None:
+    """Add value to a counter on the active sink"""
+    sink = _sink
+    if sink.enabled:
+        sink.increment(name, value, tags)
+
+def observe(name: str, value: float, **tags) -> None:
+    """Record a histogram observation on the active sink"""
+    sink = _sink
+    if sink.enabled:
+        sink.observe(name, value, tags)
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+def timer(name: str, **tags):
+    """
+    Context manager recording the duration of its block as a histogram observation.
+
+    Returns a shared no-op context manager when no sink is enabled, so nothing is timed.
+    """
+    if not _sink.enabled:
+        return _NULL_TIMER
+    return _timed(name, tags)
+
+@contextmanager
+def _timed(name, tags):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        # Looked up again in case the sink was replaced or disabled during the block
+        sink = _sink
+        if sink.enabled:
+            sink.observe(name, time.perf_counter() - started, tags)
+
+def emit(name: str, message: str, level: int = logging.INFO, **fields) -> None:
+    """
+    Publish a structured event to the active sink and the 'stocks.events' logger.
+
+    The log record carries the event name and fields as record.event and record.fields, so log
+    handlers can format them as JSON. Nothing is formatted when neither destination wants it.
+
+    Parameters:
+        name (str): Event name, e.g. 'refresh.stored'
+        message (str): Human readable message; {field} placeholders are filled from fields
+        level (int): Logging level of the record
+        **fields: Event payload
+    """
+    sink = _sink
+    if sink.enabled:
+        sink.event(name, fields)
+    if logger.isEnabledFor(level):
+        logger.log(level, message.format(**fields), extra={'event': name, 'fields': fields})
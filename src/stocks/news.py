@@ -0,0 +1,127 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, List, Optional
+
+from .sentiment import get_engine
+
+logger = logging.getLogger(__name__)
+
+def parse_news_item(ticker: str, item: dict) -> tuple:
+    """
+    Turn one raw Yahoo Finance news item into a ticker_news row without its sentiment.
+
+    Parameters:
+        ticker (str): Ticker the item was fetched for
+        item (dict): News item as returned by get_news
+
+    Returns:
+        tuple: (ticker, date, news_id, news_summary)
+    """
+    # Generate a unique ID for the news item if it doesn't have one
+    import hashlib
+
+    if 'id' in item:
+        news_id = item['id']
+    else:
+        # Create a hash from the title and publish date as a unique ID
+        news_id = hashlib.md5(f"{item.get('title', '')}{item.get('publishedAt', '')}".encode()).hexdigest()
+
+    # Convert timestamp to date
+    if 'pubDate' in item['content']:
+        try:
+            news_date = datetime.fromisoformat(item['content']['pubDate'].replace("Z", "+00:00"))
+            news_date = news_date.strftime('%Y-%m-%d')
+        except (ValueError, TypeError):
+            news_date = datetime.now().strftime('%Y-%m-%d')
+    else:
+        news_date = datetime.now().strftime('%Y-%m-%d')
+
+    # Get the news summary
+    summary = item['content'].get('summary')
+    if not summary and 'title' in item['content']:
+        summary = item['content'].get('title')
+
+    return (ticker, news_date, news_id, summary)
+
+def dedup_news(rows: List[tuple]) -> List[tuple]:
+    """Drop rows whose (ticker, date, news_id) key was already seen, keeping the first one"""
+    seen = set()
+    unique = []
+    for row in rows:
+        key = row[:3]
+        if key not in seen:
+            seen.add(key)
+            unique.append(row)
+    return unique
+
+def drop_stored_news(rows: List[tuple], stored_ids: set) -> List[tuple]:
+    """
+    Drop rows for articles that are already stored, so they are neither re-scored nor rewritten.
+
+    Parameters:
+        rows (list): Rows starting with (ticker, date, news_id)
+        stored_ids (set): (ticker, news_id) pairs already in ticker_news
+
+    Returns:
+        list: Rows for new articles only
+    """
+    return [row for row in rows if (row[0], row[2]) not in stored_ids]
+
+def score_texts(texts: List[str], backend: str = 'auto') -> List[str]:
+    """Score a batch of texts with this process's sentiment engine. Used as the process pool task."""
+    return get_engine(backend).score_many(texts)
+
+def score_sentiments(texts: List[str], workers: Optional[int] = None, batch_size: int = 500,
+                     backend: str = 'auto', connection=None,
+                     with_connection: Optional[Callable] = None) -> List[str]:
+    """
+    Score many texts, fanning batches out to a process pool when there is enough work.
+
+    Texts already memoized by the engine (or stored in sentiment_cache when a connection or
+    with_connection is given) are not scored again, and each distinct text is scored once.
+
+    Parameters:
+        texts (list): Texts to score; empty or None texts are 'neutral'
+        workers (int, optional): Size of the process pool. If None, one per CPU core. With 0 or
+                                 when all unseen texts fit in one batch, scoring stays in-process
+        batch_size (int): Number of texts sent to a worker at a time
+        backend (str): Sentiment backend name, see stocks.sentiment.BACKENDS
+        connection (sqlite3.Connection, optional): Connection holding the sentiment_cache table
+        with_connection (callable, optional): Calls a function with the connection holding
+                                              sentiment_cache; see SentimentEngine.score_many
+
+    Returns:
+        list: Sentiment label for each text, in order
+    """
+    engine = get_engine(backend)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    def score_missing(unseen):
+        if workers <= 1 or len(unseen) <= batch_size:
+            return engine.score_uncached(unseen)
+        from concurrent.futures import ProcessPoolExecutor
+
+        batches = [unseen[i:i + batch_size] for i in range(0, len(unseen), batch_size)]
+        task = partial(score_texts, backend=engine.name)
+        results = []
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+            for labels in executor.map(task, batches):
+                results.extend(labels)
+        return results
+
+    return engine.score_many(texts, connection=connection, score_missing=score_missing,
+                             with_connection=with_connection)
+
+@contextmanager
+def stage_timer(timings: Dict[str, float], stage: str):
+    """Record the wall time spent in a block under timings[stage], in seconds"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = time.perf_counter() - started
@@ -0,0 +1,376 @@
+import os
+import time
+import uuid
+from itertools import groupby
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from urllib.parse import quote, unquote
+
+from .ingest import INSERT_TICKER_BARS_SQL
+from .schema import CHANGE_CLOCK, from_epoch_day, ticker_id, to_epoch_day
+
+# Tables that can be exported and imported
+EXPORT_TABLES = ('ticker_data', 'ticker_news')
+
+# Partition keys in directory order: ticker=AAPL/year=2024/part-....parquet
+PARTITION_KEYS = ('ticker', 'year')
+
+# Per table: (column, SQL expression, Arrow type) for every column of the files, the SQL
+# expression of each partition key, the FROM clause and the change sequence used by incremental
+# exports. Dates are written as date32, computed from epoch days without formatting strings.
+SOURCES = {
+    'ticker_data': {
+        'columns': [
+            ('ticker', 't.ticker', 'string'),
+            ('date', 'b.day', 'date32'),
+            ('open', 'b.open', 'float64'),
+            ('high', 'b.high', 'float64'),
+            ('low', 'b.low', 'float64'),
+            ('close', 'b.close', 'float64'),
+            ('volume', 'b.volume', 'int64'),
+            ('dividends', 'b.dividends', 'float64'),
+            ('stocksplits', 'b.stocksplits', 'float64'),
+        ],
+        'keys': {
+            'ticker': 't.ticker',
+            'year': "CAST(strftime('%Y', b.day * 86400, 'unixepoch') AS INTEGER)",
+        },
+        'from': 'ticker_bars b JOIN tickers t ON t.id = b.ticker_id',
+        'changed': 'b.changed',
+        # Orders that keep every partition contiguous; ticker ids follow the primary key
+        'order': {'ticker': 'b.ticker_id, b.day', 'year': 'b.day, b.ticker_id'},
+    },
+    'ticker_news': {
+        'columns': [
+            ('ticker', 'ticker', 'string'),
+            ('date', "CAST(julianday(date) - 2440587.5 AS INTEGER)", 'date32'),
+            ('news_id', 'news_id', 'string'),
+            ('news_summary', 'news_summary', 'string'),
+            ('sentiment', 'sentiment', 'string'),
+        ],
+        'keys': {
+            'ticker': 'ticker',
+            'year': 'CAST(substr(date, 1, 4) AS INTEGER)',
+        },
+        'from': 'ticker_news',
+        # Every insert or replace takes a rowid above all existing ones
+        'changed': 'rowid',
+        'order': {'ticker': 'ticker, date, news_id', 'year': 'date, ticker'},
+    },
+}
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet export and import need pyarrow; install it with pip install 'stocks[parquet]'") from None
+    return pyarrow, pyarrow.parquet
+
+def _partition_keys(partition_by: Union[None, str, Sequence[str]]) -> Tuple[str, ...]:
+    if partition_by is None:
+        return ()
+    if isinstance(partition_by, str):
+        partition_by = (partition_by,)
+    unknown = [key for key in partition_by if key not in PARTITION_KEYS]
+    if unknown:
+        raise ValueError(f"Unsupported partition keys {unknown}; choose from {', '.join(PARTITION_KEYS)}")
+    return tuple(key for key in PARTITION_KEYS if key in partition_by)
+
+def _source(table):
+    if table not in SOURCES:
+        raise ValueError(f"Unknown table '{table}'; choose from {', '.join(EXPORT_TABLES)}")
+    return SOURCES[table]
+
+def change_boundary(connection, table: str) -> int:
+    """
+    Return an upper bound on the change sequence of every row committed so far, excluded.
+
+    Rows written later are at or above it. For ticker_data the sequence is the CHANGE_CLOCK
+    stamp, so the boundary is taken under the write lock and the lock is held until the clock
+    has passed it, at most a millisecond. For ticker_news it is the rowid.
+
+    Parameters:
+        connection (sqlite3.Connection): Writable connection to the database
+        table (str): One of EXPORT_TABLES
+    """
+    _source(table)
+    if table == 'ticker_news':
+        return connection.execute('SELECT COALESCE(MAX(rowid), 0) + 1 FROM ticker_news').fetchone()[0]
+
+    clock = f'SELECT {CHANGE_CLOCK}'
+    if connection.in_transaction:
+        connection.commit()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        # With the write lock held no other write is in flight, so every committed stamp is at
+        # most the current millisecond and every later one will be at least boundary
+        boundary = connection.execute(clock).fetchone()[0] + 1
+        while connection.execute(clock).fetchone()[0] < boundary:
+            time.sleep(0.0005)
+    finally:
+        connection.commit()
+    return boundary
+
+def export_watermark(connection, target: str, table: str) -> Optional[int]:
+    """Return the change sequence the last export of a table to target stopped at, or None"""
+    row = connection.execute('SELECT watermark FROM export_watermarks WHERE target = ? AND source = ?',
+                             (target, table)).fetchone()
+    return None if row is None else row[0]
+
+def set_export_watermark(connection, target: str, table: str, watermark: int) -> None:
+    """Record where the latest export of a table to target stopped"""
+    with connection:
+        connection.execute('INSERT OR REPLACE INTO export_watermarks VALUES (?, ?, ?, ?)',
+                           (target, table, watermark, time.time()))
+
+def iter_record_batches(connection, table: str, partition_by=None, since: Optional[int] = None,
+                        until: Optional[int] = None, batch_size: int = 65536) -> Iterator[Tuple[Dict, object]]:
+    """
+    Stream a table as Arrow record batches, one partition after the other.
+
+    Parameters:
+        connection (sqlite3.Connection): Connection to read from
+        table (str): One of EXPORT_TABLES
+        partition_by (str or list, optional): Keys from PARTITION_KEYS. Their columns are left
+                                              out of the batches, as in a hive layout
+        since (int, optional): Only rows whose change sequence is at least since
+        until (int, optional): Only rows whose change sequence is below until
+        batch_size (int): Most rows per batch, and per fetch from SQLite
+
+    Returns:
+        Iterator: (partition values, pyarrow.RecordBatch) pairs; every batch of a partition is
+                  yielded before the next partition starts
+    """
+    pa, _ = _pyarrow()
+    source = _source(table)
+    keys = _partition_keys(partition_by)
+    columns = [column for column in source['columns'] if column[0] not in keys]
+    schema = pa.schema([(name, getattr(pa, arrow_type)()) for name, _, arrow_type in columns])
+
+    select = [source['keys'][key] for key in keys] + [expression for _, expression, _ in columns]
+    where, params = [], []
+    if since is not None:
+        where.append(f"{source['changed']} >= ?")
+        params.append(since)
+    if until is not None:
+        where.append(f"{source['changed']} < ?")
+        params.append(until)
+    query = f"SELECT {', '.join(select)} FROM {source['from']}"
+    if where:
+        query += ' WHERE ' + ' AND '.join(where)
+    query += ' ORDER BY ' + source['order']['year' if keys == ('year',) else 'ticker']
+
+    width = len(keys)
+    key_of = itemgetter(*range(width)) if width else (lambda row: ())
+    cursor = connection.cursor()
+    cursor.execute(query, params)
+
+    current, buffered = None, []
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for key, run in groupby(rows, key_of):
+            if width == 1:
+                key = (key,)
+            if key != current and buffered:
+                yield dict(zip(keys, current)), _to_batch(pa, schema, columns, buffered)
+                buffered = []
+            current = key
+            buffered.extend(row[width:] for row in run)
+            while len(buffered) >= batch_size:
+                yield dict(zip(keys, current)), _to_batch(pa, schema, columns, buffered[:batch_size])
+                buffered = buffered[batch_size:]
+    if buffered:
+        yield dict(zip(keys, current)), _to_batch(pa, schema, columns, buffered)
+
+def _to_batch(pa, schema, columns, rows):
+    arrays = []
+    for (_, _, arrow_type), values in zip(columns, zip(*rows)):
+        if arrow_type == 'date32':
+            arrays.append(pa.array(values, type=pa.int32()).cast(pa.date32()))
+        else:
+            arrays.append(pa.array(values, type=getattr(pa, arrow_type)()))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+def export_table(connection, table: str, path: str, partition_by='ticker', since: Optional[int] = None,
+                 until: Optional[int] = None, batch_size: int = 65536, compression: str = 'snappy') -> Dict:
+    """
+    Write a table to a directory of Parquet files, partitioned in the hive layout.
+
+    Each partition gets one new file per call, named so that earlier exports are never
+    overwritten. Rows are streamed, so memory use is bounded by batch_size.
+
+    Parameters:
+        connection (sqlite3.Connection): Connection to read from
+        table (str): One of EXPORT_TABLES
+        path (str): Directory to write to
+        partition_by, since, until, batch_size: See iter_record_batches
+        compression (str): Parquet compression codec
+
+    Returns:
+        dict: 'rows' written and the 'files' created
+    """
+    pa, pq = _pyarrow()
+    basename = f'part-{until or 0}-{uuid.uuid4().hex[:8]}.parquet'
+    files, count = [], 0
+    writer, current = None, None
+    try:
+        for partition, batch in iter_record_batches(connection, table, partition_by, since, until, batch_size):
+            if writer is None or partition != current:
+                if writer is not None:
+                    writer.close()
+                directory = os.path.join(path, *(f'{key}={quote(str(value), safe="")}'
+                                                 for key, value in partition.items()))
+                os.makedirs(directory, exist_ok=True)
+                files.append(os.path.join(directory, basename))
+                writer = pq.ParquetWriter(files[-1], batch.schema, compression=compression)
+                current = partition
+            writer.write_table(pa.Table.from_batches([batch]))
+            count += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return {'rows': count, 'files': files}
+
+def export_parquet(reader: Callable, writer: Callable, path: str, tables: Sequence[str] = EXPORT_TABLES,
+                   partition_by='ticker', incremental: bool = False, batch_size: int = 65536,
+                   compression: str = 'snappy') -> Dict[str, Dict]:
+    """
+    Export tables to path/<table>/, recording a watermark so later exports can be incremental.
+
+    Parameters:
+        reader (callable): Returns a context manager yielding a connection to read from
+        writer (callable): Returns a context manager yielding the writable connection
+        path (str): Root directory of the export
+        tables (list): Tables from EXPORT_TABLES
+        partition_by (str or list, optional): 'ticker', 'year', both or None
+        incremental (bool): Only export rows written since the previous export to the same
+                            directory, as new files next to the earlier ones. Deleted rows are
+                            not tracked
+        batch_size (int): Rows per record batch
+        compression (str): Parquet compression codec
+
+    Returns:
+        dict: Table name to 'rows', 'files' and 'watermark'
+
+    Raises:
+        FileExistsError: If a table directory already holds files and there is no watermark to
+                         continue from
+    """
+    _pyarrow()
+    results = {}
+    for table in tables:
+        target = os.path.abspath(os.path.join(path, table))
+        with writer() as connection:
+            since = export_watermark(connection, target, table) if incremental else None
+            if since is None and os.path.isdir(target) and os.listdir(target):
+                raise FileExistsError(f"{target} is not empty; export to a new directory or pass incremental=True "
+                                      f"to continue an earlier export")
+            until = change_boundary(connection, table)
+        with reader() as connection:
+            result = export_table(connection, table, target, partition_by, since, until, batch_size, compression)
+        with writer() as connection:
+            set_export_watermark(connection, target, table, until)
+        result['watermark'] = until
+        results[table] = result
+    return results
+
+def parquet_files(path: str) -> List[Tuple[str, Dict[str, str]]]:
+    """
+    List the Parquet files under path with the hive partition values encoded in their directories.
+
+    Files and directories starting with '_' or '.' are skipped, as Spark and Arrow do.
+    """
+    if os.path.isfile(path):
+        return [(path, {})]
+    found = []
+    for directory, subdirectories, files in os.walk(path):
+        subdirectories[:] = sorted(name for name in subdirectories if name[0] not in '_.')
+        partition = {}
+        for segment in os.path.relpath(directory, path).split(os.sep):
+            key, sep, value = segment.partition('=')
+            if sep:
+                partition[key] = unquote(value)
+        found.extend((os.path.join(directory, name), partition) for name in sorted(files)
+                     if name.endswith('.parquet') and name[0] not in '_.')
+    return found
+
+def import_table(connection, table: str, path: str, batch_size: int = 65536) -> int:
+    """
+    Load Parquet files written by export_table, or any with the same columns, into a table.
+
+    Rows are upserted, so importing the same files twice is harmless. Partition values from the
+    directory names fill in columns missing from the files. Each file is loaded in one
+    transaction, batch_size rows at a time.
+
+    Parameters:
+        connection (sqlite3.Connection): Writable connection to the database
+        table (str): One of EXPORT_TABLES
+        path (str): A Parquet file or a directory of them
+        batch_size (int): Rows read and inserted at a time
+
+    Returns:
+        int: Number of rows loaded
+    """
+    pa, pq = _pyarrow()
+    names = [name for name, _, _ in _source(table)['columns']]
+    ids = {}
+    count = 0
+    for file_path, partition in parquet_files(path):
+        with connection:
+            for batch in pq.ParquetFile(file_path).iter_batches(batch_size=batch_size):
+                columns = _batch_columns(pa, batch, names, partition)
+                if table == 'ticker_data':
+                    for ticker in set(columns['ticker']):
+                        if ticker not in ids:
+                            ids[ticker] = ticker_id(connection, ticker)
+                    columns['ticker'] = [ids[ticker] for ticker in columns['ticker']]
+                    connection.executemany(INSERT_TICKER_BARS_SQL, zip(*(columns[name] for name in names)))
+                else:
+                    columns['date'] = [None if day is None else from_epoch_day(day) for day in columns['date']]
+                    connection.executemany(
+                        'INSERT OR REPLACE INTO ticker_news (ticker, date, news_id, news_summary, sentiment) '
+                        'VALUES (?, ?, ?, ?, ?)', zip(*(columns[name] for name in names)))
+                count += batch.num_rows
+    return count
+
+def _batch_columns(pa, batch, names, partition):
+    """Turn a record batch into Python lists per column, with dates as epoch days"""
+    present = dict(zip(batch.schema.names, batch.columns))
+    columns = {}
+    for name in names:
+        column = present.get(name)
+        if column is None:
+            columns[name] = [partition.get(name)] * batch.num_rows
+        elif name == 'date':
+            if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+                columns[name] = [None if value is None else to_epoch_day(value) for value in column.to_pylist()]
+            else:
+                columns[name] = column.cast(pa.date32(), safe=False).cast(pa.int32()).to_pylist()
+        else:
+            columns[name] = column.to_pylist()
+    return columns
+
+def import_parquet(writer: Callable, path: str, tables: Sequence[str] = EXPORT_TABLES,
+                   batch_size: int = 65536) -> Dict[str, int]:
+    """
+    Import the path/<table>/ directories written by export_parquet.
+
+    Parameters:
+        writer (callable): Returns a context manager yielding the writable connection
+        path (str): Root directory of the export
+        tables (list): Tables from EXPORT_TABLES; those without a directory are skipped
+
+    Returns:
+        dict: Table name to the number of rows loaded
+    """
+    _pyarrow()
+    loaded = {}
+    for table in tables:
+        directory = os.path.join(path, table)
+        if os.path.isdir(directory):
+            with writer() as connection:
+                loaded[table] = import_table(connection, table, directory, batch_size)
+    return loaded
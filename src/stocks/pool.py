@@ -0,0 +1,113 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Pragmas that cannot be set on a read-only connection
+_WRITE_ONLY_PRAGMAS = ('page_size', 'journal_mode')
+
+class ConnectionPool:
+    """
+    Hands out SQLite connections that are safe to use from many threads.
+
+    Readers borrow one of at most max_readers read-only connections; a borrowed connection
+    belongs to the borrowing thread until it is returned, and nested borrows on the same thread
+    reuse it. All writes go through a single writer connection guarded by a lock. Connections
+    are opened with check_same_thread=False because the pool, not sqlite3, enforces that
+    each one is used by one thread at a time.
+
+    Parameters:
+        db_name (str): Path of the SQLite database file
+        max_readers (int): Maximum number of read-only connections open at once
+        profile (str or dict, optional): Tuning profile applied to every connection
+        writer (sqlite3.Connection, optional): Existing connection to use as the writer. It must
+                                               have been opened with check_same_thread=False
+        timeout (float, optional): Seconds to wait for a free reader before raising queue.Empty.
+                                   If None, waits indefinitely
+    """
+
+    def __init__(self, db_name, max_readers=4, profile=None, writer=None, timeout=None):
+        from .database import apply_pragmas, resolve_profile
+
+        if max_readers < 1:
+            raise ValueError("max_readers must be at least 1")
+        self.db_name = db_name
+        self.max_readers = max_readers
+        self.timeout = timeout
+        self._reader_profile = {
+            name: value for name, value in resolve_profile(profile).items()
+            if name not in _WRITE_ONLY_PRAGMAS
+        }
+        # In-memory databases are private to one connection, so readers share the writer
+        self._shared = db_name == ':memory:' or str(db_name).startswith('file::memory:')
+
+        if writer is None:
+            writer = sqlite3.connect(db_name, check_same_thread=False)
+            apply_pragmas(writer, profile)
+        self._writer = writer
+        self._writer_lock = threading.RLock()
+
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._all_readers = []
+        self._create_lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def writer(self):
+        """Borrow the writer connection, holding the writer lock until the block exits"""
+        with self._writer_lock:
+            yield self._writer
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection for the current thread"""
+        if self._shared:
+            with self.writer() as connection:
+                yield connection
+            return
+
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            # Nested borrow on the same thread
+            yield connection
+            return
+
+        connection = self._checkout()
+        self._local.connection = connection
+        try:
+            yield connection
+        finally:
+            self._local.connection = None
+            self._idle.put(connection)
+
+    def close(self):
+        """Close every reader and the writer"""
+        with self._create_lock:
+            for connection in self._all_readers:
+                connection.close()
+            self._all_readers = []
+        with self._writer_lock:
+            self._writer.close()
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._create_lock:
+            if self._created < self.max_readers:
+                self._created += 1
+                connection = self._open_reader()
+                self._all_readers.append(connection)
+                return connection
+        return self._idle.get(timeout=self.timeout)
+
+    def _open_reader(self):
+        from .database import apply_pragmas
+
+        uri = Path(self.db_name).absolute().as_uri() + '?mode=ro'
+        connection = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        apply_pragmas(connection, self._reader_profile)
+        return connection
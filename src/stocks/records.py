@@ -0,0 +1,168 @@
+import sys
+from array import array
+from typing import Iterator, List, Union
+
+from .schema import from_epoch_day, to_epoch_day
+
+BAR_FIELDS = ('ticker', 'date', 'open', 'high', 'low', 'close', 'volume', 'dividends', 'stocksplits')
+
+# BarSeries columns stored as float64 arrays; volume is stored as int64
+_PRICE_FIELDS = ('open', 'high', 'low', 'close', 'dividends', 'stocksplits')
+
+# Columns a BarSeries actually holds: dates are kept as int32 epoch days in 'day'
+_SERIES_FIELDS = ('ticker', 'day') + BAR_FIELDS[2:]
+
+class Bar:
+    """
+    One daily bar of ticker_data with named fields.
+
+    Uses __slots__, so a Bar has no per-instance __dict__. Prices are floats and volume an int.
+    Bars also unpack and index like the 9-tuples returned by get_ticker_data.
+    """
+
+    __slots__ = BAR_FIELDS
+
+    def __init__(self, ticker, date, open, high, low, close, volume, dividends=0.0, stocksplits=0.0):
+        self.ticker = ticker
+        self.date = date
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.dividends = dividends
+        self.stocksplits = stocksplits
+
+    def __iter__(self):
+        return (getattr(self, field) for field in BAR_FIELDS)
+
+    def __getitem__(self, index):
+        return tuple(self)[index]
+
+    def __len__(self):
+        return len(BAR_FIELDS)
+
+    def __eq__(self, other):
+        if isinstance(other, (Bar, tuple)):
+            return tuple(self) == tuple(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Bar({', '.join(f'{field}={getattr(self, field)!r}' for field in BAR_FIELDS)})"
+
+class BarSeries:
+    """
+    Array-backed, column-oriented sequence of bars for one or more tickers.
+
+    Each numeric column is an array.array ('d' for prices, 'q' for volume), so a bar costs
+    7 * 8 bytes of numeric storage instead of seven boxed Python numbers plus a tuple. Dates are
+    stored as days since 1970-01-01 in an array('i'), as in ticker_bars, and only turned into
+    'YYYY-MM-DD' strings by the accessors (date, indexing and iteration). Tickers are interned,
+    so a series of one ticker holds a single ticker string. Indexing returns a Bar, slicing
+    returns a new BarSeries, and columns are exposed by name.
+    """
+
+    __slots__ = _SERIES_FIELDS
+
+    def __init__(self):
+        self.ticker: List[str] = []
+        self.day = array('i')
+        for field in _PRICE_FIELDS:
+            setattr(self, field, array('d'))
+        self.volume = array('q')
+
+    @classmethod
+    def from_rows(cls, rows) -> 'BarSeries':
+        """Build a series from an iterable of ticker_data rows"""
+        series = cls()
+        series.extend(rows)
+        return series
+
+    @classmethod
+    def from_cursor(cls, cursor, arraysize: int = 10000) -> 'BarSeries':
+        """
+        Build a series straight from an executed schema.TICKER_BARS_SELECT cursor.
+
+        Rows are read with fetchmany and appended column by column, so the whole result never
+        exists as a list of tuples, and their epoch days are stored without string conversion.
+        """
+        series = cls()
+        while True:
+            rows = cursor.fetchmany(arraysize)
+            if not rows:
+                return series
+            series.extend_days(rows)
+
+    def extend(self, rows) -> None:
+        """Append ticker_data rows; NULL prices become NaN and NULL volume 0"""
+        self._append(rows, to_epoch_day)
+
+    def extend_days(self, rows) -> None:
+        """Append rows laid out like ticker_data but with the date given as epoch days"""
+        self._append(rows, None)
+
+    def _append(self, rows, to_day):
+        rows = rows if isinstance(rows, list) else list(rows)
+        if not rows:
+            return
+        tickers, dates, opens, highs, lows, closes, volumes, dividends, splits = zip(*rows)
+        self.ticker.extend(map(sys.intern, tickers))
+        self.day.extend(dates if to_day is None else map(to_day, dates))
+        nan = float('nan')
+        for column, values in ((self.open, opens), (self.high, highs), (self.low, lows),
+                               (self.close, closes), (self.dividends, dividends),
+                               (self.stocksplits, splits)):
+            column.extend(nan if value is None else float(value) for value in values)
+        self.volume.extend(0 if value is None else int(value) for value in volumes)
+
+    def __len__(self) -> int:
+        return len(self.day)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Bar, 'BarSeries']:
+        if isinstance(index, slice):
+            series = BarSeries.__new__(BarSeries)
+            for field in _SERIES_FIELDS:
+                setattr(series, field, getattr(self, field)[index])
+            return series
+        values = [getattr(self, field)[index] for field in _SERIES_FIELDS]
+        values[1] = from_epoch_day(values[1])
+        return Bar(*values)
+
+    def __iter__(self) -> Iterator[Bar]:
+        columns = [getattr(self, field) for field in _SERIES_FIELDS]
+        columns[1] = map(from_epoch_day, self.day)
+        return (Bar(*values) for values in zip(*columns))
+
+    def __repr__(self):
+        span = f", {from_epoch_day(self.day[0])}..{from_epoch_day(self.day[-1])}" if self.day else ''
+        return f"BarSeries({len(self)} bars{span})"
+
+    @property
+    def date(self) -> List[str]:
+        """Dates as 'YYYY-MM-DD' strings, built from the day column on each access"""
+        return [from_epoch_day(day) for day in self.day]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the series in bytes"""
+        size = sum(sys.getsizeof(getattr(self, field)) for field in _SERIES_FIELDS)
+        return size + sum(sys.getsizeof(ticker) for ticker in set(self.ticker))
+
+    def copy(self) -> 'BarSeries':
+        """Return a series with copied columns"""
+        return self[:]
+
+    def column(self, name: str):
+        """Return a column by field name, e.g. series.column('close'); 'day' gives the raw epoch days"""
+        if name not in BAR_FIELDS and name not in _SERIES_FIELDS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def to_numpy(self, name: str):
+        """Return a numeric column as a NumPy array sharing the underlying buffer"""
+        import numpy as np
+
+        column = self.column(name)
+        if isinstance(column, list):
+            return np.array(column, dtype=object)
+        return np.frombuffer(column, dtype={'d': 'float64', 'q': 'int64', 'i': 'int32'}[column.typecode])
@@ -0,0 +1,394 @@
+import logging
+from datetime import date, timedelta
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Dates are stored as days since 1970-01-01. julianday('1970-01-01') is 2440587.5
+EPOCH = date(1970, 1, 1)
+
+# Columns of a ticker_data row read straight from the compact tables. Range queries filter on
+# b.day, an integer, so they use the (ticker_id, day) primary key instead of comparing strings.
+TICKER_DATA_SELECT = '''
+    SELECT t.ticker AS ticker, date(b.day * 86400, 'unixepoch') AS date, b.open AS open,
+           b.high AS high, b.low AS low, b.close AS close, b.volume AS volume,
+           b.dividends AS dividends, b.stocksplits AS stocksplits
+    FROM ticker_bars b JOIN tickers t ON t.id = b.ticker_id
+'''
+
+# The same columns with the date left as epoch days, for readers that keep it as an integer
+TICKER_BARS_SELECT = '''
+    SELECT t.ticker AS ticker, b.day AS day, b.open AS open,
+           b.high AS high, b.low AS low, b.close AS close, b.volume AS volume,
+           b.dividends AS dividends, b.stocksplits AS stocksplits
+    FROM ticker_bars b JOIN tickers t ON t.id = b.ticker_id
+'''
+
+# Deletes every bar of a ticker; run it before deleting the ticker itself
+DELETE_TICKER_BARS_SQL = 'DELETE FROM ticker_bars WHERE ticker_id = (SELECT id FROM tickers WHERE ticker = ?)'
+
+def to_epoch_day(value: str) -> int:
+    """Convert a 'YYYY-MM-DD' date (any trailing time is ignored) to days since 1970-01-01"""
+    return (date.fromisoformat(value[:10]) - EPOCH).days
+
+def from_epoch_day(day: int) -> str:
+    """Convert days since 1970-01-01 back to a 'YYYY-MM-DD' string"""
+    return (EPOCH + timedelta(days=day)).isoformat()
+
+def _create_tables(connection):
+    """Version 1: the original layout with TEXT dates and NUMERIC prices"""
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS tickers (
+            ticker TEXT PRIMARY KEY
+        )
+    ''')
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS ticker_data (
+            ticker TEXT,
+            date DATE,
+            open NUMERIC,
+            high NUMERIC,
+            low NUMERIC,
+            close NUMERIC,
+            volume NUMERIC,
+            dividends NUMERIC,
+            stocksplits NUMERIC,
+            PRIMARY KEY (ticker, date)
+        )
+    ''')
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS ticker_news (
+            ticker TEXT,
+            date DATE,
+            news_id TEXT,
+            news_summary TEXT,
+            sentiment TEXT,
+            PRIMARY KEY (ticker, date, news_id)
+        )
+    ''')
+
+def _compact_ticker_data(connection):
+    """
+    Version 2: integer ticker ids, epoch-day dates, REAL prices and INTEGER volume.
+
+    Rows move to the WITHOUT ROWID table ticker_bars keyed by (ticker_id, day). ticker_data
+    becomes a view with the old columns, and INSTEAD OF triggers keep it writable. Tickers that
+    only had data rows are registered so that none of their rows are lost.
+    """
+    connection.execute('''
+        CREATE TABLE tickers_v2 (
+            id INTEGER PRIMARY KEY,
+            ticker TEXT NOT NULL UNIQUE
+        )
+    ''')
+    connection.execute('INSERT INTO tickers_v2 (ticker) SELECT ticker FROM tickers ORDER BY ticker')
+    connection.execute('''
+        INSERT INTO tickers_v2 (ticker)
+        SELECT DISTINCT ticker FROM ticker_data
+        WHERE ticker IS NOT NULL AND ticker NOT IN (SELECT ticker FROM tickers_v2)
+    ''')
+    connection.execute('DROP TABLE tickers')
+    connection.execute('ALTER TABLE tickers_v2 RENAME TO tickers')
+
+    connection.execute('''
+        CREATE TABLE ticker_bars (
+            ticker_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume INTEGER,
+            dividends REAL,
+            stocksplits REAL,
+            PRIMARY KEY (ticker_id, day)
+        ) WITHOUT ROWID
+    ''')
+    connection.execute('''
+        INSERT OR REPLACE INTO ticker_bars
+        SELECT t.id, CAST(julianday(d.date) - 2440587.5 AS INTEGER), d.open, d.high, d.low,
+               d.close, CAST(d.volume AS INTEGER), d.dividends, d.stocksplits
+        FROM ticker_data d JOIN tickers t ON t.ticker = d.ticker
+        WHERE julianday(d.date) IS NOT NULL
+    ''')
+    connection.execute('DROP TABLE ticker_data')
+
+    connection.execute('''
+        CREATE VIEW ticker_data AS
+        SELECT t.ticker AS ticker, date(b.day * 86400, 'unixepoch') AS date, b.open AS open,
+               b.high AS high, b.low AS low, b.close AS close, b.volume AS volume,
+               b.dividends AS dividends, b.stocksplits AS stocksplits
+        FROM ticker_bars b JOIN tickers t ON t.id = b.ticker_id
+    ''')
+    # The trigger statements carry no conflict clause of their own, so INSERT OR REPLACE INTO
+    # ticker_data replaces a stored bar while a plain INSERT still fails on a duplicate.
+    # Unknown tickers are registered with a guarded INSERT, which can never conflict.
+    connection.execute('''
+        CREATE TRIGGER ticker_data_insert INSTEAD OF INSERT ON ticker_data
+        BEGIN
+            INSERT INTO tickers (ticker)
+            SELECT NEW.ticker WHERE NOT EXISTS (SELECT 1 FROM tickers WHERE ticker = NEW.ticker);
+            INSERT INTO ticker_bars
+            VALUES ((SELECT id FROM tickers WHERE ticker = NEW.ticker),
+                    CAST(julianday(NEW.date) - 2440587.5 AS INTEGER), NEW.open, NEW.high, NEW.low,
+                    NEW.close, CAST(NEW.volume AS INTEGER), NEW.dividends, NEW.stocksplits);
+        END
+    ''')
+    connection.execute('''
+        CREATE TRIGGER ticker_data_delete INSTEAD OF DELETE ON ticker_data
+        BEGIN
+            DELETE FROM ticker_bars
+            WHERE ticker_id = (SELECT id FROM tickers WHERE ticker = OLD.ticker)
+              AND day = CAST(julianday(OLD.date) - 2440587.5 AS INTEGER);
+        END
+    ''')
+    connection.execute('''
+        CREATE TRIGGER ticker_data_update INSTEAD OF UPDATE ON ticker_data
+        BEGIN
+            DELETE FROM ticker_bars
+            WHERE ticker_id = (SELECT id FROM tickers WHERE ticker = OLD.ticker)
+              AND day = CAST(julianday(OLD.date) - 2440587.5 AS INTEGER);
+            INSERT INTO tickers (ticker)
+            SELECT NEW.ticker WHERE NOT EXISTS (SELECT 1 FROM tickers WHERE ticker = NEW.ticker);
+            INSERT INTO ticker_bars
+            VALUES ((SELECT id FROM tickers WHERE ticker = NEW.ticker),
+                    CAST(julianday(NEW.date) - 2440587.5 AS INTEGER), NEW.open, NEW.high, NEW.low,
+                    NEW.close, CAST(NEW.volume AS INTEGER), NEW.dividends, NEW.stocksplits);
+        END
+    ''')
+
+def _backfill_jobs(connection):
+    """
+    Version 3: checkpoint tables for stocks.backfill.
+
+    A job covers a date range split into chunks of (ticker, start_date, end_date); end dates are
+    excluded. A chunk is marked done in the same transaction that stores its rows.
+    """
+    connection.execute('''
+        CREATE TABLE backfill_jobs (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            chunk_days INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            created REAL NOT NULL,
+            updated REAL NOT NULL
+        )
+    ''')
+    connection.execute('''
+        CREATE TABLE backfill_chunks (
+            job_id INTEGER NOT NULL REFERENCES backfill_jobs (id) ON DELETE CASCADE,
+            ticker TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt REAL NOT NULL DEFAULT 0,
+            rows INTEGER,
+            error TEXT,
+            updated REAL,
+            PRIMARY KEY (job_id, ticker, start_date)
+        ) WITHOUT ROWID
+    ''')
+
+# Milliseconds since 1970-01-01 by the database clock, used to stamp every written row. 'now' is
+# fixed for the duration of a statement, so both halves read the same instant.
+CHANGE_CLOCK = "(CAST(strftime('%s', 'now') AS INTEGER) * 1000 + CAST(substr(strftime('%f', 'now'), 4) AS INTEGER))"
+
+def _create_ticker_data_view(connection):
+    """The ticker_data view over ticker_bars and its INSTEAD OF triggers, with explicit column lists"""
+    connection.execute('''
+        CREATE VIEW ticker_data AS
+        SELECT t.ticker AS ticker, date(b.day * 86400, 'unixepoch') AS date, b.open AS open,
+               b.high AS high, b.low AS low, b.close AS close, b.volume AS volume,
+               b.dividends AS dividends, b.stocksplits AS stocksplits
+        FROM ticker_bars b JOIN tickers t ON t.id = b.ticker_id
+    ''')
+    insert_bar = '''
+            INSERT INTO tickers (ticker)
+            SELECT NEW.ticker WHERE NOT EXISTS (SELECT 1 FROM tickers WHERE ticker = NEW.ticker);
+            INSERT INTO ticker_bars (ticker_id, day, open, high, low, close, volume, dividends, stocksplits)
+            VALUES ((SELECT id FROM tickers WHERE ticker = NEW.ticker),
+                    CAST(julianday(NEW.date) - 2440587.5 AS INTEGER), NEW.open, NEW.high, NEW.low,
+                    NEW.close, CAST(NEW.volume AS INTEGER), NEW.dividends, NEW.stocksplits);
+    '''
+    delete_bar = '''
+            DELETE FROM ticker_bars
+            WHERE ticker_id = (SELECT id FROM tickers WHERE ticker = OLD.ticker)
+              AND day = CAST(julianday(OLD.date) - 2440587.5 AS INTEGER);
+    '''
+    connection.execute(f'CREATE TRIGGER ticker_data_insert INSTEAD OF INSERT ON ticker_data BEGIN {insert_bar} END')
+    connection.execute(f'CREATE TRIGGER ticker_data_delete INSTEAD OF DELETE ON ticker_data BEGIN {delete_bar} END')
+    connection.execute(f'CREATE TRIGGER ticker_data_update INSTEAD OF UPDATE ON ticker_data '
+                       f'BEGIN {delete_bar} {insert_bar} END')
+
+def _track_changes(connection):
+    """
+    Version 4: a 'changed' column on ticker_bars, and export_watermarks.
+
+    changed holds the CHANGE_CLOCK time of the last write to a bar and is filled in by its
+    default, so every INSERT or INSERT OR REPLACE stamps the row. Incremental exports select
+    bars changed since the watermark recorded in export_watermarks; existing bars are stamped
+    with the time of the migration. ticker_news keeps its layout: its rowid already grows with
+    every insert or replace, so it serves as the news watermark.
+    """
+    # Dropping the view drops its triggers; both are recreated over the rebuilt table
+    connection.execute('DROP VIEW ticker_data')
+    connection.execute(f'''
+        CREATE TABLE ticker_bars_v4 (
+            ticker_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume INTEGER,
+            dividends REAL,
+            stocksplits REAL,
+            changed INTEGER NOT NULL DEFAULT {CHANGE_CLOCK},
+            PRIMARY KEY (ticker_id, day)
+        ) WITHOUT ROWID
+    ''')
+    connection.execute('''
+        INSERT INTO ticker_bars_v4 (ticker_id, day, open, high, low, close, volume, dividends, stocksplits)
+        SELECT ticker_id, day, open, high, low, close, volume, dividends, stocksplits FROM ticker_bars
+    ''')
+    connection.execute('DROP TABLE ticker_bars')
+    connection.execute('ALTER TABLE ticker_bars_v4 RENAME TO ticker_bars')
+    _create_ticker_data_view(connection)
+
+    connection.execute('''
+        CREATE TABLE export_watermarks (
+            target TEXT NOT NULL,
+            source TEXT NOT NULL,
+            watermark INTEGER NOT NULL,
+            exported REAL NOT NULL,
+            PRIMARY KEY (target, source)
+        )
+    ''')
+
+def _sentiment_cache(connection):
+    """Version 5: sentiment_cache, the labels persisted by SentimentEngine.score_many"""
+    connection.execute('''
+        CREATE TABLE sentiment_cache (
+            content_hash TEXT,
+            backend TEXT,
+            sentiment TEXT,
+            PRIMARY KEY (content_hash, backend)
+        ) WITHOUT ROWID
+    ''')
+
+# (version, description, step) in order. Never edit a released step; append a new one instead.
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, 'create tickers, ticker_data and ticker_news', _create_tables),
+    (2, 'compact ticker_data into ticker_bars', _compact_ticker_data),
+    (3, 'add backfill_jobs and backfill_chunks', _backfill_jobs),
+    (4, 'track row changes for incremental exports', _track_changes),
+    (5, 'add sentiment_cache', _sentiment_cache),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Prefix reserved for the indexes in INDEXES; sync_indexes never touches other indexes
+MANAGED_INDEX_PREFIX = 'stocks_idx_'
+
+# Secondary indexes kept in sync by sync_indexes. Unlike migrations they may be edited freely:
+# a changed definition is rebuilt and a removed one is dropped on the next open.
+INDEXES = {
+    # Cross-ticker scans of one date or date range
+    'stocks_idx_ticker_bars_day': 'CREATE INDEX stocks_idx_ticker_bars_day ON ticker_bars (day, ticker_id)',
+    # All news on a date
+    'stocks_idx_ticker_news_date': 'CREATE INDEX stocks_idx_ticker_news_date ON ticker_news (date, ticker)',
+    # One ticker's news filtered by sentiment, newest first
+    'stocks_idx_ticker_news_sentiment':
+        'CREATE INDEX stocks_idx_ticker_news_sentiment ON ticker_news (ticker, sentiment, date)',
+}
+
+def schema_version(connection) -> int:
+    """Return the schema version recorded in the database's user_version"""
+    return connection.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(connection, target: Optional[int] = None) -> int:
+    """
+    Bring a database up to a schema version, applying each pending migration in its own
+    transaction.
+
+    The version is kept in PRAGMA user_version, so unversioned databases (user_version 0)
+    created by older releases are migrated too. Each step takes the write lock with
+    BEGIN IMMEDIATE and re-reads the version, so concurrent processes migrate only once.
+
+    Parameters:
+        connection (sqlite3.Connection): Writable connection to the database
+        target (int, optional): Version to migrate to. If None, the latest SCHEMA_VERSION
+
+    Returns:
+        int: Schema version of the database afterwards
+    """
+    if target is None:
+        target = SCHEMA_VERSION
+    current = schema_version(connection)
+    if current > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {current} is newer than supported version {SCHEMA_VERSION}")
+
+    for version, description, step in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        if connection.in_transaction:
+            connection.commit()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            current = schema_version(connection)
+            if version <= current:
+                connection.rollback()
+                continue
+            step(connection)
+            connection.execute(f'PRAGMA user_version = {version}')
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        current = version
+        logger.info(f"Migrated database schema to version {version}: {description}")
+    return current
+
+def sync_indexes(connection) -> None:
+    """
+    Create missing or changed indexes from INDEXES and drop managed ones no longer listed.
+
+    Only indexes named with MANAGED_INDEX_PREFIX are managed; any other index is left alone.
+    """
+    existing = dict(connection.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND substr(name, 1, ?) = ?",
+        (len(MANAGED_INDEX_PREFIX), MANAGED_INDEX_PREFIX)
+    ).fetchall())
+    with connection:
+        for name, sql in existing.items():
+            if INDEXES.get(name) != sql:
+                connection.execute(f'DROP INDEX {name}')
+                logger.info(f"Dropped index {name}")
+        for name, sql in INDEXES.items():
+            if existing.get(name) != sql:
+                connection.execute(sql)
+                logger.info(f"Created index {name}")
+
+def ensure_schema(connection) -> int:
+    """
+    Migrate a database to the current schema version and sync its indexes.
+
+    Parameters:
+        connection (sqlite3.Connection): Writable connection to the database
+
+    Returns:
+        int: Schema version of the database
+    """
+    version = migrate(connection)
+    sync_indexes(connection)
+    return version
+
+def ticker_id(connection, ticker: str) -> int:
+    """Return the id of a ticker, registering it if it is unknown. Call inside a write transaction."""
+    row = connection.execute('SELECT id FROM tickers WHERE ticker = ?', (ticker,)).fetchone()
+    if row is not None:
+        return row[0]
+    return connection.execute('INSERT INTO tickers (ticker) VALUES (?)', (ticker,)).lastrowid
@@ -0,0 +1,249 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Polarity above/below these bounds is labelled positive/negative
+POSITIVE_THRESHOLD = 0.1
+NEGATIVE_THRESHOLD = -0.1
+
+def label_for(polarity: float) -> str:
+    """Map a polarity score in [-1, 1] to 'positive', 'negative' or 'neutral'"""
+    if polarity > POSITIVE_THRESHOLD:
+        return 'positive'
+    elif polarity < NEGATIVE_THRESHOLD:
+        return 'negative'
+    return 'neutral'
+
+def content_hash(text: str) -> str:
+    """Key used to memoize scores: identical summaries share one entry across tickers"""
+    import hashlib
+
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+class TextBlobBackend:
+    """Polarity from TextBlob's pattern analyzer. Raises ImportError if textblob is missing."""
+
+    name = 'textblob'
+
+    def __init__(self):
+        from textblob import TextBlob
+        self._textblob = TextBlob
+
+    def polarity(self, text: str) -> float:
+        return self._textblob(text).sentiment.polarity
+
+class LexiconBackend:
+    """
+    Dependency-free scorer counting positive and negative market words.
+
+    A negator ('not', 'no', ...) flips the next word. The polarity is the balance of positive
+    and negative hits, so it is 0 when the text contains no lexicon words.
+    """
+
+    name = 'lexicon'
+
+    POSITIVE = frozenset('''
+        advance advanced advances beat beats bullish climb climbed climbs gain gained gains good
+        great growth higher improve improved improves jump jumped jumps outperform outperformed
+        positive profit profitable profits rally rallied rallies record recover recovered
+        recovery rise rises rising rose strong stronger surge surged surges upgrade upgraded
+        upbeat win wins boost boosted boosts soar soared soars optimistic exceed exceeded
+        exceeds expand expanded expansion success successful best excellent robust
+    '''.split())
+
+    NEGATIVE = frozenset('''
+        bad bearish cut cuts decline declined declines downgrade downgraded drop dropped drops
+        fall fallen falling falls fell fear fears loss losses lower miss missed misses negative
+        plunge plunged plunges slump slumped slumps sink sank sinks tumble tumbled tumbles weak
+        weaker worse worst warning warns lawsuit probe recall recalled bankruptcy default
+        layoffs concern concerns crash crashed risk risks slowdown selloff terrible awful
+    '''.split())
+
+    NEGATORS = frozenset(['not', 'no', 'never', "n't", 'without'])
+
+    _token = re.compile(r"[a-z]+(?:'[a-z]+)?|n't")
+
+    def polarity(self, text: str) -> float:
+        positive = negative = 0
+        negate = False
+        for token in self._token.findall(text.lower()):
+            if token in self.NEGATORS or token.endswith("n't"):
+                negate = True
+                continue
+            if token in self.POSITIVE:
+                if negate:
+                    negative += 1
+                else:
+                    positive += 1
+            elif token in self.NEGATIVE:
+                if negate:
+                    positive += 1
+                else:
+                    negative += 1
+            negate = False
+        hits = positive + negative
+        return (positive - negative) / hits if hits else 0.0
+
+BACKENDS = {
+    'textblob': TextBlobBackend,
+    'lexicon': LexiconBackend,
+}
+
+class SentimentEngine:
+    """
+    Scores texts with a backend and memoizes the labels by content hash.
+
+    The in-memory memo is bounded and evicts least recently used entries. Passing a
+    connection (or a function that calls into one) to score_many also consults and fills the
+    sentiment_cache table, created by the schema migrations, so labels survive across processes
+    and runs.
+
+    Parameters:
+        backend (str): Name from BACKENDS, or 'auto' for TextBlob when installed, else lexicon
+        max_memo (int): Maximum number of labels kept in memory
+    """
+
+    def __init__(self, backend: str = 'auto', max_memo: int = 100000):
+        self.backend = self._load_backend(backend)
+        self.max_memo = max_memo
+        self._memo: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.backend.name
+
+    def score(self, text: str) -> str:
+        """Return the sentiment label of a single text"""
+        return self.score_many([text])[0]
+
+    def score_many(self, texts: List[Optional[str]], connection=None,
+                   score_missing: Optional[Callable[[List[str]], List[str]]] = None,
+                   with_connection: Optional[Callable[[Callable], Any]] = None) -> List[str]:
+        """
+        Score a batch of texts, running the backend only once per distinct unseen text.
+
+        Parameters:
+            texts (list): Texts to score; empty or None texts are 'neutral'
+            connection (sqlite3.Connection, optional): Connection to a migrated database whose
+                                                       sentiment_cache table is read before
+                                                       scoring and written afterwards
+            score_missing (callable, optional): Function labelling a list of unseen texts, e.g.
+                                                one that fans out to a process pool. Defaults to
+                                                score_uncached in-process
+            with_connection (callable, optional): Calls a function with the connection holding
+                                                  sentiment_cache and returns its result; used
+                                                  instead of connection, e.g. to borrow a writer
+                                                  only while the table is read or written
+
+        Returns:
+            list: Sentiment label for each text, in order
+        """
+        labels = ['neutral'] * len(texts)
+        pending: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                if not text:
+                    continue
+                key = content_hash(text)
+                label = self._memo.get(key)
+                if label is not None:
+                    self._memo.move_to_end(key)
+                    labels[i] = label
+                else:
+                    pending.setdefault(key, []).append(i)
+
+        if with_connection is None and connection is not None:
+            def with_connection(func):
+                return func(connection)
+
+        if pending and with_connection is not None:
+            persisted = with_connection(partial(self._load_persisted, keys=list(pending)))
+            for key, label in persisted.items():
+                for i in pending.pop(key):
+                    labels[i] = label
+                self._remember(key, label)
+
+        if pending:
+            keys = list(pending)
+            unseen = [texts[pending[key][0]] for key in keys]
+            scored = score_missing(unseen) if score_missing else self.score_uncached(unseen)
+            for key, label in zip(keys, scored):
+                for i in pending[key]:
+                    labels[i] = label
+                self._remember(key, label)
+            if with_connection is not None:
+                with_connection(partial(self._persist, scored=list(zip(keys, scored))))
+        return labels
+
+    def clear(self) -> None:
+        """Forget all memoized labels"""
+        with self._lock:
+            self._memo.clear()
+
+    def score_uncached(self, texts: List[str]) -> List[str]:
+        """Label texts with the backend, bypassing the memo and sentiment_cache"""
+        return [label_for(self.backend.polarity(text)) for text in texts]
+
+    def _remember(self, key, label):
+        with self._lock:
+            self._memo[key] = label
+            if len(self._memo) > self.max_memo:
+                self._memo.popitem(last=False)
+
+    def _load_persisted(self, connection, keys):
+        found = {}
+        for i in range(0, len(keys), 900):
+            chunk = keys[i:i + 900]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor = connection.execute(
+                f'SELECT content_hash, sentiment FROM sentiment_cache '
+                f'WHERE backend = ? AND content_hash IN ({placeholders})',
+                [self.name] + chunk
+            )
+            found.update(cursor.fetchall())
+        return found
+
+    def _persist(self, connection, scored):
+        with connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO sentiment_cache (content_hash, backend, sentiment) VALUES (?, ?, ?)',
+                [(key, self.name, label) for key, label in scored]
+            )
+
+    @staticmethod
+    def _load_backend(backend):
+        if backend == 'auto':
+            try:
+                return TextBlobBackend()
+            except ImportError:
+                logger.warning("textblob is not installed; using the lexicon sentiment backend")
+                return LexiconBackend()
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown sentiment backend '{backend}'; choose from auto, {', '.join(BACKENDS)}")
+        return BACKENDS[backend]()
+
+_engines: Dict[str, SentimentEngine] = {}
+_engines_lock = threading.Lock()
+
+def get_engine(backend: str = 'auto') -> SentimentEngine:
+    """
+    Return this process's engine for a backend, loading it on first use.
+
+    Parameters:
+        backend (str): Name from BACKENDS, or 'auto'
+
+    Returns:
+        SentimentEngine: Shared engine; its memo lives as long as the process
+    """
+    with _engines_lock:
+        engine = _engines.get(backend)
+        if engine is None:
+            engine = SentimentEngine(backend)
+            _engines[backend] = engine
+        return engine
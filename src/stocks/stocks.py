@@ -1,49 +1,86 @@
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager
 from datetime import datetime, timedelta
-from typing import List, Tuple, Union, Optional, Dict, Any
+from typing import List, Tuple, Union, Optional, Dict, Any, Iterator
 
 # Import utils functions
-from .utils import format_date, parse_date, sanitize_input
+from . import metrics
+from .utils import format_date, parse_date, sanitize_input, iter_cursor
+from .concurrency import HostRateLimiter
+from .ingest import INSERT_TICKER_BARS_SQL, history_to_bars
+from .database import bulk_load
+from .pool import ConnectionPool
+from .sentiment import get_engine
+from .news import dedup_news, drop_stored_news, parse_news_item, score_sentiments, stage_timer
+from .cache import MISSING, RangeCache, copy_result
+from .columnar import TICKER_DATA_COLUMNS, cursor_to_arrays, arrays_to_frame, empty_arrays
+from .records import BarSeries
+from .schema import DELETE_TICKER_BARS_SQL, TICKER_BARS_SELECT, TICKER_DATA_SELECT, ensure_schema, ticker_id, to_epoch_day
 
 logger = logging.getLogger(__name__)
 
+# Stay below SQLite's default limit on bound parameters per statement
+SQLITE_MAX_PARAMS = 900
+
+# Refreshes covering at least this many ticker-days run under the bulk_load profile
+BULK_LOAD_MIN_DAYS = 365 * 50
+
+# Result layouts supported by Stocks.get_ticker_data
+TICKER_DATA_OUTPUTS = ('rows', 'frame', 'arrays', 'bars')
+
+# Latest stored date per ticker, completed with an optional WHERE and GROUP BY b.ticker_id
+WATERMARK_SQL = (
+    "SELECT t.ticker, date(MAX(b.day) * 86400, 'unixepoch') "
+    "FROM ticker_bars b JOIN tickers t ON t.id = b.ticker_id"
+)
+
+# ticker_data columns that can be pivoted by Stocks.get_panel
+PANEL_FIELDS = ('open', 'high', 'low', 'close', 'volume', 'dividends', 'stocksplits')
+
 class Stocks:
-    def __init__(self, db_connection):
+    def __init__(self, db_connection, cache: Optional[RangeCache] = None,
+                 pool: Optional[ConnectionPool] = None):
+        """
+        Parameters:
+            db_connection (sqlite3.Connection): Connection to the stocks database
+            cache (RangeCache, optional): Read cache for get_ticker_data. It is attached to the
+                                          connection so writes to ticker_data invalidate it
+            pool (ConnectionPool, optional): Pool whose writer is db_connection, e.g. Database.pool.
+                                             Reads then borrow pooled read-only connections and
+                                             writes are serialized on the writer, so a single
+                                             Stocks instance can be shared between threads
+        """
         self.db_connection = db_connection
+        self.cache = cache
+        self.pool = pool
         self.create_tables()
+        if cache is not None:
+            cache.attach(db_connection)
+
+    @contextmanager
+    def _reader(self):
+        """Borrow a connection for reading"""
+        if self.pool is None:
+            yield self.db_connection
+        else:
+            with self.pool.reader() as connection:
+                yield connection
+
+    @contextmanager
+    def _writer(self):
+        """Borrow the connection used for writing"""
+        if self.pool is None:
+            yield self.db_connection
+        else:
+            with self.pool.writer() as connection:
+                yield connection
 
     def create_tables(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tickers (
-                ticker TEXT PRIMARY KEY
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ticker_data (
-                ticker TEXT,
-                date DATE,
-                open NUMERIC,
-                high NUMERIC,
-                low NUMERIC,
-                close NUMERIC,
-                volume NUMERIC,
-                dividends NUMERIC,
-                stocksplits NUMERIC,
-                PRIMARY KEY (ticker, date)
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ticker_news (
-                ticker TEXT,
-                date DATE,
-                news_id TEXT,
-                news_summary TEXT,
-                sentiment TEXT,
-                PRIMARY KEY (ticker, date, news_id)
-            )
-        ''')
-        self.db_connection.commit()
+        """Create the tables or migrate them to the current schema version, and sync the indexes"""
+        with self._writer() as connection:
+            ensure_schema(connection)
 
     def add_ticker(self, ticker, start_date=None, end_date=None):
         """
@@ -56,31 +93,65 @@ class Stocks:
                                                uses most recent data in DB or 10 years ago
         end_date (str or datetime, optional): End date in format 'YYYY-MM-DD'. If None, uses today's date
         """
-        with self.db_connection:  # This automatically handles commit/rollback
-            cursor = self.db_connection.cursor()
-            
-            # First check if ticker already exists
-            cursor.execute('SELECT 1 FROM tickers WHERE ticker = ?', (ticker,))
-            exists = cursor.fetchone() is not None
-            
-            if not exists:
-                try:
-                    cursor.execute('INSERT INTO tickers (ticker) VALUES (?)', (ticker,))
-                    logger.info(f"Added ticker: {ticker}")
-                    # Only refresh data for newly added tickers, passing along date parameters
-                    self.refresh_data_for_ticker(ticker, start_date, end_date)
-                except Exception as e:
-                    logger.error(f"Error adding ticker {ticker}: {e}")
-            else:
-                print(f"Ticker {ticker} already exists in database")
+        self.add_tickers([ticker], start_date, end_date, max_workers=1, batch_size=None)
+
+    def add_tickers(self, symbols, start_date=None, end_date=None, max_workers=4, requests_per_second=None,
+                    batch_size=50, bulk=None) -> Dict[str, List[str]]:
+        """
+        Adds many tickers in one transaction, then backfills the new ones.
+        
+        The new symbols are inserted with a single statement (per SQLITE_MAX_PARAMS symbols) and
+        committed before anything is downloaded, so no write transaction is open during network
+        I/O. The backfill then runs like refresh_data, restricted to the new tickers.
+        
+        Parameters:
+            symbols (list): Ticker symbols to add; duplicates are ignored
+            start_date (str or datetime, optional): Start date in format 'YYYY-MM-DD'. If None, 
+                                                   uses 10 years ago
+            end_date (str or datetime, optional): End date in format 'YYYY-MM-DD'. If None, uses today's date
+            max_workers (int): Number of downloads in flight at once
+            requests_per_second (float, optional): Upper bound on requests sent to the Yahoo host
+            batch_size (int, optional): Download up to batch_size new tickers per request. If None,
+                                        every ticker is downloaded on its own
+            bulk (bool, optional): Run the writes under the bulk_load connection profile. If None, it
+                                   is used automatically when the planned backfill is large
+        
+        Returns:
+            dict: 'added' lists the tickers that were inserted and backfilled, 'existing' those
+                  that were already in the database, both in the order given
+        """
+        symbols = list(dict.fromkeys(sanitize_input(symbol) for symbol in symbols))
+        with self._writer() as connection, connection:
+            existing = set()
+            for i in range(0, len(symbols), SQLITE_MAX_PARAMS):
+                chunk = symbols[i:i + SQLITE_MAX_PARAMS]
+                placeholders = ', '.join('?' * len(chunk))
+                cursor = connection.execute(f'SELECT ticker FROM tickers WHERE ticker IN ({placeholders})', chunk)
+                existing.update(row[0] for row in cursor)
+            added = [symbol for symbol in symbols if symbol not in existing]
+            for i in range(0, len(added), SQLITE_MAX_PARAMS):
+                chunk = added[i:i + SQLITE_MAX_PARAMS]
+                connection.execute(
+                    f"INSERT OR IGNORE INTO tickers (ticker) VALUES {', '.join(['(?)'] * len(chunk))}", chunk)
+
+        existing = [symbol for symbol in symbols if symbol in existing]
+        for symbol in existing:
+            metrics.emit('ticker.exists', "Ticker {ticker} already exists in database", ticker=symbol)
+        if added:
+            metrics.emit('ticker.added', "Added tickers: {tickers}", tickers=', '.join(added))
+            windows = self._plan_refresh(added, start_date, end_date)
+            self._refresh_windows(windows, max_workers, requests_per_second, batch_size, bulk)
+        return {'added': added, 'existing': existing}
 
     def remove_ticker(self, ticker):
-        cursor = self.db_connection.cursor()
-        cursor.execute('DELETE FROM tickers WHERE ticker = ?', (ticker,))
-        cursor.execute('DELETE FROM ticker_data WHERE ticker = ?', (ticker,))
-        self.db_connection.commit()
+        with self._writer() as connection:
+            cursor = connection.cursor()
+            cursor.execute(DELETE_TICKER_BARS_SQL, (ticker,))
+            cursor.execute('DELETE FROM tickers WHERE ticker = ?', (ticker,))
+            connection.commit()
 
-    def refresh_data(self, start_date=None, end_date=None):
+    def refresh_data(self, start_date=None, end_date=None, max_workers=1, requests_per_second=None,
+                     batch_size=None, bulk=None):
         """
         Refreshes stock data for all tickers in the database.
         
@@ -88,93 +159,497 @@ class Stocks:
         start_date (str or datetime, optional): Start date in format 'YYYY-MM-DD'. If None, 
                                                uses most recent data in DB or 10 years ago
         end_date (str or datetime, optional): End date in format 'YYYY-MM-DD'. If None, uses today's date
+        max_workers (int): Number of downloads in flight at once. With the default of 1 tickers
+                           are refreshed one after another
+        requests_per_second (float, optional): Upper bound on requests sent to the Yahoo host
+                                               across all workers. If None, requests are not throttled
+        batch_size (int, optional): If set, tickers with overlapping date windows are downloaded
+                                    together, up to batch_size symbols per request
+        bulk (bool, optional): Run the writes under the bulk_load connection profile. If None, it
+                               is used automatically when the planned backfill is large
         """
-        cursor = self.db_connection.cursor()
-        # Get all tickers from the database
-        cursor.execute('SELECT ticker FROM tickers')
-        tickers = [row[0] for row in cursor.fetchall()]
+        tickers = self.get_all_tickers()
         
         if not tickers:
-            print("No tickers found in database")
+            metrics.emit('refresh.no_tickers', "No tickers found in database")
             return  # No tickers to refresh
         
-        print(f"Refreshing data for {len(tickers)} tickers...")
+        windows = self._plan_refresh(tickers, start_date, end_date)
+        metrics.emit('refresh.start', "Refreshing data for {windows} of {tickers} tickers ({up_to_date} already up to date)...",
+                     windows=len(windows), tickers=len(tickers), up_to_date=len(tickers) - len(windows))
+        self._refresh_windows(windows, max_workers, requests_per_second, batch_size, bulk)
+
+    def _refresh_windows(self, windows, max_workers=1, requests_per_second=None, batch_size=None, bulk=None):
+        """Download and store planned (ticker, start, end) windows, see refresh_data for the options"""
+        if bulk is None:
+            bulk = self._window_days(windows) >= BULK_LOAD_MIN_DAYS
+
+        with ExitStack() as stack:
+            if bulk:
+                # Hold the writer for the whole load so other writes never run with bulk settings.
+                # Each stored frame still commits on its own, so no transaction spans a download.
+                connection = stack.enter_context(self._writer())
+                stack.enter_context(bulk_load(connection))
+            if max_workers <= 1 and requests_per_second is None and batch_size is None:
+                for ticker, start, end in windows:
+                    self._refresh_window(ticker, start, end)
+                return
+
+            rate_limiter = None
+            if requests_per_second is not None:
+                rate_limiter = HostRateLimiter(requests_per_second, burst=max(1, max_workers))
+            self._refresh_concurrently(windows, max(1, max_workers), rate_limiter, batch_size)
+
+    @staticmethod
+    def _window_days(windows):
+        """Total number of calendar days covered by a list of (ticker, start, end) windows"""
+        return sum(max(0, (parse_date(end) - parse_date(start)).days) for _, start, end in windows)
+
+    def get_watermarks(self, tickers=None) -> Dict[str, str]:
+        """
+        Return the most recent stored date for each ticker using a single grouped query.
+        
+        Parameters:
+            tickers (list, optional): Restrict the lookup to these tickers. If None, all tickers
+                                      with stored data are returned
+        
+        Returns:
+            dict: Ticker symbol to its latest date in format 'YYYY-MM-DD'. Tickers without any
+                  stored data are absent
+        """
+        with self._reader() as connection:
+            cursor = connection.cursor()
+            if tickers is None:
+                cursor.execute(WATERMARK_SQL + ' GROUP BY b.ticker_id')
+                return dict(cursor.fetchall())
+
+            watermarks = {}
+            tickers = list(tickers)
+            for i in range(0, len(tickers), SQLITE_MAX_PARAMS):
+                chunk = tickers[i:i + SQLITE_MAX_PARAMS]
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(
+                    f'{WATERMARK_SQL} WHERE t.ticker IN ({placeholders}) GROUP BY b.ticker_id',
+                    chunk
+                )
+                watermarks.update(cursor.fetchall())
+            return watermarks
+
+    def _plan_refresh(self, tickers, start_date=None, end_date=None):
+        """
+        Work out the download window of every ticker, dropping tickers that are already up to date.
+        
+        When start_date is None the stored watermarks are read with one query for all tickers.
+        
+        Returns:
+            list: (ticker, start_date, end_date) tuples with dates in format 'YYYY-MM-DD'
+        """
+        if start_date is not None:
+            watermarks = {}
+        elif len(tickers) > SQLITE_MAX_PARAMS:
+            watermarks = self.get_watermarks()
+        else:
+            watermarks = self.get_watermarks(tickers)
+
+        windows = []
         for ticker in tickers:
-            self.refresh_data_for_ticker(ticker, start_date, end_date)
+            window = self._window_from_watermark(watermarks.get(ticker), start_date, end_date)
+            if window is not None:
+                windows.append((ticker,) + window)
+        return windows
+
+    def find_gaps(self, tickers=None, start_date=None, end_date=None, calendar='nyse',
+                  merge_within=5) -> Dict[str, List[Tuple[str, str]]]:
+        """
+        Find the trading sessions missing from each ticker's stored history.
+        
+        Stored dates are compared against an exchange calendar and the missing sessions are
+        merged into as few download windows as possible. Tickers that do not trade on the
+        calendar are skipped, so their local sessions are not reported as gaps on every run.
+        
+        Parameters:
+            tickers (list, optional): Tickers to check. If None, every ticker with stored data
+            start_date (str or datetime, optional): First date to check in format 'YYYY-MM-DD'.
+                                                   If None, each ticker's first stored date, so
+                                                   history before it is not treated as missing
+            end_date (str or datetime, optional): Date to check up to, excluded. If None, today
+            calendar (str, TradingCalendar or dict): Calendar name from stocks.calendars.CALENDARS
+                                                     or a TradingCalendar instance, checked for
+                                                     the tickers it covers, e.g. 'nyse' skips
+                                                     ^N225. A dict of ticker symbol to calendar
+                                                     sets one per ticker; tickers it leaves out
+                                                     are skipped
+            merge_within (int): Merge gaps separated by at most this many stored sessions
+        
+        Returns:
+            dict: Ticker symbol to its (start_date, end_date) download windows, end excluded.
+                  Tickers without gaps are absent, as are tickers with no stored data when
+                  start_date is None and tickers without a calendar
+        """
+        import numpy as np
+        from .calendars import calendar_for
+        from .gaps import gap_windows
+
+        end_date = format_date(end_date or datetime.now().date())
+        last_day = to_epoch_day(end_date) - 1
+
+        with self._reader() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT t.ticker, MIN(b.day) FROM ticker_bars b '
+                           'JOIN tickers t ON t.id = b.ticker_id GROUP BY b.ticker_id')
+            first_days = dict(cursor.fetchall())
+            if tickers is None:
+                tickers = sorted(first_days)
+            if start_date:
+                first_days = dict.fromkeys(tickers, to_epoch_day(format_date(start_date)))
+
+            # Tickers to check, grouped by calendar so each calendar's sessions are built once
+            by_calendar = {}
+            skipped = []
+            for ticker in tickers:
+                first_day = first_days.get(ticker)
+                if first_day is None or first_day > last_day:
+                    continue
+                ticker_calendar = calendar_for(calendar, ticker)
+                if ticker_calendar is None:
+                    skipped.append(ticker)
+                else:
+                    by_calendar.setdefault(id(ticker_calendar), (ticker_calendar, []))[1].append(ticker)
+            if skipped:
+                metrics.emit('gaps.skipped', "Skipped gap detection for {count} tickers without a calendar",
+                             logging.DEBUG, count=len(skipped), tickers=skipped)
+
+            epoch = np.datetime64('1970-01-01', 'D')
+            gaps = {}
+            for ticker_calendar, members in by_calendar.values():
+                first = min(first_days[ticker] for ticker in members)
+                sessions = ticker_calendar.sessions(epoch + first, epoch + last_day)
+                session_days = (sessions - epoch).astype('int64')
+                for ticker in members:
+                    first_day = first_days[ticker]
+                    cursor.execute('SELECT day FROM ticker_bars '
+                                   'WHERE ticker_id = (SELECT id FROM tickers WHERE ticker = ?) '
+                                   'AND day BETWEEN ? AND ?', (ticker, first_day, last_day))
+                    stored = np.fromiter((row[0] for row in cursor), dtype='int64') + epoch
+                    expected = sessions[np.searchsorted(session_days, first_day):]
+                    windows = gap_windows(expected, stored, merge_within)
+                    if windows:
+                        gaps[ticker] = windows
+        return {ticker: gaps[ticker] for ticker in tickers if ticker in gaps}
+
+    def repair_gaps(self, tickers=None, start_date=None, end_date=None, calendar='nyse', merge_within=5,
+                    max_workers=1, requests_per_second=None, batch_size=None, bulk=None):
+        """
+        Download only the missing sessions found by find_gaps.
+        
+        Parameters:
+            tickers, start_date, end_date, calendar, merge_within: See find_gaps
+            max_workers, requests_per_second, batch_size, bulk: See refresh_data
+        
+        Returns:
+            list: The (ticker, start_date, end_date) windows that were downloaded
+        """
+        gaps = self.find_gaps(tickers, start_date, end_date, calendar, merge_within)
+        windows = [(ticker, start, end) for ticker, ranges in gaps.items() for start, end in ranges]
+        metrics.emit('repair.start', "Repairing {windows} gaps in {tickers} tickers",
+                     windows=len(windows), tickers=len(gaps))
+        if windows:
+            self._refresh_windows(windows, max_workers, requests_per_second, batch_size, bulk)
+        return windows
 
-    def refresh_news(self):
+    def backfill(self, start_date, end_date=None, tickers=None, name=None, chunk_days=365, max_workers=1,
+                 requests_per_second=None, max_attempts=5, base_delay=2.0, max_delay=300.0,
+                 retry_failed=False, calendar='nyse') -> Dict[str, Any]:
+        """
+        Load a long history as a resumable job of (ticker, date range) chunks.
+        
+        Progress is checkpointed in the backfill_jobs and backfill_chunks tables: each chunk is
+        marked done in the transaction that stores its rows. Failed downloads are retried with
+        exponential backoff. Calling backfill again with the same name, after a crash or a rate
+        limit ban, resumes the job and downloads only the chunks that are not done yet.
+        
+        Parameters:
+            start_date (str or datetime): First date in format 'YYYY-MM-DD'
+            end_date (str or datetime, optional): End date, excluded. If None, the end date of
+                                                  the existing job, or today's date for a new one
+            tickers (list, optional): Tickers to load. If None, every ticker in the database
+            name (str, optional): Job name; defaults to 'start_date..end_date', or 'start_date..'
+                                  when end_date is omitted, so rerunning on a later day resumes
+                                  the same job. A job of that name must cover the same dates;
+                                  new tickers are added to it
+            chunk_days (int): Days of history downloaded per request
+            max_workers (int): Number of downloads in flight at once
+            requests_per_second (float, optional): Upper bound on requests sent to the Yahoo host
+            max_attempts (int): Downloads tried per chunk before it is marked failed
+            base_delay (float): Seconds before the first retry; doubled after each failure
+            max_delay (float): Longest wait between two attempts
+            retry_failed (bool): Also retry chunks that ran out of attempts in an earlier run
+            calendar (str, TradingCalendar or dict): See find_gaps. An empty download for a chunk
+                                                     with sessions on it is retried like an error
+                                                     if the ticker has bars stored before the
+                                                     chunk; uncovered tickers are checked against
+                                                     weekdays
+        
+        Returns:
+            dict: Job progress, see get_backfill_status
+        """
+        from .backfill import BackfillRunner, create_job, job_end_date
+
+        start_date = format_date(start_date)
+        if tickers is None:
+            tickers = self.get_all_tickers()
+        else:
+            tickers = list(dict.fromkeys(sanitize_input(ticker) for ticker in tickers))
+
+        with self._writer() as connection:
+            if end_date is None:
+                name = name or f'{start_date}..'
+                end_date = job_end_date(connection, name) or format_date(datetime.now().date())
+            else:
+                end_date = format_date(end_date)
+                name = name or f'{start_date}..{end_date}'
+            job_id = create_job(connection, name, tickers, start_date, end_date, chunk_days)
+        metrics.emit('backfill.start', "Backfilling {tickers} tickers from {start} to {end} as job '{job}'",
+                     job=name, tickers=len(tickers), start=start_date, end=end_date)
+        BackfillRunner(self, job_id, max_workers, requests_per_second, max_attempts, base_delay,
+                       max_delay, calendar=calendar).run(retry_failed)
+        return self.get_backfill_status(name)
+
+    def get_backfill_status(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Report the progress of a backfill job.
+        
+        Returns:
+            dict: 'job', 'status', 'chunks', the number of 'pending', 'done' and 'failed'
+                  chunks, 'rows' stored and 'errors', a (ticker, start_date, end_date, error)
+                  tuple per failed chunk; None if there is no such job
+        """
+        from .backfill import job_status
+
+        with self._reader() as connection:
+            return job_status(connection, name)
+
+    def _refresh_concurrently(self, windows, max_workers, rate_limiter=None, batch_size=None):
+        """
+        Downloads ticker histories on a bounded thread pool and writes them from the calling thread.
+        
+        Worker threads only talk to Yahoo Finance. Every write happens here, so the writer
+        connection is never shared between threads.
+        """
+        from .api import YAHOO_HOST, group_date_windows
+
+        if batch_size:
+            groups = group_date_windows(windows, max_group_size=batch_size)
+        else:
+            groups = [[window] for window in windows]
+
+        def fetch(group):
+            if rate_limiter is not None:
+                rate_limiter.acquire(YAHOO_HOST)
+            started = time.perf_counter()
+            if batch_size:
+                return started, self._fetch_history_group(group)
+            ticker, start, end = group[0]
+            return started, {ticker: self._fetch_history(ticker, start, end)}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(fetch, group): group for group in groups}
+            for future in as_completed(futures):
+                group = futures[future]
+                try:
+                    started, frames = future.result()
+                except Exception as e:
+                    self._fetch_failed(', '.join(t for t, _, _ in group), e)
+                    continue
+                for ticker, start, end in group:
+                    self._store_history(ticker, frames[ticker], start, end)
+                    if metrics.enabled():
+                        metrics.observe('refresh.seconds', time.perf_counter() - started, ticker=ticker)
+
+    def refresh_news(self, max_workers=8, sentiment_workers=None, batch_size=500, rescore=False,
+                     sentiment_backend='auto', sentiment_cache=False):
         """
         Fetches recent news for all stock tickers in the database.
         Ignores indices (tickers starting with ^).
         Avoids duplicate news entries based on news_id.
+        
+        The refresh runs as a pipeline: news for all tickers is fetched concurrently, the
+        items are parsed and de-duplicated, articles already stored are dropped, sentiment is
+        scored in batches on a process pool, and rows are written with one executemany per batch.
+        
+        Parameters:
+        max_workers (int): Number of tickers whose news is fetched at once
+        sentiment_workers (int, optional): Processes used for sentiment scoring. If None, one per
+                                           CPU core; 0 scores in the current process
+        batch_size (int): Number of news items per scoring batch and per insert
+        rescore (bool): Score and rewrite articles that are already stored as well
+        sentiment_backend (str): Sentiment backend, see stocks.sentiment.BACKENDS; 'auto' uses
+                                 TextBlob when installed and the built-in lexicon otherwise
+        sentiment_cache (bool): Reuse and persist labels in the sentiment_cache table
+        
+        Returns:
+        dict: 'tickers', 'items' (written) and 'skipped' (already stored) counts, and 'timings'
+              with the seconds spent in each stage
         """
-        import yfinance as yf
-        from datetime import datetime
-        import hashlib
+        timings = {}
+        tickers = self._news_tickers()
         
-        cursor = self.db_connection.cursor()
-        # Get all stock tickers (exclude indices starting with ^)
-        cursor.execute("SELECT ticker FROM tickers WHERE ticker NOT LIKE '^%'")
-        tickers = [row[0] for row in cursor.fetchall()]
+        if not tickers:
+            return self._news_report(0, 0, 0, timings)  # No tickers to refresh
+        
+        with stage_timer(timings, 'fetch'):
+            news_by_ticker = self._fetch_news_concurrently(tickers, max_workers)
+
+        with stage_timer(timings, 'parse'):
+            rows = self._parse_news(news_by_ticker)
+
+        with stage_timer(timings, 'dedup'):
+            rows = dedup_news(rows)
+            fetched = len(rows)
+            if not rescore:
+                rows = drop_stored_news(rows, self._stored_news_ids(list(news_by_ticker)))
+
+        with stage_timer(timings, 'score'):
+            sentiments = score_sentiments([row[3] for row in rows], sentiment_workers, batch_size, sentiment_backend,
+                                          with_connection=self._with_writer if sentiment_cache else None)
+
+        with stage_timer(timings, 'store'):
+            news_count = self._store_scored_news(rows, sentiments, batch_size)
+        
+        return self._news_report(len(tickers), news_count, fetched - len(rows), timings)
+
+    def _fetch_news_concurrently(self, tickers, max_workers):
+        """
+        Fetch news for many tickers on a thread pool.
+        
+        Returns:
+            dict: Ticker symbol to its list of raw news items; tickers that failed are left out
+        """
+        news_by_ticker = {}
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {executor.submit(self._fetch_news, ticker): ticker for ticker in tickers}
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    news_items = future.result()
+                except Exception as e:
+                    self._news_fetch_failed(ticker, e)
+                    continue
+                self._collect_news(news_by_ticker, ticker, news_items)
+        return news_by_ticker
+
+    @staticmethod
+    def _news_fetch_failed(ticker, error):
+        """Record a failed news download"""
+        metrics.increment('fetch.errors', endpoint='news')
+        logger.error(f"Error fetching news for {ticker}: {str(error)}")
+
+    @staticmethod
+    def _collect_news(news_by_ticker, ticker, news_items):
+        """Add a ticker's downloaded news items to news_by_ticker, skipping tickers without news"""
+        if not news_items:
+            logger.debug(f"No news found for {ticker}")
+            return
+        news_by_ticker[ticker] = news_items
+
+    @staticmethod
+    def _parse_news(news_by_ticker):
+        """
+        Parse raw news items into ticker_news rows without sentiment, skipping malformed items.
         
+        Returns:
+            list: (ticker, date, news_id, news_summary) tuples
+        """
+        rows = []
+        for ticker, news_items in news_by_ticker.items():
+            for item in news_items:
+                try:
+                    rows.append(parse_news_item(ticker, item))
+                except (KeyError, TypeError, AttributeError) as e:
+                    metrics.increment('news.malformed')
+                    logger.error(f"Skipping malformed news item for {ticker}: {e}")
+        return rows
+
+    @staticmethod
+    def _news_report(tickers, items, skipped, timings):
+        """Emit the news refresh events and return the refresh_news statistics"""
         if not tickers:
-            logger.info("No tickers found for news refresh")
-            return  # No tickers to refresh
+            metrics.emit('news.no_tickers', "No tickers found for news refresh")
+            return {'tickers': 0, 'items': 0, 'skipped': 0, 'timings': timings}
+        metrics.emit('news.refreshed', "Total news items processed: {items} ({skipped} already stored)",
+                     items=items, skipped=skipped)
+        metrics.emit('news.timings', "News refresh timings: {summary}", summary=', '.join(
+            f"{stage}={seconds:.3f}s" for stage, seconds in timings.items()), timings=timings)
+        if metrics.enabled():
+            for stage, seconds in timings.items():
+                metrics.observe('news.stage_seconds', seconds, stage=stage)
+        return {'tickers': tickers, 'items': items, 'skipped': skipped, 'timings': timings}
+
+    def _news_tickers(self):
+        """Return all stock tickers, excluding indices starting with ^"""
+        with self._reader() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT ticker FROM tickers WHERE ticker NOT LIKE '^%'")
+            return [row[0] for row in cursor.fetchall()]
+
+    def _fetch_news(self, ticker):
+        """Download recent news items for a ticker. Safe to call from worker threads."""
+        from .api import get_stock_news
+        with metrics.timer('fetch.seconds', endpoint='news'):
+            return get_stock_news(ticker, count=1000)
+
+    def _stored_news_ids(self, tickers):
+        """
+        Load the news_ids already stored for the given tickers.
+        
+        Returns:
+            set: (ticker, news_id) pairs
+        """
+        stored = set()
+        with self._reader() as connection:
+            cursor = connection.cursor()
+            for i in range(0, len(tickers), SQLITE_MAX_PARAMS):
+                chunk = tickers[i:i + SQLITE_MAX_PARAMS]
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(f'SELECT ticker, news_id FROM ticker_news WHERE ticker IN ({placeholders})', chunk)
+                stored.update(cursor.fetchall())
+        return stored
+
+    def _store_scored_news(self, rows, sentiments, batch_size):
+        """
+        Write parsed rows with their sentiment labels, batch_size rows per transaction.
         
+        Returns:
+            int: Number of rows written
+        """
         news_count = 0
-        for ticker in tickers:
-            try:
-                ticker_obj = yf.Ticker(ticker)
-                news_items = ticker_obj.get_news(count=1000)
-                
-                if not news_items:
-                    logger.debug(f"No news found for {ticker}")
-                    continue
-                
-                ticker_news_count = 0    
-                for item in news_items:
-                    # Generate a unique ID for the news item if it doesn't have one
-                    if 'id' in item:
-                        news_id = item['id']
-                    else:
-                        # Create a hash from the title and publish date as a unique ID
-                        news_id = hashlib.md5(f"{item.get('title', '')}{item.get('publishedAt', '')}".encode()).hexdigest()
-                    
-                    # Convert timestamp to date
-                    if 'pubDate' in item['content']:
-                        try:
-                            news_date = datetime.fromisoformat(item['content']['pubDate'].replace("Z", "+00:00"))
-                            news_date = news_date.strftime('%Y-%m-%d')
-                        except (ValueError, TypeError):
-                            news_date = datetime.now().strftime('%Y-%m-%d')
-                    else:
-                        news_date = datetime.now().strftime('%Y-%m-%d')
-
-                    # Get the news summary
-                    summary = item['content'].get('summary')
-                    if not summary and 'title' in item['content']:
-                        summary = item['content'].get('title')
-                    
-                    # Use the analyze_sentiment function
-                    sentiment = analyze_sentiment(summary) if summary else 'neutral'
-                    
-                    # Insert or replace the news item
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO ticker_news 
-                        (ticker, date, news_id, news_summary, sentiment) 
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (ticker, news_date, news_id, summary, sentiment))
-                    ticker_news_count += 1
-                
-                self.db_connection.commit()
-                news_count += ticker_news_count
-                logger.info(f"Added/updated {ticker_news_count} news items for {ticker}")
-                
-            except Exception as e:
-                logger.error(f"Error fetching news for {ticker}: {str(e)}")
-                continue
-        
-        logger.info(f"Total news items processed: {news_count}")
+        for i in range(0, len(rows), batch_size):
+            batch = [row + (sentiment,) for row, sentiment in
+                     zip(rows[i:i + batch_size], sentiments[i:i + batch_size])]
+            news_count += self._store_news(batch)
+        return news_count
+
+    def _with_writer(self, func):
+        """Call func with the writer connection, borrowing it only for the call"""
+        with self._writer() as connection:
+            return func(connection)
+
+    def _store_news(self, rows):
+        """
+        Insert or replace ticker_news rows in one transaction.
+        
+        Returns:
+            int: Number of rows written
+        """
+        with self._writer() as connection, metrics.timer('sql.seconds', op='store_news'):
+            connection.executemany('''
+                INSERT OR REPLACE INTO ticker_news 
+                (ticker, date, news_id, news_summary, sentiment) 
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+            connection.commit()
+        metrics.increment('rows.inserted', len(rows), table='ticker_news')
+        return len(rows)
 
     def get_all_tickers(self) -> List[str]:
         """
@@ -183,12 +658,14 @@ class Stocks:
         Returns:
             List[str]: List of ticker symbols
         """
-        cursor = self.db_connection.cursor()
-        cursor.execute('SELECT ticker FROM tickers')
-        return [row[0] for row in cursor.fetchall()]
+        with self._reader() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT ticker FROM tickers')
+            return [row[0] for row in cursor.fetchall()]
 
     def get_ticker_data(self, ticker: str, start_date: Optional[Union[str, datetime]] = None, 
-                        end_date: Optional[Union[str, datetime]] = None) -> List[Tuple]:
+                        end_date: Optional[Union[str, datetime]] = None, output: str = 'rows',
+                        ascending: bool = False):
         """
         Return data for a specific ticker, optionally filtered by date range.
         
@@ -196,58 +673,318 @@ class Stocks:
             ticker (str): The ticker symbol to get data for
             start_date (str or datetime, optional): Start date in format 'YYYY-MM-DD'
             end_date (str or datetime, optional): End date in format 'YYYY-MM-DD'
+            output (str): 'rows' for a list of tuples, 'frame' for a pandas DataFrame indexed by
+                          date, 'arrays' for a dict of NumPy arrays keyed by column name, or
+                          'bars' for a compact BarSeries
+            ascending (bool): Order by date ascending instead of descending
         
         Returns:
-            list: List of tuples containing ticker data ordered by date (descending)
+            list, DataFrame, dict or BarSeries: Ticker data ordered by date (descending unless
+                                                ascending is set)
         """
-        cursor = self.db_connection.cursor()
-        
+        if output not in TICKER_DATA_OUTPUTS:
+            raise ValueError(f"output must be one of {', '.join(TICKER_DATA_OUTPUTS)}, got '{output}'")
+
         # Sanitize inputs
         ticker = sanitize_input(ticker)
+        # BarSeries keeps dates as epoch days, so the bars output reads b.day as it is stored
+        select = TICKER_BARS_SELECT if output == 'bars' else TICKER_DATA_SELECT
+        query, params = self._ticker_data_query(ticker, start_date, end_date, ascending, select)
+
+        if self.cache is not None:
+            cache_key = (output, query, tuple(params))
+            cached = self.cache.get(cache_key)
+            if cached is not MISSING:
+                return copy_result(cached)
+            # Taken before the query so a write landing during it keeps the result out of the cache
+            generation = self.cache.generation(ticker)
+        
+        # Execute the query with appropriate parameters
+        try:
+            with self._reader() as connection, metrics.timer('sql.seconds', op='get_ticker_data'):
+                cursor = connection.cursor()
+                cursor.execute(query, params)
+                if output == 'rows':
+                    result = cursor.fetchall()
+                    count = len(result)
+                elif output == 'bars':
+                    result = BarSeries.from_cursor(cursor)
+                    count = len(result)
+                else:
+                    result = cursor_to_arrays(cursor)
+                    count = len(result['date'])
+            if output == 'frame':
+                result = arrays_to_frame(result)
+            
+            metrics.observe('query.rows', count, output=output)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Retrieved {count} data points for ticker {ticker}")
+
+            if self.cache is not None:
+                self.cache.put(cache_key, ticker, result, generation)
+                return copy_result(result)
+            return result
+        except Exception as e:
+            metrics.increment('query.errors')
+            logger.error(f"Error retrieving data for {ticker}: {str(e)}")
+            if output == 'rows':
+                return []
+            if output == 'bars':
+                return BarSeries()
+            result = empty_arrays(TICKER_DATA_COLUMNS)
+            return arrays_to_frame(result) if output == 'frame' else result
+
+    def get_panel(self, tickers: List[str], start_date: Optional[Union[str, datetime]] = None,
+                  end_date: Optional[Union[str, datetime]] = None, fields: Union[str, List[str]] = 'close'):
+        """
+        Return a wide date-by-ticker matrix for one or more fields across many tickers.
+        
+        Tickers are loaded with chunked IN queries, each served by range scans on the
+        (ticker, date) primary key, instead of one query per ticker.
+        
+        Parameters:
+            tickers (list): Ticker symbols to load; they become the columns in this order
+            start_date (str or datetime, optional): Start date in format 'YYYY-MM-DD'
+            end_date (str or datetime, optional): End date in format 'YYYY-MM-DD'
+            fields (str or list): ticker_data column(s) to load, e.g. 'close' or ['open', 'close']
+        
+        Returns:
+            DataFrame or dict: For a single field name, a DataFrame indexed by date (ascending)
+                               with one column per ticker. For a list of fields, a dict mapping
+                               each field to such a DataFrame
+        """
+        import pandas as pd
+
+        single = isinstance(fields, str)
+        field_list = [fields] if single else list(fields)
+        invalid = [field for field in field_list if field not in PANEL_FIELDS]
+        if invalid:
+            raise ValueError(f"Unknown fields {invalid}; choose from {', '.join(PANEL_FIELDS)}")
+
+        tickers = [sanitize_input(ticker) for ticker in tickers]
+        if start_date and not isinstance(start_date, str):
+            start_date = format_date(start_date)
+        if end_date and not isinstance(end_date, str):
+            end_date = format_date(end_date)
+
+        date_filter = ''
+        date_params = []
+        if start_date:
+            date_filter += ' AND b.day >= ?'
+            date_params.append(to_epoch_day(start_date))
+        if end_date:
+            date_filter += ' AND b.day <= ?'
+            date_params.append(to_epoch_day(end_date))
+
+        chunk_size = SQLITE_MAX_PARAMS - len(date_params)
+        pieces = {field: [] for field in field_list}
+        with self._reader() as connection:
+            cursor = connection.cursor()
+            for i in range(0, len(tickers), chunk_size):
+                chunk = tickers[i:i + chunk_size]
+                placeholders = ', '.join('?' * len(chunk))
+                cursor.execute(
+                    f"SELECT t.ticker AS ticker, date(b.day * 86400, 'unixepoch') AS date, "
+                    f'{", ".join("b." + field + " AS " + field for field in field_list)} '
+                    f'FROM ticker_bars b JOIN tickers t ON t.id = b.ticker_id '
+                    f'WHERE t.ticker IN ({placeholders}){date_filter}',
+                    chunk + date_params
+                )
+                long_frame = arrays_to_frame(cursor_to_arrays(cursor), index=None)
+                for field in field_list:
+                    pieces[field].append(long_frame.pivot(index='date', columns='ticker', values=field))
+
+        panels = {}
+        for field in field_list:
+            if pieces[field]:
+                panel = pd.concat(pieces[field], axis=1, sort=True)
+            else:
+                panel = pd.DataFrame(index=pd.DatetimeIndex([], name='date'))
+            panel = panel.reindex(columns=tickers).sort_index()
+            panel.columns.name = 'ticker'
+            panels[field] = panel
+
+        logger.debug(f"Loaded panel of {len(tickers)} tickers for fields {field_list}")
+        return panels[fields] if single else panels
+
+    @staticmethod
+    def _ticker_data_query(ticker, start_date=None, end_date=None, ascending=False, select=TICKER_DATA_SELECT):
+        """
+        Build the SELECT for one ticker's data over an optional date range.
         
+        Parameters:
+            select (str): Column list to filter, TICKER_DATA_SELECT or TICKER_BARS_SELECT
+        
+        Returns:
+            tuple: (query, params)
+        """
         # Convert datetime objects to strings if necessary
-        if start_date and isinstance(start_date, datetime):
+        if start_date and not isinstance(start_date, str):
             start_date = format_date(start_date)
         
-        if end_date and isinstance(end_date, datetime):
+        if end_date and not isinstance(end_date, str):
             end_date = format_date(end_date)
         
-        # Build the query based on provided parameters
-        query = 'SELECT * FROM ticker_data WHERE ticker = ?'
+        # Build the query based on provided parameters. Bounds are compared as epoch days so
+        # the range is read from the (ticker_id, day) primary key
+        query = select + ' WHERE t.ticker = ?'
         params = [ticker]
         
         if start_date and end_date:
-            query += ' AND date BETWEEN ? AND ?'
-            params.extend([start_date, end_date])
+            query += ' AND b.day BETWEEN ? AND ?'
+            params.extend([to_epoch_day(start_date), to_epoch_day(end_date)])
         elif start_date:
-            query += ' AND date >= ?'
-            params.append(start_date)
+            query += ' AND b.day >= ?'
+            params.append(to_epoch_day(start_date))
         elif end_date:
-            query += ' AND date <= ?'
-            params.append(end_date)
+            query += ' AND b.day <= ?'
+            params.append(to_epoch_day(end_date))
         
-        query += ' ORDER BY date DESC'
+        query += ' ORDER BY b.day ASC' if ascending else ' ORDER BY b.day DESC'
+        return query, params
+
+    def get_ticker_news(self, ticker, sentiment=None):
+        """
+        Return all news for a specific ticker, newest first.
         
-        # Execute the query with appropriate parameters
-        try:
-            cursor.execute(query, params)
-            result = cursor.fetchall()
-            
-            if not result:
-                logger.info(f"No data found for ticker {ticker} in the specified date range")
+        Parameters:
+            ticker (str): The ticker symbol to get news for
+            sentiment (str, optional): Only return 'positive', 'negative' or 'neutral' news
+        
+        Returns:
+            list: ticker_news rows
+        """
+        with self._reader() as connection:
+            cursor = connection.cursor()
+            if sentiment is None:
+                cursor.execute('SELECT * FROM ticker_news WHERE ticker = ? ORDER BY date DESC', (ticker,))
             else:
-                logger.info(f"Retrieved {len(result)} data points for ticker {ticker}")
-            
-            return result
-        except Exception as e:
-            logger.error(f"Error retrieving data for {ticker}: {str(e)}")
-            return []
+                cursor.execute('SELECT * FROM ticker_news WHERE ticker = ? AND sentiment = ? ORDER BY date DESC',
+                               (ticker, sentiment))
+            return cursor.fetchall()
 
-    def get_ticker_news(self, ticker):
-        """Return all news for a specific ticker"""
-        cursor = self.db_connection.cursor()
-        cursor.execute('SELECT * FROM ticker_news WHERE ticker = ? ORDER BY date DESC', (ticker,))
-        return cursor.fetchall()
+    def get_news_for_date(self, date):
+        """
+        Return the news of every ticker published on one date, ordered by ticker.
+        
+        Parameters:
+            date (str or datetime): Date in format 'YYYY-MM-DD'
+        
+        Returns:
+            list: ticker_news rows
+        """
+        if not isinstance(date, str):
+            date = format_date(date)
+        with self._reader() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT * FROM ticker_news WHERE date = ? ORDER BY ticker', (date,))
+            return cursor.fetchall()
+
+    def get_data_for_date(self, date):
+        """
+        Return the bar of every ticker that has data on one date, ordered by ticker.
+        
+        Parameters:
+            date (str or datetime): Date in format 'YYYY-MM-DD'
+        
+        Returns:
+            list: ticker_data rows
+        """
+        if not isinstance(date, str):
+            date = format_date(date)
+        with self._reader() as connection:
+            cursor = connection.cursor()
+            cursor.execute(TICKER_DATA_SELECT + ' WHERE b.day = ? ORDER BY t.ticker', (to_epoch_day(date),))
+            return cursor.fetchall()
+
+    def iter_ticker_data(self, ticker: str, start_date: Optional[Union[str, datetime]] = None,
+                         end_date: Optional[Union[str, datetime]] = None, ascending: bool = False,
+                         arraysize: int = 1000, batches: bool = False) -> Iterator:
+        """
+        Stream data for a specific ticker instead of loading it all at once.
+        
+        Parameters:
+            ticker (str): The ticker symbol to get data for
+            start_date (str or datetime, optional): Start date in format 'YYYY-MM-DD'
+            end_date (str or datetime, optional): End date in format 'YYYY-MM-DD'
+            ascending (bool): Order by date ascending instead of descending
+            arraysize (int): Number of rows fetched from SQLite at a time
+            batches (bool): Yield lists of up to arraysize rows instead of single rows
+        
+        Returns:
+            Iterator: Rows in the same layout as get_ticker_data, or batches of them
+        """
+        query, params = self._ticker_data_query(sanitize_input(ticker), start_date, end_date, ascending)
+        return self._iter_query(query, params, arraysize, batches)
+
+    def iter_ticker_news(self, ticker: Optional[str] = None, arraysize: int = 1000,
+                         batches: bool = False) -> Iterator:
+        """
+        Stream news for a specific ticker, or the whole ticker_news table if ticker is None.
+        
+        Parameters:
+            ticker (str, optional): The ticker symbol to get news for
+            arraysize (int): Number of rows fetched from SQLite at a time
+            batches (bool): Yield lists of up to arraysize rows instead of single rows
+        
+        Returns:
+            Iterator: Rows in the same layout as get_ticker_news, or batches of them
+        """
+        if ticker is None:
+            return self._iter_query('SELECT * FROM ticker_news ORDER BY ticker, date DESC', (),
+                                    arraysize, batches)
+        return self._iter_query('SELECT * FROM ticker_news WHERE ticker = ? ORDER BY date DESC', (ticker,),
+                                arraysize, batches)
+
+    def _iter_query(self, query, params, arraysize, batches):
+        """Stream a query on a borrowed reader, which is returned once the iterator is exhausted or closed"""
+        with self._reader() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, params)
+            yield from iter_cursor(cursor, arraysize, batches)
+
+    def export_parquet(self, path: str, tables: Tuple[str, ...] = ('ticker_data', 'ticker_news'),
+                       partition_by: Union[None, str, List[str]] = 'ticker', incremental: bool = False,
+                       batch_size: int = 65536, compression: str = 'snappy') -> Dict[str, Dict[str, Any]]:
+        """
+        Stream ticker_data and ticker_news to partitioned Parquet files. Requires pyarrow.
+        
+        Each table goes to path/<table>/ in the hive layout, e.g.
+        path/ticker_data/ticker=AAPL/year=2024/part-....parquet, written in record batches of
+        batch_size rows read on a borrowed reader.
+        
+        Parameters:
+            path (str): Root directory of the export
+            tables (tuple): Tables to export
+            partition_by (str or list, optional): 'ticker', 'year', both or None
+            incremental (bool): Only export rows written since the previous export to the same
+                                path, as new files next to the earlier ones. Deleted rows are not
+                                tracked
+            batch_size (int): Rows per record batch
+            compression (str): Parquet compression codec
+        
+        Returns:
+            dict: Table name to 'rows' exported, 'files' created and the new 'watermark'
+        """
+        from .parquet import export_parquet
+        return export_parquet(self._reader, self._writer, path, tables, partition_by, incremental, batch_size,
+                              compression)
+
+    def import_parquet(self, path: str, tables: Tuple[str, ...] = ('ticker_data', 'ticker_news'),
+                       batch_size: int = 65536) -> Dict[str, int]:
+        """
+        Load files written by export_parquet, upserting rows. Requires pyarrow.
+        
+        Parameters:
+            path (str): Root directory of the export
+            tables (tuple): Tables to import; those without a directory under path are skipped
+            batch_size (int): Rows read and inserted at a time
+        
+        Returns:
+            dict: Table name to the number of rows loaded
+        """
+        from .parquet import import_parquet
+        return import_parquet(self._writer, path, tables, batch_size)
 
     def refresh_data_for_ticker(self, ticker, start_date=None, end_date=None):
         """
@@ -259,101 +996,135 @@ class Stocks:
                                                uses most recent data in DB or 10 years ago
         end_date (str or datetime, optional): End date in format 'YYYY-MM-DD'. If None, uses today's date
         """
-        import yfinance as yf
-        from datetime import datetime, timedelta
+        last_date = None
+        if start_date is None:
+            last_date = self.get_watermarks([ticker]).get(ticker)
+        window = self._window_from_watermark(last_date, start_date, end_date)
+        if window is None:
+            return
+        self._refresh_window(ticker, *window)
+
+    def _refresh_window(self, ticker, start_date, end_date):
+        """Download and store one ticker's history for an already resolved window"""
+        started = time.perf_counter()
+        try:
+            df = self._fetch_history(ticker, start_date, end_date)
+        except Exception as e:
+            self._fetch_failed(ticker, e)
+            return
+        self._store_history(ticker, df, start_date, end_date)
+        if metrics.enabled():
+            metrics.observe('refresh.seconds', time.perf_counter() - started, ticker=ticker)
+
+    @staticmethod
+    def _fetch_failed(tickers, error):
+        """Record a failed history download for one ticker or a comma-separated group"""
+        metrics.increment('refresh.errors', stage='fetch')
+        metrics.emit('refresh.fetch_error', "Error fetching data for {ticker}: {error}", logging.ERROR,
+                     ticker=tickers, error=str(error))
+
+    @staticmethod
+    def _window_from_watermark(last_date, start_date=None, end_date=None):
+        """
+        Work out which dates need to be downloaded for a ticker.
+        
+        Parameters:
+            last_date (str): Most recent stored date for the ticker, or None if it has no data
+            start_date (str or datetime, optional): Explicit start date; last_date is ignored if given
+            end_date (str or datetime, optional): End date, today if None
         
-        cursor = self.db_connection.cursor()
+        Returns:
+            tuple: (start_date, end_date) as 'YYYY-MM-DD' strings, or None if the ticker is up to date
+        """
         today = datetime.now().date()
         
         # Set end_date if not provided
         if end_date is None:
             end_date = today.strftime('%Y-%m-%d')
-        elif isinstance(end_date, datetime):
-            end_date = end_date.strftime('%Y-%m-%d')
+        elif not isinstance(end_date, str):
+            end_date = format_date(end_date)
             
         # If start_date is provided, use it directly
         if start_date is not None:
-            if isinstance(start_date, datetime):
-                start_date = start_date.strftime('%Y-%m-%d')
+            if not isinstance(start_date, str):
+                start_date = format_date(start_date)
+            return start_date, end_date
+
+        if last_date is None:
+            # No existing data for this ticker, get 10 years of history
+            start_date = (today - timedelta(days=365*10)).strftime('%Y-%m-%d')
         else:
-            # Find the most recent data point for this ticker
-            cursor.execute(
-                'SELECT MAX(date) FROM ticker_data WHERE ticker = ?', 
-                (ticker,)
-            )
-            last_date_row = cursor.fetchone()
-            last_date = last_date_row[0]
+            # Get data since the last recorded date (add 1 day to avoid duplication)
+            last_date = datetime.strptime(last_date, '%Y-%m-%d').date()
+            start_date = (last_date + timedelta(days=1)).strftime('%Y-%m-%d')
             
-            if last_date is None:
-                # No existing data for this ticker, get 10 years of history
-                start_date = (today - timedelta(days=365*10)).strftime('%Y-%m-%d')
-            else:
-                # Get data since the last recorded date (add 1 day to avoid duplication)
-                last_date = datetime.strptime(last_date, '%Y-%m-%d').date()
-                start_date = (last_date + timedelta(days=1)).strftime('%Y-%m-%d')
-                
-                # If last date is at or after end_date, nothing to do
-                if last_date >= datetime.strptime(end_date, '%Y-%m-%d').date():
-                    return
-                    
-        # Fetch data from Yahoo Finance
+            # If last date is at or after end_date, nothing to do
+            if last_date >= datetime.strptime(end_date, '%Y-%m-%d').date():
+                return None
+        return start_date, end_date
+
+    def _fetch_history(self, ticker, start_date, end_date):
+        """Download daily history for a ticker. Safe to call from worker threads."""
+        from .api import get_stock_data
+        with metrics.timer('fetch.seconds', endpoint='history'):
+            try:
+                return get_stock_data(ticker, start_date, end_date)
+            except Exception:
+                metrics.increment('fetch.errors', endpoint='history')
+                raise
+
+    def _fetch_history_group(self, windows):
+        """Download several tickers in one request. Safe to call from worker threads."""
+        from .api import get_stock_data_group
+        with metrics.timer('fetch.seconds', endpoint='history_group'):
+            try:
+                return get_stock_data_group(windows)
+            except Exception:
+                metrics.increment('fetch.errors', endpoint='history_group')
+                raise
+
+    def _store_history(self, ticker, df, start_date, end_date):
+        """
+        Write a downloaded history frame to ticker_data.
+        
+        Returns:
+            int: Number of rows written
+        """
+        if df.empty:
+            metrics.emit('refresh.no_data', "No data found for {ticker} between {start} and {end}",
+                         ticker=ticker, start=start_date, end=end_date)
+            return 0
+
+        metrics.increment('rows.fetched', len(df))
         try:
-            ticker_obj = yf.Ticker(ticker)
-            df = ticker_obj.history(start=start_date, end=end_date)
-            
-            if df.empty:
-                print(f"No data found for {ticker} between {start_date} and {end_date}")
-                return
-                
-            # Prepare and insert data
-            data_to_insert = []
-            for index, row in df.iterrows():
-                date = index.strftime('%Y-%m-%d')
-                data_to_insert.append((
-                    ticker,
-                    date,
-                    row['Open'],
-                    row['High'],
-                    row['Low'],
-                    row['Close'],
-                    row['Volume'],
-                    row.get('Dividends', 0),
-                    row.get('Stock Splits', 0)
-                ))
-            
-            # Instead of committing after each insert
-            cursor.executemany('''
-                INSERT OR REPLACE INTO ticker_data 
-                (ticker, date, open, high, low, close, volume, dividends, stocksplits) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', data_to_insert)
-            self.db_connection.commit()
-            print(f"Refreshed {len(df)} data points for {ticker} from {start_date} to {end_date}")
+            with self._writer() as connection, metrics.timer('sql.seconds', op='store_history'):
+                connection.executemany(INSERT_TICKER_BARS_SQL, history_to_bars(ticker_id(connection, ticker), df))
+                connection.commit()
+            metrics.increment('rows.inserted', len(df), table='ticker_data')
+            metrics.emit('refresh.stored', "Refreshed {rows} data points for {ticker} from {start} to {end}",
+                         ticker=ticker, rows=len(df), start=start_date, end=end_date)
+            return len(df)
             
         except Exception as e:
-            print(f"Error fetching data for {ticker}: {e}")
+            metrics.increment('refresh.errors', stage='store')
+            metrics.emit('refresh.store_error', "Error storing data for {ticker}: {error}", logging.ERROR,
+                         ticker=ticker, error=str(e))
+            return 0
 
-def analyze_sentiment(text):
+def analyze_sentiment(text, backend='auto'):
     """
-    Simple sentiment analysis using TextBlob.
+    Sentiment analysis using the process-wide sentiment engine.
+    
+    Identical texts are scored once per process thanks to the engine's memo cache.
     
     Parameters:
         text (str): The text to analyze
+        backend (str): Sentiment backend, 'auto' uses TextBlob when installed and the
+                       built-in lexicon otherwise
         
     Returns:
         str: Sentiment classification ('positive', 'negative', or 'neutral')
     """
-    try:
-        from textblob import TextBlob
-        analysis = TextBlob(text)
-        # Determine if positive, negative, or neutral
-        polarity = analysis.sentiment.polarity
-        if polarity > 0.1:
-            return 'positive'
-        elif polarity < -0.1:
-            return 'negative'
-        else:
-            return 'neutral'
-    except Exception:
-        # In case TextBlob isn't installed or other errors
-        return 'neutral'
\ No newline at end of file
+    if not text:
+        return 'neutral'
+    return get_engine(backend).score(text)
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Union, Optional, Any
+from typing import Union, Optional, Any, Iterator
 
 def format_date(date: Union[datetime, Any]) -> str:
     """
@@ -91,4 +91,26 @@ def get_date_range(start_date: Optional[str] = None, end_date: Optional[str] = N
     elif not isinstance(start_date, str):
         start_date = format_date(start_date)
     
-    return (start_date, end_date)
\ No newline at end of file
+    return (start_date, end_date)
+
+def iter_cursor(cursor, arraysize: int = 1000, batches: bool = False) -> Iterator:
+    """
+    Stream the rows of an executed cursor without loading the whole result
+    
+    Parameters:
+        cursor (sqlite3.Cursor): Cursor on which a SELECT has been executed
+        arraysize (int): Number of rows fetched from SQLite per round trip
+        batches (bool): Yield lists of up to arraysize rows instead of single rows
+        
+    Returns:
+        Iterator: Rows (tuples) or batches of rows (lists of tuples)
+    """
+    cursor.arraysize = arraysize
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            return
+        if batches:
+            yield rows
+        else:
+            yield from rows
@@ -0,0 +1,14 @@
+import pandas as pd
+
+def make_history(start, days):
+    """Build a small yfinance-style history frame for offline tests"""
+    index = pd.date_range(start, periods=days, freq='D', name='Date')
+    return pd.DataFrame({
+        'Open': [10.0 + i for i in range(days)],
+        'High': [11.0 + i for i in range(days)],
+        'Low': [9.0 + i for i in range(days)],
+        'Close': [10.5 + i for i in range(days)],
+        'Volume': [1000 * (i + 1) for i in range(days)],
+        'Dividends': [0.0] * days,
+        'Stock Splits': [0.0] * days,
+    }, index=index)
@@ -0,0 +1,144 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+# and of this directory, for the shared test helpers
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from stocks import metrics
+from stocks.aio import AsyncStocks
+from stocks.stocks import Stocks
+from helpers import make_history
+
+class TestAsyncStocks(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'async.db')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_refresh_runs_fetches_concurrently(self):
+        lock = threading.Lock()
+        in_flight = [0, 0]  # current, peak
+
+        def fake_fetch(self, ticker, start_date, end_date):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight[1], in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return make_history(start_date, 3)
+
+        async def scenario():
+            async with await AsyncStocks.open(self.path, max_concurrency=3) as stocks:
+                await stocks._run_db(stocks.stocks.db_connection.executemany,
+                                     'INSERT INTO tickers (ticker) VALUES (?)',
+                                     [(f'T{i}',) for i in range(8)])
+                counts = await stocks.refresh_data('2024-01-01', '2024-01-04')
+                frame = await stocks.get_ticker_data('T0', output='frame')
+                return counts, frame
+
+        with mock.patch.object(Stocks, '_fetch_history', fake_fetch):
+            counts, frame = asyncio.run(scenario())
+
+        self.assertEqual(len(counts), 8)
+        self.assertEqual(set(counts.values()), {3})
+        self.assertEqual(len(frame), 3)
+        self.assertGreater(in_flight[1], 1)
+        self.assertLessEqual(in_flight[1], 3)
+
+    def test_refresh_reports_like_stocks(self):
+        sink = metrics.InMemorySink()
+
+        def fetch(self, ticker, start_date, end_date):
+            if ticker == 'BAD':
+                raise ConnectionError('rate limited')
+            return make_history(start_date, 3)
+
+        async def scenario():
+            async with await AsyncStocks.open(self.path) as stocks:
+                await stocks.refresh_data('2024-01-01', '2024-01-04')
+                await stocks._run_db(stocks.stocks.db_connection.executemany,
+                                     'INSERT INTO tickers (ticker) VALUES (?)', [('AAA',), ('BAD',)])
+                return await stocks.refresh_data('2024-01-01', '2024-01-04')
+
+        metrics.set_sink(sink)
+        try:
+            with mock.patch.object(Stocks, '_fetch_history', fetch):
+                counts = asyncio.run(scenario())
+        finally:
+            metrics.set_sink(None)
+
+        self.assertEqual(counts, {'AAA': 3, 'BAD': 0})
+        events = [name for name, _ in sink.events]
+        self.assertEqual(events[:2], ['refresh.no_tickers', 'refresh.start'])
+        self.assertIn('refresh.fetch_error', events)
+        self.assertEqual(sink.counter('refresh.errors', stage='fetch'), 1)
+        self.assertEqual(len(sink.values('refresh.seconds', ticker='AAA')), 1)
+
+    def test_refresh_news(self):
+        items = [{'id': 'n1', 'content': {'pubDate': '2024-01-02T10:00:00Z', 'summary': 'Shares rose'}}]
+
+        async def scenario():
+            async with await AsyncStocks.open(self.path) as stocks:
+                await stocks._run_db(stocks.stocks.db_connection.executemany,
+                                     'INSERT INTO tickers (ticker) VALUES (?)', [('AAPL',), ('^GSPC',)])
+                # sentiment_cache is read and written on the database thread, not the scoring one
+                first = await stocks.refresh_news(sentiment_workers=0, sentiment_cache=True)
+                second = await stocks.refresh_news(sentiment_workers=0)
+                cached = await stocks._run_db(lambda: stocks.stocks.db_connection.execute(
+                    'SELECT COUNT(*) FROM sentiment_cache').fetchone()[0])
+                return first, second, await stocks.get_ticker_news('AAPL'), cached
+
+        with mock.patch.object(Stocks, '_fetch_news', return_value=items) as fetch:
+            first, second, news, cached = asyncio.run(scenario())
+
+        self.assertEqual([call.args for call in fetch.call_args_list], [('AAPL',), ('AAPL',)])
+        # Same stage statistics as Stocks.refresh_news; stored articles are skipped the second time
+        self.assertEqual((first['tickers'], first['items'], first['skipped']), (1, 1, 0))
+        self.assertEqual((second['items'], second['skipped']), (0, 1))
+        self.assertIn('score', first['timings'])
+        self.assertEqual(news[0][1:3], ('2024-01-02', 'n1'))
+        self.assertEqual(cached, 1)
+
+    def test_reads_are_not_blocked_by_news_fetches(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_fetch(ticker):
+            started.set()
+            release.wait(5)
+            return []
+
+        async def scenario():
+            async with await AsyncStocks.open(self.path) as stocks:
+                await stocks._run_db(stocks.stocks.db_connection.execute,
+                                     "INSERT INTO tickers (ticker) VALUES ('AAPL')")
+                refresh = asyncio.ensure_future(stocks.refresh_news(sentiment_workers=0))
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, started.wait, 5)
+                try:
+                    tickers = await asyncio.wait_for(stocks.get_all_tickers(), 1)
+                finally:
+                    release.set()
+                return tickers, await refresh
+
+        with mock.patch.object(Stocks, '_fetch_news', side_effect=slow_fetch):
+            tickers, report = asyncio.run(scenario())
+
+        self.assertEqual(tickers, ['AAPL'])
+        self.assertEqual(report['items'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
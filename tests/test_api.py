@@ -0,0 +1,62 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from stocks import api
+
+class TestBatchDownload(unittest.TestCase):
+
+    def test_group_overlapping_windows(self):
+        windows = [
+            ('AAA', '2024-03-01', '2024-03-10'),
+            ('BBB', '2024-03-02', '2024-03-10'),
+            ('CCC', '2015-01-01', '2024-03-10'),
+            ('DDD', '2024-01-01', '2024-01-31'),
+        ]
+        groups = api.group_date_windows(windows)
+        grouped = sorted(sorted(t for t, _, _ in group) for group in groups)
+        # The 10 year backfill and the non-overlapping window each get their own request
+        self.assertEqual(grouped, [['AAA', 'BBB'], ['CCC'], ['DDD']])
+
+    def test_group_size_limit(self):
+        windows = [(f'T{i}', '2024-03-01', '2024-03-10') for i in range(5)]
+        groups = api.group_date_windows(windows, max_group_size=2)
+        self.assertEqual([len(group) for group in groups], [2, 2, 1])
+
+    def test_group_never_repeats_a_ticker(self):
+        windows = [('AAA', '2024-03-01', '2024-03-05'), ('AAA', '2024-03-04', '2024-03-08'),
+                   ('BBB', '2024-03-02', '2024-03-08')]
+        groups = api.group_date_windows(windows)
+        for group in groups:
+            tickers = [t for t, _, _ in group]
+            self.assertEqual(len(tickers), len(set(tickers)))
+        self.assertEqual(sum(len(group) for group in groups), 3)
+
+    def test_group_download_splits_per_ticker(self):
+        index = pd.date_range('2024-03-01', periods=5, freq='D', name='Date')
+        columns = pd.MultiIndex.from_product([['AAA', 'BBB'], ['Open', 'Close', 'Volume']])
+        data = pd.DataFrame(1.0, index=index, columns=columns)
+        data.loc[index[0], 'BBB'] = float('nan')
+
+        with mock.patch('yfinance.download', return_value=data) as download:
+            frames = api.get_stock_data_group([
+                ('AAA', '2024-03-01', '2024-03-06'),
+                ('BBB', '2024-03-03', '2024-03-06'),
+            ])
+
+        download.assert_called_once()
+        self.assertEqual(download.call_args.args[0], ['AAA', 'BBB'])
+        self.assertEqual(download.call_args.kwargs['start'], '2024-03-01')
+        self.assertEqual(len(frames['AAA']), 5)
+        self.assertEqual(len(frames['BBB']), 3)
+        self.assertEqual(list(frames['BBB'].columns), ['Open', 'Close', 'Volume'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+# and of this directory, for the shared test helpers
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import sqlite3
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import pandas as pd
+
+from stocks.backfill import BackfillRunner, create_job, job_status, plan_chunks
+from stocks.stocks import Stocks
+from helpers import make_history
+
+def fetch_history(ticker, start, end):
+    return make_history(start, len(pd.date_range(start, end, inclusive='left')))
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class TestPlanChunks(unittest.TestCase):
+
+    def test_splits_range_with_exclusive_ends(self):
+        self.assertEqual(plan_chunks('2024-01-01', '2024-01-11', 4),
+                         [('2024-01-01', '2024-01-05'), ('2024-01-05', '2024-01-09'), ('2024-01-09', '2024-01-11')])
+        self.assertEqual(plan_chunks('2024-01-01', '2024-01-01'), [])
+        with self.assertRaises(ValueError):
+            plan_chunks('2024-01-01', '2024-02-01', 0)
+
+class TestBackfill(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.stocks = Stocks(self.connection)
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def runner(self, job_id, **kwargs):
+        kwargs.setdefault('jitter', 0)
+        return BackfillRunner(self.stocks, job_id, clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def test_backfill_stores_chunks_and_resumes_without_downloading_again(self):
+        with mock.patch.object(self.stocks, '_fetch_history', side_effect=fetch_history) as fetch:
+            status = self.stocks.backfill('2024-01-01', '2024-01-21', tickers=['AAA', 'BBB'], chunk_days=10)
+            self.assertEqual(fetch.call_count, 4)
+            self.assertEqual(status['status'], 'done')
+            self.assertEqual((status['chunks'], status['done'], status['rows']), (4, 4, 40))
+            self.assertEqual(len(self.stocks.get_ticker_data('BBB')), 20)
+
+            # Same job with one more ticker: only the new ticker's chunks are downloaded
+            status = self.stocks.backfill('2024-01-01', '2024-01-21', tickers=['AAA', 'BBB', 'CCC'], chunk_days=10)
+            self.assertEqual(fetch.call_count, 6)
+            self.assertEqual({call.args[0] for call in fetch.call_args_list[4:]}, {'CCC'})
+            self.assertEqual(status['done'], 6)
+
+    def test_resume_after_crash_skips_checkpointed_chunks(self):
+        job_id = create_job(self.connection, 'crash', ['AAA'], '2024-01-01', '2024-01-31', 10)
+        calls = []
+
+        def crash_on_second(ticker, start, end):
+            calls.append(start)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return fetch_history(ticker, start, end)
+
+        with mock.patch.object(self.stocks, '_fetch_history', side_effect=crash_on_second):
+            with self.assertRaises(KeyboardInterrupt):
+                self.runner(job_id).run()
+        self.assertEqual(job_status(self.connection, 'crash')['done'], 1)
+
+        with mock.patch.object(self.stocks, '_fetch_history', side_effect=fetch_history) as fetch:
+            self.runner(job_id).run()
+        self.assertEqual([call.args[1] for call in fetch.call_args_list], ['2024-01-11', '2024-01-21'])
+        self.assertEqual(job_status(self.connection, 'crash')['status'], 'done')
+        self.assertEqual(len(self.stocks.get_ticker_data('AAA')), 30)
+
+    def test_failed_chunks_back_off_exponentially_then_fail(self):
+        job_id = create_job(self.connection, 'flaky', ['AAA', 'BBB'], '2024-01-01', '2024-01-06', 10)
+
+        def fetch(ticker, start, end):
+            if ticker == 'BBB':
+                raise ConnectionError('429 Too Many Requests')
+            return fetch_history(ticker, start, end)
+
+        with mock.patch.object(self.stocks, '_fetch_history', side_effect=fetch):
+            self.runner(job_id, max_attempts=4, base_delay=1.0, max_delay=3.0).run()
+        self.assertEqual(self.clock.sleeps, [1.0, 2.0, 3.0])
+        status = job_status(self.connection, 'flaky')
+        self.assertEqual((status['status'], status['done'], status['failed']), ('failed', 1, 1))
+        self.assertEqual(status['errors'], [('BBB', '2024-01-01', '2024-01-06', '429 Too Many Requests')])
+
+        with mock.patch.object(self.stocks, '_fetch_history', side_effect=fetch_history) as retry:
+            self.runner(job_id).run()
+        self.assertEqual(retry.call_count, 0)
+        with mock.patch.object(self.stocks, '_fetch_history', side_effect=fetch_history) as retry:
+            self.runner(job_id).run(retry_failed=True)
+        self.assertEqual(retry.call_count, 1)
+        self.assertEqual(job_status(self.connection, 'flaky')['status'], 'done')
+
+    def test_empty_download_is_retried_like_an_error(self):
+        # 6-7 January 2024 is a weekend, so an empty frame is the right answer for that chunk
+        job_id = create_job(self.connection, 'empty', ['AAA'], '2024-01-01', '2024-01-08', 5)
+        attempts = []
+
+        def fetch(ticker, start, end):
+            attempts.append(start)
+            if len(attempts) == 1:
+                raise ConnectionError('Connection reset')
+            return pd.DataFrame()
+
+        # AAA was already trading before the job's dates, so its empty weekday chunk is an error
+        self.stocks.db_connection.execute("INSERT INTO tickers (ticker) VALUES ('AAA')")
+        self.stocks.db_connection.execute(
+            "INSERT INTO ticker_data VALUES ('AAA', '2023-12-29', 1, 1, 1, 1, 100, 0, 0)")
+        with mock.patch.object(self.stocks, '_fetch_history', side_effect=fetch):
+            self.runner(job_id, max_attempts=3, base_delay=1.0).run()
+        self.assertEqual(attempts.count('2024-01-01'), 3)
+        self.assertEqual(attempts.count('2024-01-06'), 1)
+        status = job_status(self.connection, 'empty')
+        self.assertEqual((status['status'], status['done'], status['failed'], status['rows']), ('failed', 1, 1, 0))
+        self.assertEqual(status['errors'],
+                         [('AAA', '2024-01-01', '2024-01-06', 'No data returned for AAA from 2024-01-01 to 2024-01-06')])
+
+    def test_chunks_before_a_listing_are_done_after_one_download(self):
+        def fetch(ticker, start, end):
+            if start < '2024-01-11':
+                return pd.DataFrame()
+            return fetch_history(ticker, start, end)
+
+        with mock.patch.object(self.stocks, '_fetch_history', side_effect=fetch) as ipo:
+            status = self.stocks.backfill('2024-01-01', '2024-01-21', tickers=['IPO'], chunk_days=10)
+            self.assertEqual(ipo.call_count, 2)
+            self.assertEqual((status['status'], status['done'], status['failed'], status['rows']), ('done', 2, 0, 10))
+
+            self.stocks.backfill('2024-01-01', '2024-01-21', tickers=['IPO'], chunk_days=10, retry_failed=True)
+            self.assertEqual(ipo.call_count, 2)
+
+    def test_open_ended_job_resumes_on_a_later_day(self):
+        def fetch(ticker, start, end):
+            if ticker == 'BBB':
+                raise ConnectionError('429 Too Many Requests')
+            return fetch_history(ticker, start, end)
+
+        with mock.patch('stocks.stocks.datetime') as clock:
+            clock.now.return_value = datetime(2024, 1, 21)
+            with mock.patch.object(self.stocks, '_fetch_history', side_effect=fetch):
+                status = self.stocks.backfill('2024-01-01', tickers=['AAA', 'BBB'], chunk_days=10, max_attempts=1)
+            self.assertEqual((status['job'], status['failed']), ('2024-01-01..', 2))
+
+            clock.now.return_value = datetime(2024, 1, 25)
+            with mock.patch.object(self.stocks, '_fetch_history', side_effect=fetch_history) as resumed:
+                status = self.stocks.backfill('2024-01-01', tickers=['AAA', 'BBB'], chunk_days=10, retry_failed=True)
+        self.assertEqual({call.args for call in resumed.call_args_list},
+                         {('BBB', '2024-01-01', '2024-01-11'), ('BBB', '2024-01-11', '2024-01-21')})
+        self.assertEqual((status['job'], status['status'], status['chunks']), ('2024-01-01..', 'done', 4))
+
+    def test_job_dates_cannot_change(self):
+        create_job(self.connection, 'job', ['AAA'], '2024-01-01', '2024-02-01')
+        with self.assertRaises(ValueError):
+            create_job(self.connection, 'job', ['AAA'], '2024-01-01', '2024-03-01')
+        self.assertIsNone(self.stocks.get_backfill_status('missing'))
+
+if __name__ == '__main__':
+    unittest.main()
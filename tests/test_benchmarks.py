@@ -0,0 +1,49 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import unittest
+
+from benchmarks import synthetic
+from benchmarks.run import Suite, latency_summary
+
+class TestSynthetic(unittest.TestCase):
+
+    def test_history_is_deterministic_and_on_sessions(self):
+        first = synthetic.make_history('SYN0000', '2024-01-01', '2024-02-01', seed=3)
+        second = synthetic.make_history('SYN0000', '2024-01-01', '2024-02-01', seed=3)
+        self.assertTrue(first.equals(second))
+        # 1 and 15 January are NYSE holidays
+        self.assertEqual(len(first), 21)
+        self.assertTrue((first['High'] >= first['Low']).all())
+
+    def test_news_items_parse(self):
+        from stocks.news import parse_news_item
+
+        items = synthetic.make_news('SYN0000', 3)
+        self.assertEqual(len({item['id'] for item in items}), 3)
+        self.assertEqual(parse_news_item('SYN0000', items[0])[0], 'SYN0000')
+
+class TestSuite(unittest.TestCase):
+
+    def test_small_run_reports_every_benchmark(self):
+        report = Suite(tickers=3, years=1, queries=5, news_per_ticker=4, max_workers=2).run()
+        names = [result['name'] for result in report['results']]
+        self.assertEqual(names[:3], ['insert_row', 'insert_bulk', 'refresh_data'])
+        self.assertIn('get_ticker_data[bars]', names)
+        by_name = {result['name']: result for result in report['results']}
+        self.assertEqual(by_name['refresh_data']['units'], by_name['insert_bulk']['units'])
+        self.assertEqual(by_name['refresh_news']['units'], 12)
+        for result in report['results']:
+            self.assertGreater(result['peak_memory_bytes'], 0)
+        self.assertIn('p99_ms', by_name['get_ticker_data[rows]']['latency'])
+
+    def test_latency_summary(self):
+        summary = latency_summary([0.001, 0.002, 0.003])
+        self.assertAlmostEqual(summary['p50_ms'], 2.0)
+        self.assertAlmostEqual(summary['max_ms'], 3.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import tempfile
+import unittest
+from unittest import mock
+
+from stocks.cache import MISSING, RangeCache, estimate_size
+from stocks.database import Database
+from stocks.stocks import Stocks
+
+class TestRangeCache(unittest.TestCase):
+
+    def test_lru_eviction_by_size(self):
+        rows = [('AAA', '2024-01-01', 1.0)]
+        size = estimate_size(rows)
+        cache = RangeCache(max_bytes=size * 2)
+        cache.put('a', 'AAA', rows)
+        cache.put('b', 'BBB', rows)
+        cache.get('a')
+        cache.put('c', 'CCC', rows)
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertIsNot(cache.get('a'), MISSING)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_oversized_results_are_not_cached(self):
+        cache = RangeCache(max_bytes=10)
+        cache.put('a', 'AAA', [('AAA', '2024-01-01', 1.0)])
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_results_older_than_an_invalidation_are_not_cached(self):
+        cache = RangeCache()
+        generation = cache.generation('AAA')
+        cache.invalidate('AAA')
+        cache.put('a', 'AAA', [('AAA', '2024-01-01', 1.0)], generation)
+        self.assertIs(cache.get('a'), MISSING)
+        cache.put('b', 'BBB', [('BBB', '2024-01-01', 1.0)], cache.generation('BBB'))
+        self.assertIsNot(cache.get('b'), MISSING)
+
+
+class TestStocksReadCache(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Database(':memory:')
+        self.cache = RangeCache()
+        self.stocks = Stocks(self.db.connection, cache=self.cache)
+        self.db.add_ticker('AAPL')
+        self.db.insert_ticker_data('AAPL', '2023-01-02', 150, 155, 148, 153, 1000000, 0, 0)
+        self.db.insert_ticker_data('MSFT', '2023-01-02', 250, 255, 248, 253, 2000000, 0, 0)
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_hits_and_misses(self):
+        first = self.stocks.get_ticker_data('AAPL', '2023-01-01', '2023-01-31')
+        second = self.stocks.get_ticker_data('AAPL', '2023-01-01', '2023-01-31')
+        self.assertEqual(first, second)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        # Mutating a returned result must not leak into the cache
+        second.clear()
+        self.assertEqual(len(self.stocks.get_ticker_data('AAPL', '2023-01-01', '2023-01-31')), 1)
+
+    def test_insert_invalidates_only_that_ticker(self):
+        self.stocks.get_ticker_data('AAPL')
+        self.stocks.get_ticker_data('MSFT')
+        self.db.insert_ticker_data('AAPL', '2023-01-03', 151, 156, 149, 154, 1000000, 0, 0)
+        self.assertEqual(len(self.stocks.get_ticker_data('AAPL')), 2)
+        self.stocks.get_ticker_data('MSFT')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+
+    def test_remove_ticker_invalidates(self):
+        self.assertEqual(len(self.stocks.get_ticker_data('AAPL')), 1)
+        self.stocks.remove_ticker('AAPL')
+        self.assertEqual(self.stocks.get_ticker_data('AAPL'), [])
+
+class TestPooledReadCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmpdir.name, 'cache.db'), pool_size=2)
+        self.cache = RangeCache()
+        self.stocks = Stocks(self.db.connection, cache=self.cache, pool=self.db.pool)
+        self.db.insert_ticker_data('AAPL', '2023-01-02', 150, 155, 148, 153, 1000000, 0, 0)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def test_write_between_query_and_put_is_not_cached_stale(self):
+        put = self.cache.put
+
+        def write_then_put(*args):
+            self.db.insert_ticker_data('AAPL', '2023-01-03', 151, 156, 149, 154, 1000000, 0, 0)
+            put(*args)
+
+        with mock.patch.object(self.cache, 'put', side_effect=write_then_put):
+            self.assertEqual(len(self.stocks.get_ticker_data('AAPL')), 1)
+        self.assertEqual(len(self.stocks.get_ticker_data('AAPL')), 2)
+
+    def test_uncommitted_write_is_not_cached_stale(self):
+        self.db.connection.execute(
+            "INSERT INTO ticker_data VALUES ('AAPL', '2023-01-03', 151, 156, 149, 154, 1000000, 0, 0)")
+        # Readers cannot see the open transaction, so their result must not outlive it
+        self.assertEqual(len(self.stocks.get_ticker_data('AAPL')), 1)
+        self.db.connection.commit()
+        self.assertEqual(len(self.stocks.get_ticker_data('AAPL')), 2)
+        self.assertEqual(len(self.stocks.get_ticker_data('AAPL')), 2)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
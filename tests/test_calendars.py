@@ -0,0 +1,65 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import unittest
+from datetime import date
+
+from stocks.calendars import NYSECalendar, TradingCalendar, calendar_for, easter_sunday, get_calendar, nth_weekday
+
+class TestCalendarRules(unittest.TestCase):
+
+    def test_easter(self):
+        self.assertEqual(easter_sunday(2024), date(2024, 3, 31))
+        self.assertEqual(easter_sunday(2025), date(2025, 4, 20))
+        self.assertEqual(easter_sunday(2038), date(2038, 4, 25))
+
+    def test_nth_weekday(self):
+        self.assertEqual(nth_weekday(2024, 11, 3, 4), date(2024, 11, 28))
+        self.assertEqual(nth_weekday(2024, 5, 0, -1), date(2024, 5, 27))
+        self.assertEqual(nth_weekday(2024, 12, 0, -1), date(2024, 12, 30))
+
+class TestNYSECalendar(unittest.TestCase):
+
+    def setUp(self):
+        self.calendar = get_calendar('nyse')
+
+    def test_session_counts_per_year(self):
+        for year, count in ((2019, 252), (2022, 251), (2023, 250), (2024, 252)):
+            sessions = self.calendar.sessions(f'{year}-01-01', f'{year}-12-31')
+            self.assertEqual(len(sessions), count, year)
+
+    def test_observed_holidays(self):
+        holidays = self.calendar.holidays(2022)
+        # New Year's Day 2022 fell on a Saturday and was not observed
+        self.assertNotIn(date(2021, 12, 31), self.calendar.holidays(2021))
+        self.assertIn(date(2022, 6, 20), holidays)
+        self.assertIn(date(2022, 12, 26), holidays)
+        self.assertFalse(self.calendar.is_session('2012-10-29'))
+        self.assertTrue(self.calendar.is_session('2024-04-01'))
+
+    def test_pluggable(self):
+        class NoFridays(TradingCalendar):
+            weekmask = '1111000'
+
+        calendar = NoFridays()
+        self.assertIs(get_calendar(calendar), calendar)
+        self.assertEqual(len(calendar.sessions('2024-01-01', '2024-01-07')), 4)
+        self.assertEqual(len(get_calendar('weekday').sessions('2024-01-01', '2024-01-07')), 5)
+        self.assertIsInstance(get_calendar(), NYSECalendar)
+        with self.assertRaises(ValueError):
+            get_calendar('lse')
+
+    def test_coverage(self):
+        for ticker in ('AAPL', 'BRK-B', '^GSPC', '^VIX'):
+            self.assertIs(calendar_for('nyse', ticker), self.calendar, ticker)
+        for ticker in ('^N225', '^FTSE', '000001.SS', 'FTSEMIB.MI', 'CL=F', 'EURUSD=X'):
+            self.assertIsNone(calendar_for('nyse', ticker), ticker)
+        self.assertIsNotNone(calendar_for('weekday', '^N225'))
+        self.assertIs(calendar_for({'^N225': 'nyse'}, '^N225'), self.calendar)
+        self.assertIsNone(calendar_for({'^N225': 'nyse'}, 'AAPL'))
+
+if __name__ == '__main__':
+    unittest.main()
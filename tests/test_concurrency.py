@@ -0,0 +1,32 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import time
+import unittest
+from stocks.concurrency import RateLimiter, HostRateLimiter
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_burst_then_throttle(self):
+        limiter = RateLimiter(rate=50, burst=2)
+        started = time.monotonic()
+        for _ in range(4):
+            limiter.acquire()
+        # Two tokens are free, the other two need 1/50s each
+        self.assertGreaterEqual(time.monotonic() - started, 0.03)
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=0)
+
+    def test_hosts_are_limited_independently(self):
+        limiter = HostRateLimiter(rate=1, per_host={'b.example': (2, 3)})
+        self.assertIsNot(limiter.limiter_for('a.example'), limiter.limiter_for('b.example'))
+        self.assertIs(limiter.limiter_for('a.example'), limiter.limiter_for('a.example'))
+        self.assertEqual(limiter.limiter_for('b.example').burst, 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,7 +7,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../s
 import unittest
 import sqlite3
 import sys
-from stocks.database import Database
+import tempfile
+import threading
+from stocks.database import Database, read_pragmas
 
 class TestDatabase(unittest.TestCase):
     def setUp(self):
@@ -22,7 +24,7 @@ class TestDatabase(unittest.TestCase):
     def test_create_tables(self):
         connection = sqlite3.connect('test_stocks.db')
         cursor = connection.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view');")
         tables = cursor.fetchall()
         table_names = [table[0] for table in tables]
         expected_tables = ['tickers', 'ticker_data', 'ticker_news']
@@ -52,5 +54,75 @@ class TestDatabase(unittest.TestCase):
         news = self.db.fetch_ticker_news('AAPL')
         self.assertEqual(len(news), 1)
 
+    def test_iter_ticker_data_batches(self):
+        self.db.add_ticker('AAPL')
+        for day in range(1, 8):
+            self.db.insert_ticker_data('AAPL', f'2023-01-0{day}', 150, 155, 148, 153, 1000000, 0, 0)
+        batches = list(self.db.iter_ticker_data('AAPL', arraysize=3, batches=True))
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 1])
+        self.assertEqual(batches[0][0][1], '2023-01-07')
+
+    def test_iter_ticker_news_all_tickers(self):
+        self.db.insert_ticker_news('AAPL', '2023-01-01', 'news_id_1', 'Apple releases new product', 'positive')
+        self.db.insert_ticker_news('MSFT', '2023-01-02', 'news_id_2', 'Microsoft earnings', 'neutral')
+        rows = list(self.db.iter_ticker_news(arraysize=1))
+        self.assertEqual([row[0] for row in rows], ['AAPL', 'MSFT'])
+        self.assertEqual(len(list(self.db.iter_ticker_news('MSFT'))), 1)
+
+
+class TestDatabaseProfiles(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'profile.db')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_performance_profile(self):
+        db = Database(self.path, profile='performance')
+        pragmas = read_pragmas(db.connection, ['journal_mode', 'synchronous', 'temp_store', 'busy_timeout'])
+        db.close()
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'temp_store': 2, 'busy_timeout': 5000})
+
+    def test_bulk_load_restores_settings(self):
+        db = Database(self.path, profile={'synchronous': 'FULL'})
+        with db.bulk_load():
+            self.assertEqual(read_pragmas(db.connection, ['synchronous'])['synchronous'], 0)
+            db.insert_ticker_data('AAPL', '2023-01-01', 150, 155, 148, 153, 1000000, 0, 0)
+        self.assertEqual(read_pragmas(db.connection, ['synchronous'])['synchronous'], 2)
+        db.close()
+
+    def test_bulk_load_holds_the_pooled_writer(self):
+        db = Database(self.path, pool_size=2)
+        written = threading.Event()
+
+        def write():
+            db.insert_ticker_data('MSFT', '2023-01-01', 250, 255, 248, 253, 1000000, 0, 0)
+            written.set()
+
+        with db.bulk_load():
+            writer = threading.Thread(target=write)
+            writer.start()
+            self.assertFalse(written.wait(0.2))
+        writer.join(5)
+        self.assertTrue(written.is_set())
+        db.close()
+
+    def test_optimize_collects_statistics(self):
+        db = Database(self.path)
+        db.insert_ticker_data('AAPL', '2023-01-01', 150, 155, 148, 153, 1000000, 0, 0)
+        db.optimize(analyze=True)
+        stats = {row[0] for row in db.connection.execute('SELECT idx FROM sqlite_stat1')}
+        self.assertIn('stocks_idx_ticker_bars_day', stats)
+        self.assertEqual(db.connection.execute('PRAGMA analysis_limit').fetchone()[0], 0)
+        db.optimize()
+        db.close()
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            Database(self.path, profile='turbo')
+        with self.assertRaises(ValueError):
+            Database(self.path, profile={'foreign_keys': 1})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,168 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from stocks import api
+from stocks.fetch_cache import FetchCache, FetchCacheMiss, from_environment
+
+def make_frame(days=5):
+    index = pd.date_range('2024-03-01', periods=days, freq='D', name='Date')
+    return pd.DataFrame({'Open': 1.0, 'Close': 2.0, 'Volume': 100}, index=index)
+
+class TestFetchCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'fetch.db')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_cache_mode_fetches_once(self):
+        cache = FetchCache(self.path)
+        fetch = mock.Mock(return_value=make_frame())
+        first = cache.fetch('history', 'AAA', '2024-03-01', '2024-03-06', fetch)
+        second = cache.fetch('history', 'AAA', '2024-03-01', '2024-03-06', fetch)
+        self.assertEqual(fetch.call_count, 1)
+        pd.testing.assert_frame_equal(first, second, check_freq=False)
+        self.assertEqual(cache.stats()['hits'], 1)
+        cache.close()
+
+    def test_ttl_expiry(self):
+        cache = FetchCache(self.path, ttl={'news': 10})
+        fetch = mock.Mock(return_value=[{'id': 'n1'}])
+        with mock.patch('stocks.fetch_cache.time.time', return_value=1000.0):
+            cache.fetch('news', 'AAA', None, None, fetch)
+        with mock.patch('stocks.fetch_cache.time.time', return_value=1005.0):
+            cache.fetch('news', 'AAA', None, None, fetch)
+        with mock.patch('stocks.fetch_cache.time.time', return_value=1011.0):
+            cache.fetch('news', 'AAA', None, None, fetch)
+        self.assertEqual(fetch.call_count, 2)
+        cache.close()
+
+    def test_record_then_replay_offline(self):
+        recorder = FetchCache(self.path, mode='record')
+        recorder.fetch('news', 'AAA', None, None, lambda: [{'id': 'n1'}])
+        recorder.fetch('news', 'AAA', None, None, lambda: [{'id': 'n2'}])
+        recorder.close()
+
+        replay = FetchCache(self.path, mode='replay', ttl=0)
+        offline = mock.Mock(side_effect=AssertionError('network used'))
+        self.assertEqual(replay.fetch('news', 'AAA', None, None, offline), [{'id': 'n2'}])
+        with self.assertRaises(FetchCacheMiss):
+            replay.fetch('news', 'BBB', None, None, offline)
+        replay.close()
+
+    def test_replay_trims_a_covering_recording(self):
+        recorder = FetchCache(self.path, mode='record')
+        recorder.fetch('history', 'AAA', '2024-03-01', '2024-03-06', lambda: make_frame())
+        recorder.close()
+
+        # Recorded on 2024-03-06; replayed on a later day with a window ending then
+        replay = FetchCache(self.path, mode='replay')
+        offline = mock.Mock(side_effect=AssertionError('network used'))
+        frame = replay.fetch('history', 'AAA', '2024-03-03', '2024-03-09', offline)
+        self.assertEqual([str(day.date()) for day in frame.index], ['2024-03-03', '2024-03-04', '2024-03-05'])
+        with self.assertRaises(FetchCacheMiss):
+            replay.fetch('history', 'AAA', '2024-02-28', '2024-03-09', offline)
+        replay.close()
+
+    def test_responses_are_stored_as_json(self):
+        import zlib
+
+        frame = make_frame().tz_localize('America/New_York')
+        frame.loc[frame.index[1], 'Open'] = float('nan')
+        cache = FetchCache(self.path)
+        cache.put('history', 'AAA', '2024-03-01', '2024-03-06', frame)
+        pd.testing.assert_frame_equal(cache.get('history', 'AAA', '2024-03-01', '2024-03-06'), frame, check_freq=False)
+        payload = cache._connection.execute('SELECT payload FROM responses').fetchone()[0]
+        self.assertTrue(zlib.decompress(payload).startswith(b'{"frame":'))
+        cache.close()
+
+    def test_empty_responses_are_only_kept_by_record(self):
+        fetch = mock.Mock(return_value=pd.DataFrame())
+        cache = FetchCache(self.path)
+        cache.fetch('history', 'AAA', '2024-03-01', '2024-03-06', fetch)
+        cache.fetch('history', 'AAA', '2024-03-01', '2024-03-06', fetch)
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(cache.stats()['entries'], 0)
+        cache.close()
+
+        recorder = FetchCache(self.path, mode='record')
+        recorder.fetch('news', 'AAA', None, None, lambda: [])
+        self.assertEqual(recorder.stats()['entries'], 1)
+        recorder.close()
+
+    def test_size_eviction_is_least_recently_used(self):
+        cache = FetchCache(self.path)
+        cache.put('history', 'AAA', '', '', 'x' * 100)
+        size = cache.stats()['bytes']
+        cache.max_bytes = size * 2
+        with mock.patch('stocks.fetch_cache.time.time', side_effect=[1.0, 2.0, 3.0, 4.0]):
+            cache.put('history', 'AAA', '', '', 'a' * 100)
+            cache.put('history', 'BBB', '', '', 'b' * 100)
+            cache.get('history', 'AAA', '', '', ignore_ttl=True)
+            cache.put('history', 'CCC', '', '', 'c' * 100)
+        stats = cache.stats()
+        self.assertEqual((stats['entries'], stats['evictions']), (2, 1))
+        self.assertIsNone(cache.get('history', 'BBB', '', '', ignore_ttl=True))
+        cache.close()
+
+    def test_from_environment(self):
+        with mock.patch.dict(os.environ, {'STOCKS_FETCH_CACHE': self.path, 'STOCKS_FETCH_MODE': 'replay'}):
+            cache = from_environment()
+        self.assertEqual(cache.mode, 'replay')
+        cache.close()
+        with mock.patch.dict(os.environ, {'STOCKS_FETCH_CACHE': ''}):
+            self.assertIsNone(from_environment())
+
+class TestApiThroughCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = FetchCache(os.path.join(self.tmpdir.name, 'fetch.db'))
+        api.set_fetch_cache(self.cache)
+
+    def tearDown(self):
+        api.set_fetch_cache(None)
+        self.cache.close()
+        self.tmpdir.cleanup()
+
+    def test_get_stock_data_is_cached(self):
+        with mock.patch('yfinance.Ticker') as ticker:
+            ticker.return_value.history.return_value = make_frame()
+            api.get_stock_data('AAA', '2024-03-01', '2024-03-06')
+            frame = api.get_stock_data('AAA', '2024-03-01', '2024-03-06')
+        self.assertEqual(ticker.return_value.history.call_count, 1)
+        self.assertEqual(len(frame), 5)
+
+    def test_group_download_only_fetches_misses(self):
+        self.cache.put('history', 'AAA', '2024-03-01', '2024-03-06', make_frame())
+        columns = pd.MultiIndex.from_product([['BBB'], ['Open', 'Close', 'Volume']])
+        data = pd.DataFrame(1.0, index=make_frame().index, columns=columns)
+        with mock.patch('yfinance.download', return_value=data) as download:
+            frames = api.get_stock_data_group([('AAA', '2024-03-01', '2024-03-06'),
+                                               ('BBB', '2024-03-01', '2024-03-06')])
+        self.assertEqual(download.call_args.args[0], ['BBB'])
+        self.assertEqual(sorted(frames), ['AAA', 'BBB'])
+        self.assertIsNotNone(self.cache.get('history', 'BBB', '2024-03-01', '2024-03-06'))
+
+    def test_failed_downloads_are_not_cached(self):
+        with mock.patch('yfinance.Ticker') as ticker:
+            ticker.return_value.history.return_value = pd.DataFrame()
+            api.get_stock_data('AAA', '2024-03-01', '2024-03-06')
+        with mock.patch('yfinance.download', return_value=pd.DataFrame()):
+            frames = api.get_stock_data_group([('BBB', '2024-03-01', '2024-03-06')])
+        self.assertTrue(frames['BBB'].empty)
+        self.assertEqual(self.cache.stats()['entries'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
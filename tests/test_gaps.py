@@ -0,0 +1,35 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import unittest
+
+import numpy as np
+
+from stocks.gaps import find_gaps, gap_windows, merge_gaps
+
+SESSIONS = np.array(['2024-01-02', '2024-01-03', '2024-01-04', '2024-01-05', '2024-01-08',
+                     '2024-01-09', '2024-01-10', '2024-01-11'], dtype='datetime64[D]')
+
+class TestGaps(unittest.TestCase):
+
+    def test_find_gaps(self):
+        stored = SESSIONS[[0, 3, 4, 7]]
+        self.assertEqual(find_gaps(SESSIONS, stored), [(1, 2), (5, 6)])
+        self.assertEqual(find_gaps(SESSIONS, SESSIONS), [])
+        self.assertEqual(find_gaps(SESSIONS, SESSIONS[:0]), [(0, 7)])
+
+    def test_merge_gaps(self):
+        gaps = [(1, 2), (5, 6), (20, 20)]
+        self.assertEqual(merge_gaps(gaps, merge_within=2), [(1, 6), (20, 20)])
+        self.assertEqual(merge_gaps(gaps, merge_within=1), gaps)
+
+    def test_windows_span_weekends_with_exclusive_end(self):
+        stored = SESSIONS[[0, 1, 2, 6, 7]]
+        # Friday and Monday are missing: one window across the weekend
+        self.assertEqual(gap_windows(SESSIONS, stored), [('2024-01-05', '2024-01-10')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '../src'))
+sys.path.insert(0, SRC)
+
+import json
+import subprocess
+import unittest
+
+# Modules only the fetch and sentiment paths may load
+HEAVY_MODULES = ('yfinance', 'pandas', 'numpy', 'textblob', 'asyncio', 'multiprocessing')
+
+# Budget for importing the package and opening a database, in milliseconds of import time as
+# reported by -X importtime. Override with STOCKS_IMPORT_BUDGET_MS on slow machines.
+IMPORT_BUDGET_MS = float(os.environ.get('STOCKS_IMPORT_BUDGET_MS', 150))
+
+PROBE = '''
+import json, sys
+from stocks import Database, Stocks
+db = Database(':memory:')
+stocks = Stocks(db.connection)
+stocks.get_all_tickers()
+stocks.get_ticker_data('AAPL')
+print(json.dumps(sorted(m for m in {heavy!r} if m in sys.modules)))
+'''
+
+def run_probe():
+    """Run the read-only startup path in a fresh interpreter and collect import timings"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE.format(heavy=HEAVY_MODULES)],
+        cwd=SRC, capture_output=True, text=True, check=True,
+    )
+    package_us = 0
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nesting shown by indentation.
+        # Top-level stocks entries include everything they pulled in, stdlib modules too.
+        parts = line.split('|')
+        if len(parts) != 3 or parts[2].startswith('  '):
+            continue
+        name = parts[2].strip()
+        if name == 'stocks' or name.startswith('stocks.'):
+            package_us += int(parts[1])
+    return json.loads(result.stdout.strip().splitlines()[-1]), package_us
+
+class TestImportCost(unittest.TestCase):
+
+    def test_read_only_startup_skips_heavy_dependencies(self):
+        loaded, _ = run_probe()
+        self.assertEqual(loaded, [])
+
+    def test_read_only_startup_import_budget(self):
+        _, package_us = run_probe()
+        self.assertLess(package_us / 1000, IMPORT_BUDGET_MS,
+                        f"stocks modules took {package_us / 1000:.1f} ms to import")
+
+if __name__ == '__main__':
+    unittest.main()
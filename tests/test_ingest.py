@@ -0,0 +1,57 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import unittest
+
+import pandas as pd
+
+from stocks.database import Database
+from stocks.ingest import INSERT_TICKER_BARS_SQL, history_to_bars
+
+class TestHistoryToBars(unittest.TestCase):
+
+    def setUp(self):
+        index = pd.date_range('2024-01-01', periods=3, freq='D', tz='America/New_York', name='Date')
+        self.df = pd.DataFrame({
+            'Open': [1.0, 2.0, 3.0],
+            'High': [1.5, 2.5, 3.5],
+            'Low': [0.5, 1.5, 2.5],
+            'Close': [1.2, 2.2, 3.2],
+            'Volume': [100, 200, 300],
+        }, index=index)
+
+    def test_bars_match_ticker_bars_layout(self):
+        rows = list(history_to_bars(7, self.df))
+        # Values are plain Python scalars so sqlite3 can bind them
+        self.assertIs(type(rows[0][1]), int)
+        self.assertIs(type(rows[0][6]), int)
+
+    def test_present_action_columns_are_used(self):
+        self.df['Dividends'] = [0.0, 0.25, 0.0]
+        self.df['Stock Splits'] = [0.0, 0.0, 2.0]
+        rows = list(history_to_bars(7, self.df))
+        self.assertEqual([row[7] for row in rows], [0.0, 0.25, 0.0])
+        self.assertEqual([row[8] for row in rows], [0.0, 0.0, 2.0])
+
+    def test_missing_price_column(self):
+        with self.assertRaises(KeyError):
+            list(history_to_bars(7, self.df.drop(columns=['Close'])))
+
+    def test_bars_use_local_epoch_days(self):
+        rows = list(history_to_bars(7, self.df))
+        self.assertEqual(rows[0], (7, 19723, 1.0, 1.5, 0.5, 1.2, 100, 0, 0))
+        self.assertEqual(rows[-1][1], 19725)
+
+    def test_executemany_from_bars(self):
+        db = Database(':memory:')
+        db.add_ticker('AAPL')
+        ticker_id = db.connection.execute("SELECT id FROM tickers WHERE ticker = 'AAPL'").fetchone()[0]
+        db.connection.executemany(INSERT_TICKER_BARS_SQL, history_to_bars(ticker_id, self.df))
+        self.assertEqual(db.fetch_ticker_data('AAPL')[-1][:2], ('AAPL', '2024-01-01'))
+        db.close()
+
+if __name__ == '__main__':
+    unittest.main()
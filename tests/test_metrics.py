@@ -0,0 +1,101 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+# and of this directory, for the shared test helpers
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import logging
+import sqlite3
+import unittest
+from unittest import mock
+
+from stocks import metrics
+from stocks.stocks import Stocks
+from helpers import make_history
+
+class TestSinks(unittest.TestCase):
+
+    def tearDown(self):
+        metrics.set_sink(None)
+
+    def test_null_sink_is_default_and_skips_timing(self):
+        self.assertFalse(metrics.enabled())
+        self.assertIs(metrics.timer('sql.seconds', op='x'), metrics.timer('other'))
+        metrics.increment('rows.inserted', 5)
+
+    def test_in_memory_sink_collects_tagged_metrics(self):
+        sink = metrics.InMemorySink()
+        metrics.set_sink(sink)
+        metrics.increment('rows.inserted', 3, table='ticker_data')
+        metrics.increment('rows.inserted', 2, table='ticker_news')
+        for value in (1.0, 2.0, 3.0):
+            metrics.observe('fetch.seconds', value, endpoint='history')
+        with metrics.timer('sql.seconds', op='store'):
+            pass
+        metrics.emit('refresh.stored', "Refreshed {rows} rows", rows=3)
+
+        self.assertEqual(sink.counter('rows.inserted'), 5)
+        self.assertEqual(sink.counter('rows.inserted', table='ticker_news'), 2)
+        self.assertEqual(len(sink.values('sql.seconds', op='store')), 1)
+        self.assertEqual(sink.events, [('refresh.stored', {'rows': 3})])
+        summary = sink.summary()
+        self.assertEqual(summary['fetch.seconds']['count'], 3)
+        self.assertEqual(summary['fetch.seconds']['p50'], 2.0)
+        self.assertEqual(summary['rows.inserted'], {'total': 5})
+
+    def test_emit_logs_structured_record(self):
+        with self.assertLogs('stocks.events', level='INFO') as captured:
+            metrics.emit('ticker.exists', "Ticker {ticker} already exists in database", ticker='AAA')
+        record = captured.records[0]
+        self.assertEqual(record.getMessage(), "Ticker AAA already exists in database")
+        self.assertEqual((record.event, record.fields), ('ticker.exists', {'ticker': 'AAA'}))
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.stocks = Stocks(self.connection)
+        self.sink = metrics.InMemorySink()
+        metrics.set_sink(self.sink)
+
+    def tearDown(self):
+        metrics.set_sink(None)
+        self.connection.close()
+
+    def test_refresh_records_fetch_store_and_errors(self):
+        self.stocks.add_tickers(['AAA', 'BBB'], '2024-01-01', '2024-01-06', max_workers=1, batch_size=None)
+        self.sink.reset()
+
+        def fetch(ticker, start, end):
+            if ticker == 'BBB':
+                raise ConnectionError('rate limited')
+            return make_history('2024-01-01', 5)
+
+        with mock.patch('stocks.api.get_stock_data', side_effect=fetch), \
+                self.assertLogs('stocks.events', level='INFO') as captured:
+            self.stocks.refresh_data('2024-01-01', '2024-01-06', max_workers=2)
+
+        self.assertEqual(self.sink.counter('rows.fetched'), 5)
+        self.assertEqual(self.sink.counter('rows.inserted', table='ticker_data'), 5)
+        self.assertEqual(self.sink.counter('fetch.errors', endpoint='history'), 1)
+        self.assertEqual(self.sink.counter('refresh.errors', stage='fetch'), 1)
+        self.assertEqual(len(self.sink.values('fetch.seconds', endpoint='history')), 2)
+        self.assertEqual(len(self.sink.values('refresh.seconds', ticker='AAA')), 1)
+        self.assertEqual(len(self.sink.values('sql.seconds', op='store_history')), 1)
+        names = [name for name, _ in self.sink.events]
+        self.assertEqual(names[0], 'refresh.start')
+        self.assertIn('refresh.fetch_error', names)
+        errors = [r for r in captured.records if r.event == 'refresh.fetch_error']
+        self.assertEqual(errors[0].levelno, logging.ERROR)
+
+    def test_get_ticker_data_observes_rows_without_info_logs(self):
+        with mock.patch('stocks.api.get_stock_data', return_value=make_history('2024-01-01', 3)):
+            self.stocks.add_ticker('AAA', '2024-01-01', '2024-01-04')
+        with self.assertNoLogs('stocks.stocks', level='INFO'):
+            self.stocks.get_ticker_data('AAA', output='bars')
+        self.assertEqual(self.sink.values('query.rows', output='bars'), [3])
+
+if __name__ == '__main__':
+    unittest.main()
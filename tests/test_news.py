@@ -0,0 +1,77 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import sqlite3
+import unittest
+from unittest import mock
+
+from stocks.news import dedup_news, parse_news_item, score_sentiments, score_texts
+from stocks.stocks import Stocks
+
+def make_item(news_id, summary, pub_date='2024-01-02T10:00:00Z'):
+    return {'id': news_id, 'content': {'pubDate': pub_date, 'summary': summary}}
+
+class TestNewsPipeline(unittest.TestCase):
+
+    def test_parse_news_item(self):
+        row = parse_news_item('AAPL', make_item('n1', 'Apple shares rose'))
+        self.assertEqual(row, ('AAPL', '2024-01-02', 'n1', 'Apple shares rose'))
+        title_only = {'title': 'T', 'content': {'title': 'Only a title'}}
+        self.assertEqual(parse_news_item('AAPL', title_only)[3], 'Only a title')
+
+    def test_dedup_keeps_first(self):
+        rows = [('AAPL', '2024-01-02', 'n1', 'a'), ('AAPL', '2024-01-02', 'n1', 'b'),
+                ('MSFT', '2024-01-02', 'n1', 'c')]
+        self.assertEqual([row[3] for row in dedup_news(rows)], ['a', 'c'])
+
+    def test_process_pool_scoring_keeps_order(self):
+        texts = ['great excellent gains', None, 'terrible awful losses', '', 'great excellent gains']
+        expected = score_texts(texts)
+        self.assertEqual(score_sentiments(texts, workers=2, batch_size=2), expected)
+        self.assertEqual(expected[1], 'neutral')
+
+    def test_refresh_news_reports_stage_timings(self):
+        connection = sqlite3.connect(':memory:')
+        stocks = Stocks(connection)
+        connection.executemany('INSERT INTO tickers (ticker) VALUES (?)', [('AAPL',), ('MSFT',), ('^VIX',)])
+        news = {
+            'AAPL': [make_item('n1', 'Apple up'), make_item('n1', 'Apple up'), make_item('n2', 'Apple down')],
+            'MSFT': [make_item('n3', 'Microsoft flat')],
+        }
+
+        with mock.patch.object(stocks, '_fetch_news', side_effect=lambda ticker: news[ticker]):
+            summary = stocks.refresh_news(max_workers=2, sentiment_workers=0, batch_size=2)
+
+        self.assertEqual(summary['tickers'], 2)
+        self.assertEqual(summary['items'], 3)
+        self.assertEqual(set(summary['timings']), {'fetch', 'parse', 'dedup', 'score', 'store'})
+        self.assertEqual(len(stocks.get_ticker_news('AAPL')), 2)
+        connection.close()
+
+    def test_stored_articles_are_not_rescored(self):
+        connection = sqlite3.connect(':memory:')
+        stocks = Stocks(connection)
+        connection.execute("INSERT INTO tickers (ticker) VALUES ('AAPL')")
+        first = [make_item('n1', 'Apple up'), make_item('n2', 'Apple down')]
+        second = first + [make_item('n3', 'Apple flat', '2024-01-03T10:00:00Z')]
+
+        with mock.patch.object(stocks, '_fetch_news', return_value=first):
+            stocks.refresh_news(sentiment_workers=0)
+        with mock.patch.object(stocks, '_fetch_news', return_value=second), \
+                mock.patch('stocks.stocks.score_sentiments', side_effect=score_sentiments) as scorer:
+            summary = stocks.refresh_news(sentiment_workers=0)
+
+        self.assertEqual(scorer.call_args.args[0], ['Apple flat'])
+        self.assertEqual((summary['items'], summary['skipped']), (1, 2))
+        self.assertEqual(len(stocks.get_ticker_news('AAPL')), 3)
+
+        with mock.patch.object(stocks, '_fetch_news', return_value=second):
+            summary = stocks.refresh_news(sentiment_workers=0, rescore=True)
+        self.assertEqual((summary['items'], summary['skipped']), (3, 0))
+        connection.close()
+
+if __name__ == '__main__':
+    unittest.main()
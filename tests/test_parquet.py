@@ -0,0 +1,105 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import importlib.util
+import sqlite3
+import tempfile
+import unittest
+
+from stocks import parquet
+from stocks.database import Database
+from stocks.stocks import Stocks
+
+HAVE_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+def insert_bars(connection, ticker, dates):
+    with connection:
+        connection.executemany('INSERT OR REPLACE INTO ticker_data VALUES (?, ?, 1, 2, 0.5, 1.5, 100, 0, 0)',
+                               [(ticker, date) for date in dates])
+
+class TestChangeTracking(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        Stocks(self.connection)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_boundary_separates_committed_and_later_writes(self):
+        insert_bars(self.connection, 'AAA', ['2024-01-02', '2024-01-03'])
+        boundary = parquet.change_boundary(self.connection, 'ticker_data')
+        insert_bars(self.connection, 'AAA', ['2024-01-03', '2024-01-04'])
+        before = self.connection.execute('SELECT day FROM ticker_bars WHERE changed < ?', (boundary,)).fetchall()
+        # The rewritten 2024-01-03 bar counts as changed again
+        self.assertEqual(len(before), 1)
+        self.assertFalse(self.connection.in_transaction)
+
+    def test_news_boundary_follows_rowids(self):
+        self.assertEqual(parquet.change_boundary(self.connection, 'ticker_news'), 1)
+        self.connection.execute("INSERT INTO ticker_news VALUES ('AAA', '2024-01-02', 'n1', 'text', 'neutral')")
+        boundary = parquet.change_boundary(self.connection, 'ticker_news')
+        self.connection.execute("INSERT OR REPLACE INTO ticker_news VALUES ('AAA', '2024-01-02', 'n1', 'new', 'positive')")
+        rowid = self.connection.execute('SELECT rowid FROM ticker_news').fetchone()[0]
+        self.assertGreaterEqual(rowid, boundary)
+
+    def test_rejects_unknown_partition_keys(self):
+        with self.assertRaises(ValueError):
+            parquet._partition_keys(['month'])
+        self.assertEqual(parquet._partition_keys(['year', 'ticker']), ('ticker', 'year'))
+
+    @unittest.skipIf(HAVE_PYARROW, 'pyarrow is installed')
+    def test_missing_pyarrow_raises_import_error(self):
+        with self.assertRaises(ImportError):
+            Stocks(self.connection).export_parquet(tempfile.gettempdir())
+
+@unittest.skipUnless(HAVE_PYARROW, 'pyarrow is not installed')
+class TestParquetRoundTrip(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmp.name, 'source.db'))
+        insert_bars(self.db.connection, 'AAA', ['2023-12-29', '2024-01-02', '2024-01-03'])
+        insert_bars(self.db.connection, 'BBB', ['2024-01-02'])
+        self.db.insert_ticker_news('AAA', '2024-01-02', 'n1', 'Shares rally', 'positive')
+        self.export = os.path.join(self.tmp.name, 'export')
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_partitioned_export_and_import(self):
+        result = self.db.export_parquet(self.export, partition_by=['ticker', 'year'], batch_size=2)
+        self.assertEqual(result['ticker_data']['rows'], 4)
+        self.assertEqual(len(result['ticker_data']['files']), 3)
+        self.assertTrue(os.path.isdir(os.path.join(self.export, 'ticker_data', 'ticker=AAA', 'year=2023')))
+
+        target = Database(os.path.join(self.tmp.name, 'target.db'))
+        try:
+            self.assertEqual(target.import_parquet(self.export), {'ticker_data': 4, 'ticker_news': 1})
+            self.assertEqual(target.fetch_ticker_data('AAA'), self.db.fetch_ticker_data('AAA'))
+            self.assertEqual(target.fetch_ticker_news('AAA'), self.db.fetch_ticker_news('AAA'))
+        finally:
+            target.close()
+
+    def test_incremental_export_only_writes_changed_rows(self):
+        self.db.export_parquet(self.export, tables=['ticker_data'])
+        insert_bars(self.db.connection, 'BBB', ['2024-01-02', '2024-01-03'])
+        result = self.db.export_parquet(self.export, tables=['ticker_data'], incremental=True)
+        self.assertEqual(result['ticker_data']['rows'], 2)
+        self.assertEqual(self.db.export_parquet(self.export, tables=['ticker_data'], incremental=True)
+                         ['ticker_data']['rows'], 0)
+        with self.assertRaises(FileExistsError):
+            self.db.export_parquet(self.export, tables=['ticker_data'])
+
+    def test_record_batches_follow_partitions(self):
+        batches = list(parquet.iter_record_batches(self.db.connection, 'ticker_data', 'ticker', batch_size=2))
+        self.assertEqual([(partition['ticker'], batch.num_rows) for partition, batch in batches],
+                         [('AAA', 2), ('AAA', 1), ('BBB', 1)])
+        self.assertNotIn('ticker', batches[0][1].schema.names)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import sqlite3
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from stocks.database import Database
+from stocks.pool import ConnectionPool
+from stocks.stocks import Stocks
+
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = Database(os.path.join(self.tmpdir.name, 'pool.db'), profile='performance', pool_size=2)
+        self.stocks = Stocks(self.db.connection, pool=self.db.pool)
+        self.db.add_ticker('AAPL')
+        self.db.insert_ticker_data('AAPL', '2023-01-02', 150, 155, 148, 153, 1000000, 0, 0)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def test_concurrent_reads_and_writes(self):
+        def read(i):
+            return len(self.stocks.get_ticker_data('AAPL'))
+
+        def write(i):
+            self.db.insert_ticker_data('MSFT', f'2023-02-{i + 1:02d}', 250, 255, 248, 253, 1000, 0, 0)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            reads = list(executor.map(read, range(40)))
+            list(executor.map(write, range(20)))
+
+        self.assertEqual(set(reads), {1})
+        self.assertEqual(len(self.stocks.get_ticker_data('MSFT')), 20)
+        self.assertLessEqual(self.db.pool._created, 2)
+
+    def test_readers_are_read_only(self):
+        with self.db.pool.reader() as connection:
+            with self.assertRaises(sqlite3.OperationalError):
+                connection.execute("INSERT INTO tickers (ticker) VALUES ('TSLA')")
+
+    def test_nested_borrow_reuses_connection(self):
+        with self.db.pool.reader() as outer:
+            with self.db.pool.reader() as inner:
+                self.assertIs(outer, inner)
+
+    def test_streaming_holds_reader_until_closed(self):
+        rows = self.stocks.iter_ticker_data('AAPL')
+        self.assertEqual(next(rows)[0], 'AAPL')
+        self.assertEqual(self.db.pool._idle.qsize(), 0)
+        rows.close()
+        self.assertEqual(self.db.pool._idle.qsize(), 1)
+
+    def test_in_memory_pool_shares_writer(self):
+        pool = ConnectionPool(':memory:')
+        with pool.writer() as writer, pool.reader() as reader:
+            self.assertIs(writer, reader)
+        pool.close()
+
+if __name__ == '__main__':
+    unittest.main()
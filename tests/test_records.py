@@ -0,0 +1,86 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import math
+import sqlite3
+import unittest
+
+from stocks.database import Database
+from stocks.records import Bar, BarSeries
+from stocks.schema import to_epoch_day
+
+ROWS = [
+    ('AAA', '2024-01-03', 10.0, 11.0, 9.0, 10.5, 1000, 0, 0),
+    ('AAA', '2024-01-02', 9.0, 10.0, 8.0, 9.5, 2000, 0.25, 0),
+    ('AAA', '2024-01-01', 8.0, 9.0, None, 8.5, None, 0, 2.0),
+]
+
+class TestBar(unittest.TestCase):
+
+    def test_named_fields_and_tuple_behaviour(self):
+        bar = Bar(*ROWS[0])
+        self.assertEqual(bar.close, 10.5)
+        self.assertEqual(bar[1], '2024-01-03')
+        self.assertEqual(bar, ROWS[0])
+        ticker, date, *_ = bar
+        self.assertEqual((ticker, date), ('AAA', '2024-01-03'))
+        self.assertFalse(hasattr(bar, '__dict__'))
+
+class TestBarSeries(unittest.TestCase):
+
+    def test_from_rows_typed_columns(self):
+        series = BarSeries.from_rows(ROWS)
+        self.assertEqual(len(series), 3)
+        self.assertEqual(series.close.typecode, 'd')
+        self.assertEqual(series.volume.typecode, 'q')
+        self.assertEqual(list(series.volume), [1000, 2000, 0])
+        self.assertTrue(math.isnan(series.low[2]))
+        self.assertIs(series.ticker[0], series.ticker[2])
+
+    def test_dates_stored_as_epoch_days(self):
+        series = BarSeries.from_rows(ROWS)
+        self.assertEqual(series.day.typecode, 'i')
+        self.assertEqual(list(series.day), [19725, 19724, 19723])
+        self.assertEqual(series.date, ['2024-01-03', '2024-01-02', '2024-01-01'])
+        self.assertEqual(series[0].date, '2024-01-03')
+        self.assertEqual(series.to_numpy('day').tolist(), [19725, 19724, 19723])
+        self.assertEqual(repr(series), 'BarSeries(3 bars, 2024-01-03..2024-01-01)')
+
+    def test_indexing_slicing_and_iteration(self):
+        series = BarSeries.from_rows(ROWS)
+        self.assertEqual(series[-1].stocksplits, 2.0)
+        head = series[:2]
+        self.assertIsInstance(head, BarSeries)
+        self.assertEqual([bar.date for bar in head], ['2024-01-03', '2024-01-02'])
+        self.assertEqual(list(series)[1], ROWS[1])
+        self.assertEqual(series.to_numpy('close').tolist(), [10.5, 9.5, 8.5])
+
+    def test_from_cursor_in_batches(self):
+        connection = sqlite3.connect(':memory:')
+        connection.execute('CREATE TABLE t (ticker, date, open, high, low, close, volume, dividends, stocksplits)')
+        connection.executemany('INSERT INTO t VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               [row[:1] + (to_epoch_day(row[1]),) + row[2:] for row in ROWS])
+        series = BarSeries.from_cursor(connection.execute('SELECT * FROM t'), arraysize=2)
+        self.assertEqual(series.day.tolist(), [19725, 19724, 19723])
+        self.assertEqual([bar.date for bar in series], [row[1] for row in ROWS])
+        connection.close()
+
+    def test_smaller_than_tuples(self):
+        rows = [('AAA', f'2024-01-{i % 28 + 1:02d}', 1.5 + i, 2.5 + i, 0.5 + i, 1.0 + i, 100 + i, 0.0, 0.0)
+                for i in range(1000)]
+        tuple_bytes = sum(sys.getsizeof(row) + sum(sys.getsizeof(item) for item in row) for row in rows)
+        self.assertLess(BarSeries.from_rows(rows).nbytes, tuple_bytes / 2)
+
+    def test_database_fetch_bars(self):
+        db = Database(':memory:')
+        db.add_ticker('AAA')
+        db.insert_ticker_data('AAA', '2024-01-01', 1.0, 2.0, 0.5, 1.5, 100, 0, 0)
+        bars = db.fetch_ticker_data('AAA', bars=True)
+        self.assertEqual(bars[0].volume, 100)
+        db.close()
+
+if __name__ == '__main__':
+    unittest.main()
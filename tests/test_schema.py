@@ -0,0 +1,190 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import sqlite3
+import tempfile
+import unittest
+
+from stocks.database import Database
+from stocks.schema import INDEXES, SCHEMA_VERSION, from_epoch_day, migrate, schema_version, sync_indexes, to_epoch_day
+from stocks.stocks import Stocks
+
+LEGACY_SCHEMA = '''
+    CREATE TABLE tickers (ticker TEXT PRIMARY KEY);
+    CREATE TABLE ticker_data (
+        ticker TEXT, date DATE, open NUMERIC, high NUMERIC, low NUMERIC, close NUMERIC,
+        volume NUMERIC, dividends NUMERIC, stocksplits NUMERIC, PRIMARY KEY (ticker, date)
+    );
+    CREATE TABLE ticker_news (
+        ticker TEXT, date DATE, news_id TEXT, news_summary TEXT, sentiment TEXT,
+        PRIMARY KEY (ticker, date, news_id)
+    );
+    INSERT INTO tickers VALUES ('AAA'), ('BBB');
+    INSERT INTO ticker_data VALUES ('AAA', '2024-01-02', 10, 11, 9, 10.5, 1000.0, 0, 0);
+    INSERT INTO ticker_data VALUES ('AAA', '2024-01-01', 9, 10, 8, 9.5, 2000, 0.25, 0);
+    INSERT INTO ticker_data VALUES ('ORPHAN', '2024-01-01', 1, 1, 1, 1, 1, 0, 0);
+    INSERT INTO ticker_news VALUES ('AAA', '2024-01-01', 'n1', 'summary', 'neutral');
+'''
+
+class TestEpochDays(unittest.TestCase):
+
+    def test_round_trip(self):
+        self.assertEqual(to_epoch_day('1970-01-01'), 0)
+        self.assertEqual(to_epoch_day('2024-01-01'), 19723)
+        self.assertEqual(to_epoch_day('2024-01-01 09:30:00'), 19723)
+        self.assertEqual(from_epoch_day(19723), '2024-01-01')
+        self.assertEqual(from_epoch_day(-1), '1969-12-31')
+
+class TestMigrations(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'stocks.db')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_new_database_is_current(self):
+        db = Database(self.path)
+        self.assertEqual(schema_version(db.connection), SCHEMA_VERSION)
+        sql = db.connection.execute("SELECT sql FROM sqlite_master WHERE name = 'ticker_bars'").fetchone()[0]
+        self.assertIn('WITHOUT ROWID', sql)
+        db.close()
+
+    def test_legacy_database_is_migrated(self):
+        connection = sqlite3.connect(self.path)
+        connection.executescript(LEGACY_SCHEMA)
+        connection.close()
+
+        db = Database(self.path)
+        self.assertEqual(schema_version(db.connection), SCHEMA_VERSION)
+        self.assertEqual(db.fetch_ticker_data('AAA'), [
+            ('AAA', '2024-01-02', 10.0, 11.0, 9.0, 10.5, 1000, 0.0, 0.0),
+            ('AAA', '2024-01-01', 9.0, 10.0, 8.0, 9.5, 2000, 0.25, 0.0),
+        ])
+        self.assertEqual(sorted(db.fetch_tickers()), ['AAA', 'BBB', 'ORPHAN'])
+        self.assertEqual(len(db.fetch_ticker_news('AAA')), 1)
+        types = db.connection.execute('SELECT typeof(day), typeof(volume), typeof(open) FROM ticker_bars').fetchall()
+        self.assertEqual(set(types), {('integer', 'integer', 'real')})
+        db.close()
+
+    def test_migrate_is_idempotent(self):
+        connection = sqlite3.connect(self.path)
+        self.assertEqual(migrate(connection), SCHEMA_VERSION)
+        statements = []
+        connection.set_trace_callback(statements.append)
+        self.assertEqual(migrate(connection), SCHEMA_VERSION)
+        self.assertEqual(statements, ['PRAGMA user_version'])
+        connection.close()
+
+    def test_newer_schema_is_rejected(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute(f'PRAGMA user_version = {SCHEMA_VERSION + 1}')
+        with self.assertRaises(RuntimeError):
+            migrate(connection)
+        connection.close()
+
+class TestTickerDataView(unittest.TestCase):
+
+    def setUp(self):
+        self.db = Database(':memory:')
+        self.connection = self.db.connection
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_view_writes(self):
+        self.db.insert_ticker_data('AAA', '2024-01-01', 1, 2, 0.5, 1.5, 100, 0, 0)
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.insert_ticker_data('AAA', '2024-01-01', 1, 2, 0.5, 1.5, 100, 0, 0)
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO ticker_data VALUES ('AAA', '2024-01-01', 1, 2, 0.5, 9.5, 100, 0, 0)")
+            self.connection.execute("UPDATE ticker_data SET volume = 300 WHERE ticker = 'AAA'")
+        self.assertEqual(self.db.fetch_ticker_data('AAA'), [('AAA', '2024-01-01', 1.0, 2.0, 0.5, 9.5, 300, 0.0, 0.0)])
+        # Writing data for an unknown ticker registers it
+        self.assertEqual(self.db.fetch_tickers(), ['AAA'])
+        with self.connection:
+            self.connection.execute("DELETE FROM ticker_data WHERE ticker = 'AAA'")
+        self.assertEqual(self.db.fetch_ticker_data('AAA'), [])
+
+    def test_range_query_uses_primary_key(self):
+        query, params = Stocks._ticker_data_query('AAA', '2024-01-01', '2024-01-31')
+        plan = ' '.join(row[-1] for row in self.connection.execute('EXPLAIN QUERY PLAN ' + query, params))
+        self.assertIn('SEARCH b USING PRIMARY KEY (ticker_id=? AND day>? AND day<?)', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+class TestIndexes(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.stocks = Stocks(self.connection)
+        for ticker in ('AAA', 'BBB'):
+            self.connection.execute('INSERT INTO tickers (ticker) VALUES (?)', (ticker,))
+            for day in range(1, 6):
+                self.connection.execute('INSERT INTO ticker_data VALUES (?, ?, 1, 2, 0.5, 1.5, 100, 0, 0)',
+                                        (ticker, f'2024-01-0{day}'))
+                self.connection.execute('INSERT INTO ticker_news VALUES (?, ?, ?, ?, ?)',
+                                        (ticker, f'2024-01-0{day}', f'{ticker}{day}', 'text', 'neutral'))
+        self.connection.commit()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def plan_of(self, call):
+        """Run call and return the query plan of the SELECT it executed"""
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        result = call()
+        self.connection.set_trace_callback(None)
+        select = [sql for sql in statements if sql.lstrip().startswith('SELECT')][-1]
+        plan = ' | '.join(row[-1] for row in self.connection.execute('EXPLAIN QUERY PLAN ' + select))
+        return result, plan
+
+    def test_indexes_are_created(self):
+        names = {row[0] for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertTrue(set(INDEXES) <= names)
+
+    def test_sync_rebuilds_changed_and_drops_stale_indexes(self):
+        self.connection.execute('DROP INDEX stocks_idx_ticker_news_date')
+        self.connection.execute('CREATE INDEX stocks_idx_ticker_news_date ON ticker_news (date)')
+        self.connection.execute('CREATE INDEX stocks_idx_stale ON ticker_news (news_id)')
+        sync_indexes(self.connection)
+        indexes = dict(self.connection.execute("SELECT name, sql FROM sqlite_master WHERE name LIKE 'stocks_idx%'"))
+        self.assertEqual(indexes, INDEXES)
+
+    def test_user_indexes_survive_reopening(self):
+        self.connection.execute('CREATE INDEX idx_news_summary ON ticker_news (news_summary)')
+        self.connection.commit()
+        Stocks(self.connection)
+        names = {row[0] for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.assertIn('idx_news_summary', names)
+
+    def test_news_by_date_uses_date_index(self):
+        rows, plan = self.plan_of(lambda: self.stocks.get_news_for_date('2024-01-03'))
+        self.assertEqual([row[0] for row in rows], ['AAA', 'BBB'])
+        self.assertIn('stocks_idx_ticker_news_date (date=?)', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_news_by_sentiment_uses_sentiment_index(self):
+        rows, plan = self.plan_of(lambda: self.stocks.get_ticker_news('AAA', sentiment='neutral'))
+        self.assertEqual(len(rows), 5)
+        self.assertIn('stocks_idx_ticker_news_sentiment (ticker=? AND sentiment=?)', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_ticker_news_uses_primary_key_order(self):
+        rows, plan = self.plan_of(lambda: self.stocks.get_ticker_news('AAA'))
+        self.assertEqual(rows[0][1], '2024-01-05')
+        self.assertIn('(ticker=?)', plan)
+        self.assertNotIn('SCAN', plan)
+
+    def test_data_for_date_uses_day_index(self):
+        rows, plan = self.plan_of(lambda: self.stocks.get_data_for_date('2024-01-02'))
+        self.assertEqual([row[:2] for row in rows], [('AAA', '2024-01-02'), ('BBB', '2024-01-02')])
+        self.assertIn('stocks_idx_ticker_bars_day (day=?)', plan)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import sys
+import os
+
+# Get the absolute path of the src directory
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+
+import sqlite3
+import unittest
+from unittest import mock
+
+from stocks.schema import migrate
+from stocks.sentiment import LexiconBackend, SentimentEngine, get_engine, label_for
+
+class TestSentimentEngine(unittest.TestCase):
+
+    def test_lexicon_backend(self):
+        backend = LexiconBackend()
+        self.assertEqual(label_for(backend.polarity('Shares surged after earnings beat')), 'positive')
+        self.assertEqual(label_for(backend.polarity('Shares fell on weak guidance')), 'negative')
+        self.assertEqual(label_for(backend.polarity("Revenue didn't improve")), 'negative')
+        self.assertEqual(label_for(backend.polarity('The company held its meeting')), 'neutral')
+
+    def test_identical_texts_are_scored_once(self):
+        engine = SentimentEngine('lexicon')
+        with mock.patch.object(engine.backend, 'polarity', wraps=engine.backend.polarity) as polarity:
+            labels = engine.score_many(['Stocks rally', 'Stocks rally', None, 'Stocks slump'])
+            engine.score('Stocks rally')
+        self.assertEqual(labels, ['positive', 'positive', 'neutral', 'negative'])
+        self.assertEqual(polarity.call_count, 2)
+
+    def test_persisted_labels_are_reused(self):
+        connection = sqlite3.connect(':memory:')
+        migrate(connection)
+        SentimentEngine('lexicon').score_many(['Stocks rally'], connection=connection)
+        fresh = SentimentEngine('lexicon')
+        with mock.patch.object(fresh.backend, 'polarity') as polarity:
+            self.assertEqual(fresh.score_many(['Stocks rally'], connection=connection), ['positive'])
+        polarity.assert_not_called()
+        connection.close()
+
+    def test_writer_is_not_held_while_scoring(self):
+        connection = sqlite3.connect(':memory:')
+        migrate(connection)
+        held = []
+
+        def with_connection(func):
+            held.append(True)
+            try:
+                return func(connection)
+            finally:
+                held.pop()
+
+        def score_missing(texts):
+            self.assertEqual(held, [])
+            return ['positive'] * len(texts)
+
+        engine = SentimentEngine('lexicon')
+        self.assertEqual(engine.score_many(['Stocks rally'], score_missing=score_missing,
+                                           with_connection=with_connection), ['positive'])
+        self.assertEqual(connection.execute('SELECT sentiment FROM sentiment_cache').fetchall(), [('positive',)])
+        connection.close()
+
+    def test_memo_is_bounded(self):
+        engine = SentimentEngine('lexicon', max_memo=2)
+        engine.score_many(['a gain', 'a loss', 'a record'])
+        self.assertEqual(len(engine._memo), 2)
+
+    def test_engine_is_loaded_once_per_backend(self):
+        self.assertIs(get_engine('lexicon'), get_engine('lexicon'))
+        with self.assertRaises(ValueError):
+            SentimentEngine('vader')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,10 +4,19 @@ from datetime import datetime, timedelta
 
 # Get the absolute path of the src directory
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../src')))
+# and of this directory, for the shared test helpers
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
+import sqlite3
+import threading
 import unittest
+from unittest import mock
+
+import pandas as pd
+
 from stocks.stocks import Stocks
 from stocks.database import Database
+from helpers import make_history
 
 class TestStocks(unittest.TestCase):
 
@@ -120,5 +129,250 @@ class TestStocks(unittest.TestCase):
         if os.path.exists('test_stocks.db'):
             os.remove('test_stocks.db')
 
+
+class TestConcurrentRefresh(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.stocks = Stocks(self.connection)
+        self.connection.executemany('INSERT INTO tickers (ticker) VALUES (?)',
+                                    [('AAA',), ('BBB',), ('CCC',)])
+        self.connection.commit()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_refresh_data_with_workers_writes_from_calling_thread(self):
+        main_thread = threading.get_ident()
+        fetch_threads = set()
+        write_threads = set()
+        store_history = self.stocks._store_history
+
+        def fake_fetch(ticker, start_date, end_date):
+            fetch_threads.add(threading.get_ident())
+            return make_history('2024-01-01', 5)
+
+        def tracking_store(*args):
+            write_threads.add(threading.get_ident())
+            return store_history(*args)
+
+        with mock.patch.object(self.stocks, '_fetch_history', side_effect=fake_fetch), \
+                mock.patch.object(self.stocks, '_store_history', side_effect=tracking_store):
+            self.stocks.refresh_data('2024-01-01', '2024-01-06', max_workers=3)
+
+        self.assertEqual(write_threads, {main_thread})
+        self.assertNotIn(main_thread, fetch_threads)
+        for ticker in ('AAA', 'BBB', 'CCC'):
+            self.assertEqual(len(self.stocks.get_ticker_data(ticker)), 5)
+
+    def test_refresh_data_skips_failed_downloads(self):
+        def fake_fetch(ticker, start_date, end_date):
+            if ticker == 'BBB':
+                raise RuntimeError('rate limited')
+            return make_history('2024-01-01', 3)
+
+        with mock.patch.object(self.stocks, '_fetch_history', side_effect=fake_fetch):
+            self.stocks.refresh_data('2024-01-01', '2024-01-04', max_workers=2,
+                                     requests_per_second=100)
+
+        self.assertEqual(len(self.stocks.get_ticker_data('AAA')), 3)
+        self.assertEqual(self.stocks.get_ticker_data('BBB'), [])
+
+    def test_refresh_plans_from_one_watermark_query(self):
+        with mock.patch.object(self.stocks, '_fetch_history', return_value=make_history('2024-01-01', 5)):
+            self.stocks.refresh_data_for_ticker('AAA', '2024-01-01', '2024-01-06')
+
+        self.assertEqual(self.stocks.get_watermarks(), {'AAA': '2024-01-05'})
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        with mock.patch.object(self.stocks, '_fetch_history', return_value=make_history('2024-01-01', 1)) as fetch:
+            self.stocks.refresh_data(end_date='2024-01-05')
+        self.connection.set_trace_callback(None)
+
+        fetched = sorted(call.args[0] for call in fetch.call_args_list)
+        self.assertEqual(fetched, ['BBB', 'CCC'])
+        self.assertEqual(sum('MAX(b.day)' in sql for sql in statements), 1)
+
+    def test_large_backfill_uses_bulk_load_profile(self):
+        synchronous = []
+
+        def fake_fetch(ticker, start_date, end_date):
+            synchronous.append(self.connection.execute('PRAGMA synchronous').fetchone()[0])
+            return make_history('2024-01-01', 1)
+
+        with mock.patch.object(self.stocks, '_fetch_history', side_effect=fake_fetch):
+            self.stocks.refresh_data('2024-01-01', '2024-01-02')
+            self.stocks.refresh_data('2024-01-01', '2024-01-02', bulk=True)
+
+        self.assertEqual(synchronous, [2, 2, 2, 0, 0, 0])
+        self.assertEqual(self.connection.execute('PRAGMA synchronous').fetchone()[0], 2)
+
+    def test_refresh_data_in_batches(self):
+        def fake_group(windows):
+            return {ticker: make_history(start, 4) for ticker, start, _ in windows}
+
+        with mock.patch.object(self.stocks, '_fetch_history_group', side_effect=fake_group) as fetch:
+            self.stocks.refresh_data('2024-01-01', '2024-01-05', batch_size=2)
+
+        self.assertEqual(fetch.call_count, 2)
+        for ticker in ('AAA', 'BBB', 'CCC'):
+            self.assertEqual(len(self.stocks.get_ticker_data(ticker)), 4)
+
+
+class TestAddTickers(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.stocks = Stocks(self.connection)
+        self.connection.execute("INSERT INTO tickers (ticker) VALUES ('AAA')")
+        self.connection.commit()
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_inserts_in_one_statement_and_reports_existing(self):
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        with mock.patch.object(self.stocks, '_refresh_windows') as refresh:
+            result = self.stocks.add_tickers(['BBB', 'AAA', 'CCC', 'BBB'], '2024-01-01', '2024-01-06')
+        self.connection.set_trace_callback(None)
+
+        self.assertEqual(result, {'added': ['BBB', 'CCC'], 'existing': ['AAA']})
+        self.assertEqual(sum(sql.startswith('INSERT') for sql in statements), 1)
+        self.assertEqual(sorted(self.stocks.get_all_tickers()), ['AAA', 'BBB', 'CCC'])
+        windows = refresh.call_args.args[0]
+        self.assertEqual(sorted(ticker for ticker, _, _ in windows), ['BBB', 'CCC'])
+
+    def test_backfill_runs_outside_write_transactions(self):
+        in_transaction = []
+
+        def fake_fetch_group(windows):
+            in_transaction.append(self.connection.in_transaction)
+            return {ticker: make_history('2024-01-01', 5) for ticker, _, _ in windows}
+
+        with mock.patch.object(self.stocks, '_fetch_history_group', side_effect=fake_fetch_group) as fetch:
+            self.stocks.add_tickers(['BBB', 'CCC'], '2024-01-01', '2024-01-06')
+
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(in_transaction, [False])
+        self.assertEqual(len(self.stocks.get_ticker_data('CCC')), 5)
+        self.assertEqual(self.stocks.get_ticker_data('AAA'), [])
+
+    def test_add_ticker_delegates(self):
+        with mock.patch.object(self.stocks, '_fetch_history', return_value=make_history('2024-01-01', 2)) as fetch:
+            self.stocks.add_ticker('BBB', '2024-01-01', '2024-01-03')
+            self.stocks.add_ticker('BBB', '2024-01-01', '2024-01-03')
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(len(self.stocks.get_ticker_data('BBB')), 2)
+
+class TestGapRepair(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.stocks = Stocks(self.connection)
+        history = make_history('2024-01-01', 31)
+        # Trading days only, with holes on 9-10 and 22 January
+        history = history[history.index.dayofweek < 5]
+        history = history.drop(pd.to_datetime(['2024-01-01', '2024-01-09', '2024-01-10', '2024-01-15', '2024-01-22']))
+        self.stocks._store_history('AAA', history, '2024-01-01', '2024-02-01')
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_find_gaps_uses_exchange_calendar(self):
+        self.assertEqual(self.stocks.find_gaps(end_date='2024-02-01'),
+                         {'AAA': [('2024-01-09', '2024-01-11'), ('2024-01-22', '2024-01-23')]})
+        # With the plain weekday calendar the holidays count as gaps too
+        weekday_gaps = self.stocks.find_gaps(end_date='2024-02-01', calendar='weekday', merge_within=0)
+        self.assertIn(('2024-01-15', '2024-01-16'), weekday_gaps['AAA'])
+
+    def test_find_gaps_skips_tickers_off_the_calendar(self):
+        history = make_history('2024-01-01', 31)
+        # Tokyo closes on 8 January, a NYSE session
+        history = history[history.index.dayofweek < 5].drop(pd.to_datetime(['2024-01-08']))
+        self.stocks._store_history('^N225', history, '2024-01-01', '2024-02-01')
+        self.assertNotIn('^N225', self.stocks.find_gaps(end_date='2024-02-01'))
+        gaps = self.stocks.find_gaps(end_date='2024-02-01', calendar={'^N225': 'nyse'})
+        self.assertEqual(gaps, {'^N225': [('2024-01-08', '2024-01-09')]})
+
+    def test_repair_downloads_only_gaps(self):
+        def fake_fetch(ticker, start_date, end_date):
+            days = pd.date_range(start_date, end_date, inclusive='left', name='Date')
+            return make_history(start_date, len(days))
+
+        with mock.patch.object(self.stocks, '_fetch_history', side_effect=fake_fetch) as fetch:
+            windows = self.stocks.repair_gaps(end_date='2024-02-01', merge_within=10)
+        self.assertEqual(windows, [('AAA', '2024-01-09', '2024-01-23')])
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(self.stocks.find_gaps(end_date='2024-02-01'), {})
+
+class TestColumnarReads(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.stocks = Stocks(self.connection)
+        self.stocks._store_history('AAA', make_history('2024-01-01', 10), '2024-01-01', '2024-01-11')
+
+    def tearDown(self):
+        self.connection.close()
+
+    def test_frame_output_ascending(self):
+        frame = self.stocks.get_ticker_data('AAA', '2024-01-03', '2024-01-07', output='frame', ascending=True)
+        self.assertEqual(len(frame), 5)
+        self.assertTrue(frame.index.is_monotonic_increasing)
+        self.assertEqual(str(frame.index[0].date()), '2024-01-03')
+        self.assertEqual(frame['close'].iloc[0], 12.5)
+
+    def test_arrays_output(self):
+        arrays = self.stocks.get_ticker_data('AAA', output='arrays')
+        self.assertEqual(arrays['close'].dtype.name, 'float64')
+        self.assertEqual(arrays['date'].dtype.name, 'datetime64[D]')
+        self.assertEqual(len(arrays['volume']), 10)
+        # Default order stays descending like the row output
+        self.assertGreater(arrays['date'][0], arrays['date'][-1])
+
+    def test_bars_output(self):
+        bars = self.stocks.get_ticker_data('AAA', '2024-01-03', '2024-01-07', output='bars', ascending=True)
+        self.assertEqual(len(bars), 5)
+        self.assertEqual(bars[0].date, '2024-01-03')
+        self.assertEqual(bars[0].close, 12.5)
+        self.assertEqual(bars.close.typecode, 'd')
+        self.assertEqual(len(self.stocks.get_ticker_data('ZZZ', output='bars')), 0)
+
+    def test_empty_frame(self):
+        frame = self.stocks.get_ticker_data('ZZZ', output='frame')
+        self.assertTrue(frame.empty)
+        self.assertIn('close', frame.columns)
+
+    def test_panel_single_field(self):
+        self.stocks._store_history('BBB', make_history('2024-01-05', 10), '2024-01-05', '2024-01-15')
+        with mock.patch('stocks.stocks.SQLITE_MAX_PARAMS', 3):
+            panel = self.stocks.get_panel(['BBB', 'AAA', 'ZZZ'], '2024-01-01', '2024-01-12')
+        self.assertEqual(list(panel.columns), ['BBB', 'AAA', 'ZZZ'])
+        self.assertEqual(len(panel), 12)
+        self.assertTrue(panel.index.is_monotonic_increasing)
+        self.assertEqual(panel.loc['2024-01-05', 'AAA'], 14.5)
+        self.assertEqual(panel.loc['2024-01-05', 'BBB'], 10.5)
+        self.assertTrue(panel['ZZZ'].isna().all())
+
+    def test_panel_multiple_fields(self):
+        panels = self.stocks.get_panel(['AAA'], fields=['open', 'volume'])
+        self.assertEqual(sorted(panels), ['open', 'volume'])
+        self.assertEqual(panels['volume']['AAA'].iloc[-1], 10000)
+        with self.assertRaises(ValueError):
+            self.stocks.get_panel(['AAA'], fields='date; DROP TABLE tickers')
+
+    def test_iter_ticker_data_matches_get(self):
+        streamed = list(self.stocks.iter_ticker_data('AAA', '2024-01-02', arraysize=4))
+        self.assertEqual(streamed, self.stocks.get_ticker_data('AAA', '2024-01-02'))
+        batches = list(self.stocks.iter_ticker_data('AAA', ascending=True, arraysize=4, batches=True))
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 2])
+        self.assertEqual(batches[0][0][1], '2024-01-01')
+
+    def test_invalid_output(self):
+        with self.assertRaises(ValueError):
+            self.stocks.get_ticker_data('AAA', output='json')
+
+
 if __name__ == '__main__':
     unittest.main()